@@ -0,0 +1,294 @@
+# Gemini analiz yanıtının şeması ile yerel doğrulama ve onarım.
+# Şema generate_content'e response_schema olarak verilir; yanıt yine de kesik ya da bozuk gelebileceği için
+# her yanıt yerelde onarılır ve doğrulanır, kurtarılamayan alanlar çağırana "eksik" olarak bildirilir.
+import json
+import re
+
+SENTIMENT_KEYS = ("pozitif", "negatif", "notr")
+SENTIMENT_ALIASES = {"nötr": "notr", "positive": "pozitif", "negative": "negatif", "neutral": "notr"}
+
+SENTIMENT_SCHEMA = {
+    "type": "object",
+    "properties": {key: {"type": "integer"} for key in SENTIMENT_KEYS},
+    "required": list(SENTIMENT_KEYS)
+}
+TEXT_SCHEMA = {"type": "string"}
+TEXT_LIST_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+# Analiz alanları ve şemaları; duygu alanları yüzde (0-100) tam sayılardır
+FIELD_SCHEMAS = {
+    "genel_duygu": SENTIMENT_SCHEMA,
+    "ek_yorum_duygu": SENTIMENT_SCHEMA,
+    "genel_izlenim": TEXT_SCHEMA,
+    "one_cikan_konular": TEXT_LIST_SCHEMA,
+    "tartismali_noktalar": TEXT_LIST_SCHEMA,
+    "oneriler": TEXT_LIST_SCHEMA,
+    "ozet": TEXT_SCHEMA,
+    "yeni_konular": TEXT_LIST_SCHEMA,
+    "degisim_ozeti": TEXT_SCHEMA,
+    "cevap": TEXT_SCHEMA,
+    "dayanak_yorumlar": TEXT_LIST_SCHEMA,
+}
+SENTIMENT_FIELDS = ("genel_duygu", "ek_yorum_duygu")
+QUALITATIVE_FIELDS = ("genel_izlenim", "one_cikan_konular", "tartismali_noktalar", "oneriler", "ozet")
+CHANGE_FIELDS = ("yeni_konular", "degisim_ozeti")
+ANSWER_FIELDS = ("cevap", "dayanak_yorumlar")  # Takip sorusu yanıtı
+
+
+# Bir analiz prompt'unun beklediği alanlar
+def analysis_fields(include_sentiment=True, previous_analysis=None):
+    fields = (("genel_duygu",) if include_sentiment else ()) + QUALITATIVE_FIELDS
+    return fields + CHANGE_FIELDS if previous_analysis else fields
+
+
+# Verilen alanlar için response_schema (hepsi zorunlu)
+def response_schema(fields):
+    return {
+        "type": "object",
+        "properties": {field: FIELD_SCHEMAS[field] for field in fields},
+        "required": list(fields)
+    }
+
+
+# "60%", "60", 60 gibi değerleri sayıya çevir
+def parse_percentage(value):
+    if isinstance(value, bool):
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'-?\d+(?:[.,]\d+)?', str(value or ""))
+    return float(match.group(0).replace(',', '.')) if match else 0.0
+
+
+# Duygu değerlerini toplamı 100 olan tam sayılara çevir (en büyük kalan yöntemi); kullanılamazsa None.
+# Değerler toplamlarına oranlandığı için 0-1 aralığındaki oranlar da ayrıca dönüştürülmeden yüzdeye çevrilir.
+def normalize_sentiment(values):
+    numbers = [max(0.0, parse_percentage(values.get(key))) for key in SENTIMENT_KEYS]
+    total = sum(numbers)
+    if total <= 0:
+        return None
+    scaled = [number * 100 / total for number in numbers]
+    percents = [int(value) for value in scaled]
+    by_remainder = sorted(range(len(scaled)), key=lambda i: scaled[i] - percents[i], reverse=True)
+    for i in by_remainder[:100 - sum(percents)]:
+        percents[i] += 1
+    return dict(zip(SENTIMENT_KEYS, percents))
+
+
+# Yanıt metnindeki JSON nesnesini çöz; kesik veya sondaki virgülleri olan JSON onarılır. Bulunamazsa None.
+def parse_json_object(text):
+    start = (text or "").find("{")
+    if start == -1:
+        return None
+    end = text.rfind("}") + 1
+    if end > start:
+        try:
+            data = json.loads(text[start:end], strict=False)
+            return data if isinstance(data, dict) else None
+        except json.JSONDecodeError:
+            pass
+    try:
+        data = json.loads(_repair(text, start), strict=False)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+# JSON'u karakter karakter yeniden yaz: kapanıştan önceki virgülleri at, metin kesildiyse son tamamlanan değerden
+# kes ve açık kalan parantezleri kapat. Her kapsayıcı için bir durum tutulur: "key", "colon", "value", "after".
+def _repair(text, start):
+    out = []
+    stack = []  # [açılış karakteri, durum]
+    in_string = False
+    escape = False
+    in_scalar = False  # Sayı veya true/false/null okunuyor
+    last_good = None  # (çıktı uzunluğu, o andaki kapanış karakterleri)
+
+    def completed_value():
+        nonlocal last_good
+        if stack:
+            stack[-1][1] = "after"
+            last_good = (len(out), "".join("}" if opener == "{" else "]" for opener, _ in reversed(stack)))
+
+    for char in text[start:]:
+        # Sayı veya true/false/null ayraçla biter
+        if in_scalar and (char.isspace() or char in ",}]"):
+            in_scalar = False
+            completed_value()
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+                if stack and stack[-1][0] == "{" and stack[-1][1] == "key":
+                    stack[-1][1] = "colon"
+                else:
+                    completed_value()
+            continue
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            out.append(char)
+            stack.append([char, "key" if char == "{" else "value"])
+        elif char in "}]":
+            while out and (out[-1].isspace() or out[-1] == ","):
+                out.pop()
+            out.append(char)
+            if stack:
+                stack.pop()
+            if not stack:
+                return "".join(out)
+            completed_value()
+        elif char == ",":
+            if out and out[-1] == ",":
+                continue
+            out.append(char)
+            if stack:
+                stack[-1][1] = "key" if stack[-1][0] == "{" else "value"
+        elif char == ":":
+            out.append(char)
+            if stack:
+                stack[-1][1] = "value"
+        else:
+            if not char.isspace() and stack and stack[-1][1] == "value":
+                in_scalar = True
+            out.append(char)
+
+    if last_good is None:
+        return "{}"
+    length, closers = last_good
+    repaired = "".join(out[:length]).rstrip().rstrip(",")
+    return repaired + closers
+
+
+def _text_value(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, list):
+        return " ".join(str(item).strip() for item in value if str(item).strip())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return ""
+
+
+def _list_value(value):
+    if isinstance(value, list):
+        return [_text_value(item) for item in value if _text_value(item)]
+    if isinstance(value, str) and value.strip():
+        return [part.strip(" -•*") for part in re.split(r"\n|;", value) if part.strip(" -•*")]
+    return None
+
+
+# Çözülmüş yanıtı doğrula ve alanları beklenen türlere çevir: duygu dağılımı toplamı 100 olan "N%" değerleri,
+# metin alanları düz metin, liste alanları metin listesi olur. (analiz, eksik alanlar) döndürür.
+def validate_analysis(data, fields):
+    if not isinstance(data, dict):
+        return None, list(fields)
+    analysis = dict(data)
+    for alias, key in SENTIMENT_ALIASES.items():
+        for field in SENTIMENT_FIELDS:
+            sentiment = analysis.get(field)
+            if isinstance(sentiment, dict) and alias in sentiment and key not in sentiment:
+                sentiment[key] = sentiment.pop(alias)
+    missing = []
+    for field in fields:
+        value = analysis.get(field)
+        schema = FIELD_SCHEMAS.get(field)
+        if schema is SENTIMENT_SCHEMA:
+            # Kesilmiş (eksik anahtarlı) bir dağılım yanlış oranlar verir, hiç yokmuş gibi davranılır
+            complete = isinstance(value, dict) and all(key in value for key in SENTIMENT_KEYS)
+            normalized = normalize_sentiment(value) if complete else None
+            if normalized:
+                analysis[field] = {key: f"{percent}%" for key, percent in normalized.items()}
+        elif schema is TEXT_LIST_SCHEMA:
+            normalized = _list_value(value)
+            if normalized is not None:
+                analysis[field] = normalized
+        else:
+            normalized = _text_value(value) or None
+            if normalized:
+                analysis[field] = normalized
+        if normalized is None:
+            analysis.pop(field, None)
+            missing.append(field)
+    return analysis, missing
+
+
+# Akış halinde gelen yanıt metnini izler; en üst seviyedeki bir alanın değeri kapandığı anda
+# feed() o alanı (alan, değer) olarak döndürür. Metin her parça için sadece bir kez taranır.
+class SectionStreamParser:
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.state = "start"  # En üst seviyede: "start", "key", "colon", "value", "after", "done"
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+
+    def _emit(self, end, sections):
+        try:
+            sections.append((self.key, json.loads(self.buffer[self.value_start:end], strict=False)))
+        except json.JSONDecodeError:
+            pass
+        self.state = "after"
+        self.value_start = None
+
+    def feed(self, text):
+        self.buffer += text
+        sections = []
+        while self.position < len(self.buffer) and self.state != "done":
+            index = self.position
+            char = self.buffer[index]
+            self.position += 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.state == "key":
+                        self.key = json.loads(self.buffer[self.key_start:index + 1], strict=False)
+                        self.state = "colon"
+                    elif self.depth == 1:
+                        self._emit(index + 1, sections)
+                continue
+            if self.state == "start":
+                if char == "{":
+                    self.depth = 1
+                    self.state = "key"
+                continue
+            # Üst seviyedeki sayı / true / false / null ayraçla biter
+            if self.depth == 1 and self.state == "value" and self.value_start is not None and (char.isspace() or char in ",}"):
+                self._emit(index, sections)
+            if char == '"':
+                self.in_string = True
+                if self.depth == 1 and self.state == "key":
+                    self.key_start = index
+                elif self.depth == 1 and self.state == "value":
+                    self.value_start = index
+            elif char in "{[":
+                if self.depth == 1 and self.state == "value":
+                    self.value_start = index
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 1 and self.value_start is not None:
+                    self._emit(index + 1, sections)
+                elif self.depth == 0:
+                    self.state = "done"
+            elif self.depth == 1:
+                if char == ":" and self.state == "colon":
+                    self.state = "value"
+                elif char == ",":
+                    self.state = "key"
+                elif not char.isspace() and self.state == "value" and self.value_start is None:
+                    self.value_start = index
+        return sections
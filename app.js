@@ -22,93 +22,14 @@ document.addEventListener('DOMContentLoaded', () => {
         loadingSpinner.style.display = 'flex';
 
         // Kullanıcıya bilgi ver
-        commentsContainer.innerHTML = '<p class="info-message">Tüm yorumlar yükleniyor ve analiz ediliyor... Bu işlem, çekilen yorum sayısına bağlı olarak 1-2 dakika sürebilir. Lütfen bekleyin.</p>';
+        commentsContainer.innerHTML = '<p class="info-message" id="job-status">Yorumlar yükleniyor ve analiz ediliyor... Lütfen bekleyin.</p>';
 
         try {
-            const response = await fetch('/api/comments', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ url: youtubeUrl })
-            });
-
-            if (!response.ok) {
-                throw new Error('Sunucu yanıt vermiyor veya hata döndürdü.');
-            }
-
-            const data = await response.json();
-
-            // Önceki mesajı temizle
-            commentsContainer.innerHTML = '';
-
-            // Hata kontrolü
-            if (data.error) {
-                throw new Error(data.error);
-            }
-
-            // Video başlığını göster
-            if (data.video_title) {
-                const titleEl = document.createElement('h2');
-                titleEl.className = 'video-title';
-                titleEl.textContent = data.video_title;
-                commentsContainer.appendChild(titleEl);
-
-                // Yorum sayısı bilgisi ekle (Yeni eklenen)
-                const statsContainer = document.createElement('div');
-                statsContainer.className = 'stats-container';
-
-                // Video bilgileri ve yorum sayacını oluştur
-                statsContainer.innerHTML = `
-                    <div class="stats-box">
-                        <div class="stat-item">
-                            <span class="stat-value">${data.comments ? data.comments.length : 0}</span>
-                            <span class="stat-label">Çekilen Yorum</span>
-                        </div>
-                        ${data.total_comments ? `
-                        <div class="stat-item">
-                            <span class="stat-value">${data.total_comments}</span>
-                            <span class="stat-label">Toplam Yorum</span>
-                        </div>` : ''}
-                    </div>
-                `;
-
-                commentsContainer.appendChild(statsContainer);
-            }
-
-            // Analiz sonuçlarını göster
-            if (data.analysis) {
-                renderAnalysis(data.analysis);
-            }
+            const view = createResultView();
+            await streamAnalysis(youtubeUrl, event => handleStreamEvent(view, event));
 
-            if (!data.comments || data.comments.length === 0) {
-                commentsContainer.innerHTML += `
-                    <div class="error-box">
-                        <p class="no-comments">Bu videoda hiç yorum bulunamadı veya yorumlara erişilemiyor.</p>
-                        <p class="error-help">YouTube, yorum bölümünü kapatmış veya uygulama yorumlara erişemiyor olabilir.</p>
-                    </div>
-                `;
-            } else {
-                // Yorumları göster
-                const commentsHeading = document.createElement('h3');
-                commentsHeading.className = 'comments-heading';
-                commentsHeading.textContent = 'Yorumlar';
-                commentsContainer.appendChild(commentsHeading);
-
-                renderComments(data.comments);
-
-                // Bilgi mesajı ekle
-                const infoEl = document.createElement('div');
-                infoEl.className = 'info-message';
-                infoEl.textContent = `Toplam ${data.comments.length} yorum gösteriliyor.`;
-
-                // Yorumların üstüne bilgi mesajını ekle
-                const commentsHeadingEl = document.querySelector('.comments-heading');
-                if (commentsHeadingEl) {
-                    commentsHeadingEl.after(infoEl);
-                } else {
-                    commentsContainer.appendChild(infoEl);
-                }
+            if (!view.finished) {
+                throw new Error('Sunucu bağlantısı beklenmedik şekilde kapandı.');
             }
         } catch (error) {
             console.error('Hata:', error);
@@ -124,12 +45,184 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Analiz aşamalarının kullanıcıya gösterilecek karşılıkları
+    const STAGE_LABELS = {
+        queued: 'Sırada bekleniyor...',
+        navigating: 'Video sayfası açılıyor...',
+        scrolling: 'Yorumlar yükleniyor...',
+        extracting: 'Yorumlar ayıklanıyor...',
+        analyzing: 'Yorumlar yapay zeka ile analiz ediliyor...'
+    };
+
+    // Sunucudan gelen NDJSON olaylarını satır satır okuyup onEvent'e ilet
+    async function streamAnalysis(youtubeUrl, onEvent) {
+        const response = await fetch('/api/comments/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ url: youtubeUrl })
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error('Sunucu yanıt vermiyor veya hata döndürdü.');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+        }
+
+        if (buffer.trim()) {
+            onEvent(JSON.parse(buffer));
+        }
+    }
+
+    // Sonuç alanının iskeletini oluştur; bölümler veri geldikçe doldurulur
+    function createResultView() {
+        const statusEl = document.getElementById('job-status');
+
+        const titleEl = document.createElement('h2');
+        titleEl.className = 'video-title';
+        titleEl.style.display = 'none';
+
+        const statsContainer = document.createElement('div');
+        statsContainer.className = 'stats-container';
+
+        const analysisSlot = document.createElement('div');
+
+        const commentsList = document.createElement('div');
+
+        commentsContainer.append(titleEl, statsContainer, analysisSlot, commentsList);
+
+        return { statusEl, titleEl, statsContainer, analysisSlot, commentsList, commentCount: 0, totalComments: null, sections: {}, finished: false };
+    }
+
+    function renderStats(view) {
+        // Video bilgileri ve yorum sayacını oluştur
+        view.statsContainer.innerHTML = `
+            <div class="stats-box">
+                <div class="stat-item">
+                    <span class="stat-value">${view.commentCount}</span>
+                    <span class="stat-label">Çekilen Yorum</span>
+                </div>
+                ${view.totalComments ? `
+                <div class="stat-item">
+                    <span class="stat-value">${view.totalComments}</span>
+                    <span class="stat-label">Toplam Yorum</span>
+                </div>` : ''}
+            </div>
+        `;
+    }
+
+    function handleStreamEvent(view, event) {
+        switch (event.type) {
+            case 'stage':
+                updateStatus(view, event.stage, event);
+                break;
+
+            case 'title':
+                // Video başlığını göster
+                view.titleEl.textContent = event.video_title;
+                view.titleEl.style.display = '';
+                renderStats(view);
+                break;
+
+            case 'comments':
+                if (view.commentCount === 0) {
+                    const commentsHeading = document.createElement('h3');
+                    commentsHeading.className = 'comments-heading';
+                    commentsHeading.textContent = 'Yorumlar';
+                    view.commentsList.appendChild(commentsHeading);
+                }
+                renderComments(event.comments, view.commentsList);
+                view.commentCount += event.comments.length;
+                renderStats(view);
+                break;
+
+            case 'section':
+                // Model yanıtı sürerken kapanan bölümü hemen göster; sonuç gelince analiz baştan çizilir
+                view.sections[event.field] = event.value;
+                view.analysisSlot.innerHTML = '';
+                renderAnalysis(view.sections, view.analysisSlot);
+                break;
+
+            case 'reset':
+                // Sunucu yorumları baştan gönderecek
+                view.commentsList.innerHTML = '';
+                view.commentCount = 0;
+                break;
+
+            case 'result':
+                finishView(view, event);
+                break;
+        }
+    }
+
+    function updateStatus(view, stage, progress) {
+        if (!view.statusEl) return;
+
+        let text = STAGE_LABELS[stage] || 'İşleniyor...';
+        if (stage === 'scrolling' && progress.loaded) {
+            text += ` (${progress.loaded} yorum)`;
+        } else if (stage === 'analyzing' && progress.comments) {
+            text += ` (${progress.comments} yorum)`;
+        }
+        view.statusEl.textContent = text;
+    }
+
+    function finishView(view, data) {
+        view.finished = true;
+
+        // Hata kontrolü
+        if (data.error && view.commentCount === 0) {
+            throw new Error(data.error);
+        }
+
+        if (view.statusEl) {
+            view.statusEl.remove();
+        }
+
+        view.totalComments = data.total_comments;
+        renderStats(view);
+
+        // Analiz sonuçlarını göster (akış sırasında gösterilen bölümlerin yerine)
+        if (data.analysis) {
+            view.analysisSlot.innerHTML = '';
+            renderAnalysis(data.analysis, view.analysisSlot);
+        }
+
+        if (view.commentCount === 0) {
+            view.commentsList.innerHTML = `
+                <div class="error-box">
+                    <p class="no-comments">Bu videoda hiç yorum bulunamadı veya yorumlara erişilemiyor.</p>
+                    <p class="error-help">YouTube, yorum bölümünü kapatmış veya uygulama yorumlara erişemiyor olabilir.</p>
+                </div>
+            `;
+        } else {
+            // Yorumların üstüne bilgi mesajını ekle
+            const infoEl = document.createElement('div');
+            infoEl.className = 'info-message';
+            infoEl.textContent = `Toplam ${view.commentCount} yorum gösteriliyor.`;
+            view.commentsList.querySelector('.comments-heading').after(infoEl);
+        }
+    }
+
     function isValidYoutubeUrl(url) {
         const pattern = /^(https?:\/\/)?(www\.)?(youtube\.com|youtu\.?be)\/.+$/;
         return pattern.test(url);
     }
 
-    function renderAnalysis(analysis) {
+    function renderAnalysis(analysis, target = commentsContainer) {
         // Analiz sonuçlarını gösterecek container oluştur
         const analysisEl = document.createElement('div');
         analysisEl.className = 'analysis-container';
@@ -154,8 +247,11 @@ document.addEventListener('DOMContentLoaded', () => {
                 analysisEl.appendChild(rawEl);
             }
 
-            commentsContainer.appendChild(analysisEl);
-            return;
+            // Duygu dağılımı yerel modelle hesaplandıysa hata mesajının altında yine de göster
+            if (analysis.duygu_kaynagi !== 'yerel' || !analysis.genel_duygu) {
+                target.appendChild(analysisEl);
+                return;
+            }
         }
 
         // Duygu analizi
@@ -293,10 +389,10 @@ document.addEventListener('DOMContentLoaded', () => {
         }
 
         // Analizin tamamını DOM'a ekle
-        commentsContainer.appendChild(analysisEl);
+        target.appendChild(analysisEl);
     }
 
-    function renderComments(comments) {
+    function renderComments(comments, target = commentsContainer) {
         comments.forEach(comment => {
             const commentEl = document.createElement('div');
             commentEl.className = 'comment';
@@ -314,13 +410,27 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="likes">
                     <span>👍 ${escapeHtml(comment.likeCount)}</span>
                 </div>
+                ${renderReplies(comment.replies)}
             `;
 
             commentEl.innerHTML = commentHtml;
-            commentsContainer.appendChild(commentEl);
+            target.appendChild(commentEl);
         });
     }
 
+    // Açılmış yanıtları üst yorumun altında listele
+    function renderReplies(replies) {
+        if (!replies || replies.length === 0) return '';
+        const items = replies.map(reply => `
+            <div class="reply">
+                <span class="author-name">${escapeHtml(reply.authorDisplayName)}</span>
+                <span class="comment-date">${escapeHtml(reply.publishedAt)}</span>
+                <div class="comment-text">${escapeHtml(reply.textDisplay)}</div>
+            </div>
+        `).join('');
+        return `<div class="replies">${items}</div>`;
+    }
+
     // Güvenlik için HTML escape fonksiyonu
     function escapeHtml(text) {
         if (!text) return '';
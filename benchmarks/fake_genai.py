@@ -0,0 +1,107 @@
+# google.generativeai yerine geçen belirlenimci sahte modül.
+# Aynı prompt her zaman aynı analiz JSON'unu döndürür; latency ile ilk parçaya kadarki Gemini gecikmesi,
+# chunk_delay ile yanıt üretim süresi (parça başına) taklit edilir. FakeGenerativeModel tek başına da
+# (ör. GeminiClient testlerinde) hata ve gecikme senaryoları için kullanılabilir.
+import hashlib
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+TOPIC_PATTERN = re.compile(r"\w{5,}")
+
+
+# Testler ve ölçümler için sahte model: failures listesindeki hataları sırayla fırlatır, sonra text döndürür.
+# stream=True ile yanıt chunk_size karakterlik parçalar halinde döner; delay ilk parçadan önceki,
+# chunk_delay her parçanın üretim süresidir (akışsız çağrıda toplam süre aynıdır).
+class FakeGenerativeModel:
+    def __init__(self, text="{}", failures=None, delay=0.0, model_name="fake-model", chunk_size=64, chunk_delay=0.0):
+        self.text = text
+        self.failures = list(failures or [])
+        self.delay = delay
+        self.model_name = model_name
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self.lock:
+            self.calls += 1
+            failure = self.failures.pop(0) if self.failures else None
+        if self.delay:
+            time.sleep(self.delay)
+        if failure is not None:
+            raise failure
+        text = self.text(prompt) if callable(self.text) else self.text
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        if stream:
+            return self._stream(chunks)
+        if self.chunk_delay:
+            time.sleep(self.chunk_delay * len(chunks))
+        return _FakeResponse(text)
+
+    def _stream(self, chunks):
+        for chunk in chunks:
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield _FakeResponse(chunk)
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+# Prompt'taki yorumlardan belirlenimci bir analiz (takip sorularında kısa bir cevap) üret; duygu yüzdeleri prompt'un özetinden türetilir
+def stub_analysis(prompt):
+    digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+    positive = 40 + digest[0] % 40
+    negative = digest[1] % (100 - positive)
+    words = {}
+    for word in TOPIC_PATTERN.findall(prompt.lower()):
+        words[word] = words.get(word, 0) + 1
+    topics = sorted(words, key=lambda w: -words[w])[:5]
+    if "Kullanıcının sorusu:" in prompt:
+        return json.dumps({
+            "cevap": f"Yorumlarda en çok şunlardan söz ediliyor: {', '.join(topics[:3])}.",
+            "dayanak_yorumlar": re.findall(r"Yorum \d+", prompt)[:3]
+        }, ensure_ascii=False)
+    return json.dumps({
+        "genel_duygu": {"pozitif": f"{positive}%", "negatif": f"{negative}%", "notr": f"{100 - positive - negative}%"},
+        "genel_izlenim": "Yorumlar genel olarak olumlu.",
+        "one_cikan_konular": topics,
+        "tartismali_noktalar": topics[:2],
+        "oneriler": ["Benzer içerikler üretilmeye devam edilebilir"],
+        "ozet": f"{prompt.count('Yorum ')} yorum satırı analiz edildi."
+    }, ensure_ascii=False)
+
+
+class StubGenai:
+    def __init__(self, latency=0.0, chunk_delay=0.0):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.models = []
+
+    def configure(self, **kwargs):
+        pass
+
+    def list_models(self):
+        return [SimpleNamespace(name="models/gemini-1.5-flash")]
+
+    def GenerativeModel(self, model_name, **kwargs):
+        model = FakeGenerativeModel(text=stub_analysis, delay=self.latency, model_name=model_name, chunk_delay=self.chunk_delay)
+        self.models.append(model)
+        return model
+
+    def call_count(self):
+        return sum(model.calls for model in self.models)
+
+
+# server modülündeki genai'yi sahte modülle değiştir ve model kaydını sıfırla
+def install(server, latency=0.0, chunk_delay=0.0):
+    stub = StubGenai(latency, chunk_delay)
+    server.genai = stub
+    server.model_registry = server.GeminiModelRegistry(server.MODEL_REGISTRY_TTL, server.FALLBACK_MODELS)
+    return stub
@@ -0,0 +1,332 @@
+# Benchmark'lar için kayıtlı YouTube sayfaları ve bunları sunan yerel HTTP sunucusu.
+# Bir fixture dizini iki dosyadan oluşur:
+#   watch.html          izleme sayfasının HTML'i (ytInitialData ve ytcfg içerir)
+#   continuations.json  {devam anahtarı: youtubei/v1/next yanıtı}
+#
+# Kullanım:
+#   python benchmarks/fixtures.py synthesize benchmarks/fixtures/synthetic [yorum_sayısı]
+#   python benchmarks/fixtures.py record https://www.youtube.com/watch?v=... benchmarks/fixtures/<ad>
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "synthetic")
+COMMENTS_PER_PAGE = 20
+DOM_PAGE_SIZE = 20  # Tarayıcı sayfasında her kaydırmada eklenen yorum sayısı
+
+AUTHORS = ["@ahmet", "@ayse.k", "@mehmet_34", "@zeynep", "@can", "@elif", "@burak", "@deniz", "@selin", "@emre"]
+PHRASES = [
+    "Çok güzel bir video olmuş, emeğinize sağlık",
+    "Harika anlatım, teşekkürler!",
+    "Ses biraz kötü ama içerik başarılı",
+    "Bu konuyu hiç bu kadar net anlatan olmamıştı",
+    "Dakika {n}'daki kısım çok komikti 😂",
+    "Biraz uzun olmuş, kısaltılabilirdi",
+    "İlk yorum!",
+    "Bence başlık yanıltıcı, clickbait",
+    "Devamını bekliyoruz",
+    "Kamera açısı çok iyi, hangi ekipmanı kullanıyorsunuz?",
+]
+LIKES = ["0", "3", "12", "87", "1,2 B", "15 B", "2,4 B"]
+AGES = ["1 gün önce", "3 gün önce", "2 hafta önce", "1 ay önce", "5 ay önce", "1 yıl önce"]
+
+
+def _text(value):
+    return {"runs": [{"text": value}]}
+
+
+def _renderer_thread(index, comment):
+    return {"commentThreadRenderer": {"comment": {"commentRenderer": {
+        "commentId": f"c{index}",
+        "authorText": {"simpleText": comment["author"]},
+        "authorThumbnail": {"thumbnails": [{"url": f"https://yt3.ggpht.com/avatar{index % 10}.jpg"}]},
+        "contentText": _text(comment["text"]),
+        "publishedTimeText": _text(comment["published"]),
+        "voteCount": {"simpleText": comment["likes"]},
+    }}}}
+
+
+def _entity_thread(index, comment):
+    key = f"key-{index}"
+    thread = {"commentThreadRenderer": {"commentViewModel": {"commentViewModel": {"commentKey": key}}}}
+    mutation = {"entityKey": key, "payload": {"commentEntityPayload": {
+        "key": key,
+        "properties": {"commentId": f"c{index}", "content": {"content": comment["text"]}, "publishedTime": comment["published"]},
+        "author": {"displayName": comment["author"], "avatarThumbnailUrl": f"https://yt3.ggpht.com/avatar{index % 10}.jpg"},
+        "toolbar": {"likeCountNotliked": comment["likes"]},
+    }}}
+    return thread, mutation
+
+
+def _continuation_item(token):
+    return {"continuationItemRenderer": {"continuationEndpoint": {"continuationCommand": {"token": token}}}}
+
+
+# Belirlenimci sentetik bir video: sayfalar eski (commentRenderer) ve yeni (entity) yapıları dönüşümlü kullanır
+def synthesize(out_dir, count=200, seed=7, title="Benchmark Videosu: Yapay Zeka ile Yorum Analizi"):
+    rng = random.Random(seed)
+    comments = [{
+        "author": rng.choice(AUTHORS),
+        "text": rng.choice(PHRASES).format(n=rng.randint(1, 20)) + ("" if rng.random() < 0.3 else f" #{i}"),
+        "published": rng.choice(AGES),
+        "likes": rng.choice(LIKES),
+    } for i in range(count)]
+
+    continuations = {}
+    pages = [comments[i:i + COMMENTS_PER_PAGE] for i in range(0, count, COMMENTS_PER_PAGE)] or [[]]
+    for page_index, page in enumerate(pages):
+        items, mutations = [], []
+        if page_index == 0:
+            # Sentetik yorumlar zaten en yeniden eskiye sıralı kabul edilir; iki sıralama seçeneği de aynı sayfalara gider
+            sort_menu = {"sortFilterSubMenuRenderer": {"subMenuItems": [
+                {"title": title, "serviceEndpoint": {"continuationCommand": {"token": "page-0"}}}
+                for title in ("Popüler yorumlar", "Önce en yeni")
+            ]}}
+            items.append({"commentsHeaderRenderer": {"countText": _text(f"{count * 6:,} yorum".replace(",", ".")), "sortMenu": sort_menu}})
+        for offset, comment in enumerate(page):
+            index = page_index * COMMENTS_PER_PAGE + offset
+            if page_index % 2:
+                thread, mutation = _entity_thread(index, comment)
+                items.append(thread)
+                mutations.append(mutation)
+            else:
+                items.append(_renderer_thread(index, comment))
+        if page_index + 1 < len(pages):
+            items.append(_continuation_item(f"page-{page_index + 1}"))
+        action = "reloadContinuationItemsCommand" if page_index == 0 else "appendContinuationItemsAction"
+        payload = {"onResponseReceivedEndpoints": [{action: {"continuationItems": items}}]}
+        if mutations:
+            payload["frameworkUpdates"] = {"entityBatchUpdate": {"mutations": mutations}}
+        continuations[f"page-{page_index}"] = payload
+
+    initial_data = {"contents": {"twoColumnWatchNextResults": {"results": {"results": {"contents": [
+        {"videoPrimaryInfoRenderer": {"title": _text(title)}},
+        {"itemSectionRenderer": {"sectionIdentifier": "comment-item-section",
+                                 "contents": [_continuation_item("page-0")]}},
+    ]}}}}}
+    ytcfg = {"INNERTUBE_API_KEY": "benchmark-key", "INNERTUBE_CONTEXT_CLIENT_VERSION": "2.20240101.00.00"}
+    watch_html = (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<meta name=\"title\" content=\"{title}\"><title>{title} - YouTube</title></head><body>"
+        f"<script>ytcfg.set({json.dumps(ytcfg)});</script>"
+        f"<script>var ytInitialData = {json.dumps(initial_data, ensure_ascii=False)};</script>"
+        "</body></html>"
+    )
+    _write(out_dir, watch_html, continuations)
+
+
+# Gerçek bir videonun izleme sayfasını ve yorum devam yanıtlarını kaydet
+def record(url, out_dir, max_pages=10):
+    import server
+
+    video_id = server.extract_video_id(url)
+    if not video_id:
+        raise SystemExit("Geçersiz YouTube URL'si")
+    session = server.http_session
+    response = session.get(f"https://www.youtube.com/watch?v={video_id}", timeout=server.HTTP_TIMEOUT)
+    response.raise_for_status()
+    watch_html = response.text
+    page = server.parse_watch_page(watch_html)
+
+    continuations = {}
+    token = page["continuation"]
+    while token and len(continuations) < max_pages:
+        response = session.post(
+            "https://www.youtube.com/youtubei/v1/next",
+            params={"key": page["api_key"], "prettyPrint": "false"} if page["api_key"] else {"prettyPrint": "false"},
+            json={"context": page["context"], "continuation": token},
+            timeout=server.HTTP_TIMEOUT
+        )
+        response.raise_for_status()
+        continuations[token] = response.json()
+        token = server.parse_comment_continuation(continuations[token])[1]
+    _write(out_dir, watch_html, continuations)
+
+
+def _write(out_dir, watch_html, continuations):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "watch.html"), "w", encoding="utf-8") as f:
+        f.write(watch_html)
+    with open(os.path.join(out_dir, "continuations.json"), "w", encoding="utf-8") as f:
+        json.dump(continuations, f, ensure_ascii=False)
+    print(f"{out_dir}: watch.html, {len(continuations)} continuation pages")
+
+
+class Fixture:
+    def __init__(self, fixture_dir=DEFAULT_FIXTURE_DIR):
+        import server
+
+        with open(os.path.join(fixture_dir, "watch.html"), encoding="utf-8") as f:
+            self.watch_html = f.read()
+        with open(os.path.join(fixture_dir, "continuations.json"), encoding="utf-8") as f:
+            self.continuations = json.load(f)
+
+        # Tarayıcı sayfası için yorumları devam zinciri sırasıyla çöz
+        page = server.parse_watch_page(self.watch_html)
+        self.video_title = page["video_title"]
+        self.comments = []
+        self.total_comments = None
+        token = page["continuation"]
+        while token in self.continuations:
+            batch, token, total = server.parse_comment_continuation(self.continuations[token])
+            self.comments.extend(batch)
+            self.total_comments = self.total_comments or total
+
+    # Selenium yolu için: YouTube işaretlemesini taklit eden, kaydırdıkça yorum ekleyen statik sayfa
+    def render_dom_page(self, delay_ms=150):
+        data = json.dumps([{
+            "id": c.get("commentId") or f"c{index}", "author": c["authorDisplayName"], "avatar": c["authorProfileImageUrl"], "text": c["textDisplay"],
+            "published": c["publishedAt"], "likes": c["likeCount"]
+        } for index, c in enumerate(self.comments)], ensure_ascii=False).replace("</", "<\\/")
+        title = self.video_title.replace("&", "&amp;").replace("<", "&lt;")
+        return DOM_PAGE_TEMPLATE % {
+            "title": title, "total": f"{self.total_comments or len(self.comments):,}",
+            "data": data, "page_size": DOM_PAGE_SIZE, "delay": int(delay_ms)
+        }
+
+
+DOM_PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s - YouTube</title>
+<style>ytd-comments, ytd-comment-thread-renderer, ytd-continuation-item-renderer { display: block; }
+ytd-comment-thread-renderer { min-height: 96px; border-bottom: 1px solid #ddd; }</style></head>
+<body>
+<h1 class="title style-scope ytd-video-primary-info-renderer">%(title)s</h1>
+<div style="height: 1600px">video</div>
+<ytd-comments id="comments">
+  <h2 id="count" class="ytd-comments-header-renderer"><yt-formatted-string><span>%(total)s</span><span> yorum</span></yt-formatted-string></h2>
+  <div id="contents"></div>
+</ytd-comments>
+<script>
+const COMMENTS = %(data)s;
+const PAGE_SIZE = %(page_size)d, DELAY = %(delay)d;
+const section = document.getElementById('comments');
+const contents = document.getElementById('contents');
+let next = 0, loading = false;
+
+function child(parent, tag, id, text) {
+    const el = document.createElement(tag);
+    if (id) el.id = id;
+    if (text !== undefined) el.textContent = text;
+    parent.appendChild(el);
+    return el;
+}
+
+function renderComment(comment) {
+    const thread = document.createElement('ytd-comment-thread-renderer');
+    const img = child(child(thread, 'yt-img-shadow'), 'img', 'img');
+    if (comment.avatar) img.src = comment.avatar;
+    child(child(thread, 'a', 'author-text'), 'span', null, comment.author);
+    const published = child(child(thread, 'span', 'published-time-text'), 'a', null, comment.published);
+    published.href = '/watch?v=benchmark00&lc=' + encodeURIComponent(comment.id);
+    child(thread, 'yt-formatted-string', 'content-text', comment.text);
+    child(thread, 'span', 'vote-count-middle', comment.likes);
+    return thread;
+}
+
+function setContinuation() {
+    const old = section.querySelector('ytd-continuation-item-renderer');
+    if (old) old.remove();
+    if (next < COMMENTS.length) child(section, 'ytd-continuation-item-renderer', null, 'Yükleniyor...');
+}
+
+function loadMore() {
+    if (loading || next >= COMMENTS.length) return;
+    loading = true;
+    setTimeout(() => {
+        COMMENTS.slice(next, next + PAGE_SIZE).forEach(c => contents.appendChild(renderComment(c)));
+        next += PAGE_SIZE;
+        setContinuation();
+        loading = false;
+    }, DELAY);
+}
+
+setContinuation();
+window.addEventListener('scroll', () => {
+    if (window.innerHeight + window.scrollY >= document.documentElement.scrollHeight - 600) loadMore();
+});
+</script>
+</body></html>
+"""
+
+
+# /watch, /youtubei/v1/next ve Selenium için /dom/watch adreslerini sunan yerel sunucu.
+# latency: her yanıttan önce eklenen yapay ağ gecikmesi (sn)
+class FixtureServer:
+    def __init__(self, fixture, latency=0.0, dom_delay_ms=150):
+        self.fixture = fixture
+        self.latency = latency
+        self.dom_page = fixture.render_dom_page(dom_delay_ms).encode("utf-8")
+        self.requests = 0
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # Başlık ve gövde ayrı yazılır; gecikmeli ACK ölçümü bozmasın
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                if owner.latency:
+                    time.sleep(owner.latency)
+                owner.requests += 1
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/watch":
+                    self._send(200, owner.fixture.watch_html.encode("utf-8"), "text/html; charset=utf-8")
+                elif path == "/dom/watch":
+                    self._send(200, owner.dom_page, "text/html; charset=utf-8")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if urlparse(self.path).path != "/youtubei/v1/next":
+                    self._send(404, b"not found", "text/plain")
+                    return
+                token = json.loads(body or b"{}").get("continuation")
+                payload = owner.fixture.continuations.get(token)
+                if payload is None:
+                    self._send(404, b"{}", "application/json")
+                else:
+                    self._send(200, json.dumps(payload).encode("utf-8"), "application/json")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("synthesize", "record"):
+        raise SystemExit("Kullanım: fixtures.py synthesize <dizin> [yorum_sayısı] | record <url> <dizin>")
+    if sys.argv[1] == "synthesize":
+        synthesize(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 200)
+    else:
+        if len(sys.argv) < 4:
+            raise SystemExit("Kullanım: fixtures.py record <url> <dizin>")
+        record(sys.argv[2], sys.argv[3])
+
+
+if __name__ == "__main__":
+    main()
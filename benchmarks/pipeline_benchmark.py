@@ -0,0 +1,211 @@
+# YouTube ve Gemini'ye bağlanmadan tüm hattın ölçümü.
+# Kayıtlı sayfalar yerel bir HTTP sunucusundan, Gemini yanıtları belirlenimci sahte modelden gelir.
+#
+# Aşama süreleri (Chrome kuruluysa Selenium aşamaları da ölçülür):
+#   python benchmarks/pipeline_benchmark.py stages [--fixtures DİZİN] [--gemini-latency 0.5] [--repeat 5]
+#   python benchmarks/pipeline_benchmark.py stages --comments 5000   # Sentetik 5000 yorumla yüksek hacim modu
+#   python benchmarks/pipeline_benchmark.py stages --gemini-chunk-delay 0.05   # Akışlı yanıtta ilk bölümün süresi
+# Flask uygulamasına eşzamanlı yük (p50/p95/p99 ve istek/sn):
+#   python benchmarks/pipeline_benchmark.py load [--requests 100] [--concurrency 8] [--gemini-latency 0.5] [--cached] [--no-pipeline]
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Sonuç önbelleği gerçek veritabanına dokunmasın
+os.environ.setdefault("RESULT_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="yorum-benchmark-"), "results.sqlite3"))
+
+import logging
+
+import numpy as np
+import requests
+
+import server
+from gemini_client import GeminiClient
+
+import fake_genai
+from fixtures import DEFAULT_FIXTURE_DIR, Fixture, FixtureServer, synthesize
+
+VIDEO_URL = "https://www.youtube.com/watch?v={video_id}"
+
+
+# Sunucuyu yerel kayıtlara ve sahte Gemini'ye yönlendir
+def configure_server(base_url, gemini_latency, gemini_chunk_delay=0.0):
+    server.YOUTUBE_BASE_URL = base_url
+    server.COMMENT_SOURCE = "http"
+    # Ölçülen şey hattın kendisi; kota sınırlayıcısı sonuçları bozmasın
+    server.gemini_client = GeminiClient(max_concurrency=server.GEMINI_MAX_CONCURRENCY, requests_per_minute=0, tokens_per_minute=0)
+    return fake_genai.install(server, gemini_latency, gemini_chunk_delay)
+
+
+def timed(timings, stage, func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings.setdefault(stage, []).append(time.perf_counter() - started)
+    return result
+
+
+def build_prompt(video_title, comments):
+    representatives, groups, _ = server.collapse_duplicate_comments(comments)
+    prompt_comments, counts, _ = server.sample_comments_for_prompt(comments, representatives, groups)
+    formatted = server.format_comments(prompt_comments, counts)
+    return server.build_analysis_prompt(video_title, len(comments), formatted)
+
+
+# Selenium aşamaları: başlık, kaydırma döngüsü, thread çıkarma, toplam yorum sayısı,
+# ardından aynı sayfada yüksek hacim modu (kaydırırken toplama + DOM budama)
+def run_selenium_stages(base_url, timings, comment_count, high_volume_stats):
+    try:
+        driver = server.driver_pool._create_driver()
+    except Exception as e:
+        print(f"Selenium aşamaları atlandı (Chrome başlatılamadı: {str(e).splitlines()[0]})")
+        return False
+    selector = "ytd-comment-thread-renderer"
+    attempts = server.max_scroll_attempts_for(comment_count)
+    try:
+        timed(timings, "selenium: page load", driver.get, f"{base_url}/dom/watch?v=benchmark00")
+        timed(timings, "selenium: get_video_title", server.get_video_title, driver)
+        timed(timings, "selenium: scroll to comments", server.scroll_to_comments_section, driver)
+        timed(timings, "selenium: scroll loop", server.scroll_until_stalled, driver, selector, comment_count, attempts)
+        timed(timings, "selenium: thread extraction", server.extract_comments_bulk, driver, selector)
+        timed(timings, "selenium: get_total_comment_count", server.get_total_comment_count, driver)
+
+        driver.get(f"{base_url}/dom/watch?v=benchmark00")
+        server.scroll_to_comments_section(driver)
+        harvester = server.PrunedHarvester(driver, selector)
+        harvester.harvest()
+        timed(timings, "selenium: high-volume scroll + prune", server.scroll_and_prune, driver, harvester, comment_count, attempts)
+        high_volume_stats.append(harvester.stats())
+        return True
+    finally:
+        driver.quit()
+
+
+# Akışlı analizde ilk bölümün ve tüm yanıtın gelme süresi
+def measure_first_section(timings, video_title, comments):
+    started = time.perf_counter()
+    first = []
+
+    def on_section(field, value):
+        if not first:
+            first.append(time.perf_counter() - started)
+
+    server.analyze_comments_with_gemini(video_title, comments, on_section=on_section)
+    timings.setdefault("analysis: streamed, last section", []).append(time.perf_counter() - started)
+    if first:
+        timings.setdefault("analysis: streamed, first section", []).append(first[0])
+
+
+def run_stages(args):
+    if args.comments:
+        args.fixtures = tempfile.mkdtemp(prefix="yorum-fixture-")
+        synthesize(args.fixtures, args.comments)
+    fixture = Fixture(args.fixtures)
+    fixture_server = FixtureServer(fixture, latency=args.page_latency).start()
+    configure_server(fixture_server.base_url, args.gemini_latency, args.gemini_chunk_delay)
+    comment_count = len(fixture.comments)
+    server.MAX_COMMENTS = max(server.MAX_COMMENTS, comment_count)
+    server.HTTP_MAX_PAGES = max(server.HTTP_MAX_PAGES, server.max_scroll_attempts_for(comment_count))
+    timings = {}
+    high_volume_stats = []
+    try:
+        for _ in range(args.repeat):
+            page_html = timed(timings, "http: watch page fetch", lambda: server.http_session.get(f"{fixture_server.base_url}/watch?v=benchmark00", timeout=10).text)
+            timed(timings, "http: parse_watch_page", server.parse_watch_page, page_html)
+            scraped = timed(timings, "http: comment pages", server.scrape_comments_http, "benchmark00")
+            if args.selenium:
+                args.selenium = run_selenium_stages(fixture_server.base_url, timings, comment_count, high_volume_stats)
+            comments = scraped["comments"]
+            timed(timings, "prompt build", build_prompt, scraped["video_title"], comments)
+            timed(timings, "analysis (stub gemini)", server.analyze_comments_with_gemini, scraped["video_title"], comments)
+            measure_first_section(timings, scraped["video_title"], comments)
+    finally:
+        fixture_server.stop()
+
+    print(f"fixture:  {args.fixtures} ({len(fixture.comments)} comments)")
+    print(f"gemini:   {args.gemini_latency * 1000:.0f} ms stub latency + {args.gemini_chunk_delay * 1000:.0f} ms per chunk, pages: {args.page_latency * 1000:.0f} ms latency")
+    print(f"{'stage':<36}{'min':>10}{'median':>10}{'max':>10}")
+    for stage, values in timings.items():
+        values = np.array(values) * 1000
+        print(f"{stage:<36}{values.min():>8.1f}ms{np.median(values):>8.1f}ms{values.max():>8.1f}ms")
+    for stats in high_volume_stats[-1:]:
+        print(f"high volume: {stats['comments']} comments, {stats['comments_per_second']} comments/s, "
+              f"peak JS heap {stats['peak_js_heap_mb']} MB, peak DOM nodes {stats['peak_dom_nodes']}, "
+              f"{stats['duplicate_threads']} duplicates skipped")
+
+
+def run_load(args):
+    from werkzeug.serving import make_server
+
+    fixture = Fixture(args.fixtures)
+    fixture_server = FixtureServer(fixture, latency=args.page_latency).start()
+    stub = configure_server(fixture_server.base_url, args.gemini_latency, args.gemini_chunk_delay)
+    server.ANALYSIS_PIPELINE = args.pipeline
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{httpd.server_port}/api/comments"
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def send(index):
+        # --cached ile aynı video tekrar istenir (önbellek yolu), aksi halde her istek tüm hattı çalıştırır
+        video_id = "benchmark00" if args.cached else f"bench{index % 1000000:06d}"
+        started = time.perf_counter()
+        response = session.post(api_url, json={"url": VIDEO_URL.format(video_id=video_id), "force_refresh": not args.cached}, timeout=300)
+        elapsed = time.perf_counter() - started
+        ok = response.status_code == 200 and "error" not in response.json()
+        return elapsed, ok
+
+    if args.cached:
+        send(0)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, range(args.requests)))
+    wall = time.perf_counter() - started
+    httpd.shutdown()
+    fixture_server.stop()
+
+    latencies = np.array([elapsed for elapsed, _ in results]) * 1000
+    errors = sum(1 for _, ok in results if not ok)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    mode = "cached" if args.cached else ("full pipeline" + ("" if args.pipeline else ", analysis after scraping"))
+    print(f"requests:     {args.requests} ({errors} failed), concurrency {args.concurrency}, {mode}")
+    print(f"gemini:       {args.gemini_latency * 1000:.0f} ms stub latency, {stub.call_count()} calls")
+    print(f"latency:      p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms, max {latencies.max():.1f} ms")
+    print(f"throughput:   {args.requests / wall:.1f} req/s ({wall:.2f} s wall)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kayıtlı sayfalar ve sahte Gemini ile hat ölçümü")
+    parser.add_argument("mode", choices=["stages", "load"])
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR, help="watch.html ve continuations.json içeren dizin")
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="Sahte Gemini yanıt gecikmesi (sn)")
+    parser.add_argument("--gemini-chunk-delay", type=float, default=0.0, help="Sahte Gemini'nin her yanıt parçası için üretim süresi (sn)")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="Yerel sayfa sunucusu yanıt gecikmesi (sn)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--comments", type=int, default=0, help="Kayıt yerine bu kadar yorumlu sentetik bir video kullan")
+    parser.add_argument("--no-selenium", dest="selenium", action="store_false", help="Selenium aşamalarını atla")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cached", action="store_true", help="Önbellekten dönen yanıtları ölç")
+    parser.add_argument("--no-pipeline", dest="pipeline", action="store_false", help="Analizi çekim bittikten sonra başlat (ANALYSIS_PIPELINE=0)")
+    parser.add_argument("--verbose", action="store_true", help="Sunucu loglarını göster")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    if args.mode == "stages":
+        run_stages(args)
+    else:
+        run_load(args)
+
+
+if __name__ == "__main__":
+    main()
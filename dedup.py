@@ -0,0 +1,119 @@
+# Birebir ve neredeyse aynı yorumları gruplayan tekrar birleştirme aşaması.
+# Önce normalleştirilmiş metne göre birebir tekrarlar birleştirilir, sonra kalan benzersiz metinler
+# MinHash imzaları ve LSH kovalarıyla karşılaştırılır. Her adım yorum sayısıyla doğrusal ölçeklenir.
+import re
+
+import numpy as np
+
+SHINGLE_SIZE = 5  # Karakter n-gram uzunluğu
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16  # Her bantta NUM_PERMUTATIONS / NUM_BANDS satır
+DEFAULT_THRESHOLD = 0.8  # Tahmini Jaccard benzerliği bu değerin üstündeyse yorumlar birleştirilir
+SIGNATURE_CHUNK_SIZE = 512  # Bellek kullanımını sınırlamak için imzalar bu kadar yorumluk parçalarla hesaplanır
+
+# Permütasyonlar çarp-topla-kaydır (multiply-add-shift) hash ailesiyle taklit edilir; 64 bit taşma kasıtlıdır
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(0, 1 << 62, size=NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+_PERM_B = _rng.randint(0, 1 << 62, size=NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+_SHIFT = np.uint64(32)
+
+URL_PATTERN = re.compile(r"https?://\S+")
+MENTION_PATTERN = re.compile(r"@[\w.-]+")
+REPEAT_PATTERN = re.compile(r"(.)\1{2,}")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Karşılaştırma anahtarı: küçük harf, bağlantı/etiket yok, uzatılmış harfler kısaltılmış ("çoooook" -> "çook")
+def normalize_text(text):
+    text = (text or "").replace("İ", "i").lower()
+    text = URL_PATTERN.sub(" ", text)
+    text = MENTION_PATTERN.sub(" ", text)
+    text = REPEAT_PATTERN.sub(r"\1\1", text)
+    words = WORD_PATTERN.findall(text)
+    if words:
+        return " ".join(words)
+    # Sadece emoji/noktalama içeren yorumlar: kullanılan sembol kümesi anahtar olur
+    return "".join(sorted(set(ch for ch in text if not ch.isspace() and ch != "\ufe0f")))
+
+
+# Metinlerin MinHash imzaları: (metin sayısı, NUM_PERMUTATIONS) boyutunda dizi.
+# Karakter n-gram'ları, parçadaki tüm metinlerin kod noktaları üzerinde kayan pencereyle tek seferde hash'lenir.
+def minhash_signatures(texts):
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint64)
+    powers = np.array([31 ** i for i in range(SHINGLE_SIZE - 1, -1, -1)], dtype=np.uint64)
+    for chunk_start in range(0, len(texts), SIGNATURE_CHUNK_SIZE):
+        # Kısa metinler tek bir n-gram oluşturacak kadar doldurulur
+        chunk = [text.ljust(SHINGLE_SIZE, "\x01") for text in texts[chunk_start:chunk_start + SIGNATURE_CHUNK_SIZE]]
+        lengths = np.array([len(text) for text in chunk])
+        codes = np.frombuffer("".join(chunk).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        doc_ids = np.repeat(np.arange(len(chunk)), lengths)
+
+        # Sadece tek bir metnin içinde kalan pencereler geçerlidir
+        windows = np.lib.stride_tricks.sliding_window_view(codes, SHINGLE_SIZE)
+        valid = doc_ids[:len(windows)] == doc_ids[SHINGLE_SIZE - 1:]
+        hashes = (windows[valid] * powers).sum(axis=1)
+        hashes = (hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+
+        offsets = np.concatenate(([0], np.cumsum(lengths - SHINGLE_SIZE + 1)[:-1]))
+        permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) >> _SHIFT
+        signatures[chunk_start:chunk_start + len(chunk)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Küçük sıra kök olarak kalsın, böylece grubun temsilcisi ilk görülen yorum olur
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+# Yorum metinlerini gruplara ayır. Her grup, aynı ya da neredeyse aynı metinlerin sıra numaralarıdır;
+# gruplar ve grup içi sıralar ilk görülme sırasına göredir (grubun ilk elemanı temsilcidir).
+def group_near_duplicates(texts, threshold=DEFAULT_THRESHOLD):
+    normalized = [normalize_text(text) for text in texts]
+    union_find = _UnionFind(len(texts))
+
+    # 1. Birebir tekrarlar
+    first_index = {}
+    for index, key in enumerate(normalized):
+        if key in first_index:
+            union_find.union(first_index[key], index)
+        else:
+            first_index[key] = index
+
+    # 2. Benzersiz metinler arasında MinHash + LSH ile neredeyse aynı olanlar
+    unique_indices = list(first_index.values())
+    if len(unique_indices) > 1:
+        signatures = minhash_signatures([normalized[i] for i in unique_indices])
+        rows = NUM_PERMUTATIONS // NUM_BANDS
+        for band in range(NUM_BANDS):
+            buckets = {}
+            band_keys = signatures[:, band * rows:(band + 1) * rows]
+            for position in range(len(unique_indices)):
+                key = band_keys[position].tobytes()
+                anchor = buckets.setdefault(key, position)
+                if anchor == position:
+                    continue
+                # Kovadaki her metin sadece kovanın ilk metniyle karşılaştırılır (doğrusal maliyet)
+                similarity = np.count_nonzero(signatures[anchor] == signatures[position]) / NUM_PERMUTATIONS
+                if similarity >= threshold:
+                    union_find.union(unique_indices[anchor], unique_indices[position])
+
+    groups = {}
+    for index in range(len(texts)):
+        groups.setdefault(union_find.find(index), []).append(index)
+    return sorted(groups.values(), key=lambda members: members[0])
@@ -0,0 +1,259 @@
+# Gemini generate_content çağrıları için ortak katman:
+# hata sınıflandırma, üstel geri çekilme (jitter ile), süreç genelinde istek/token hız sınırı,
+# API çöktüğünde hızlı hata veren devre kesici ve her sonuç türü için sayaçlar.
+import logging
+import random
+import threading
+import time
+
+# Hata türleri
+ERROR_RATE_LIMIT = "rate_limit"   # 429 / kota aşımı: geri çekilip tekrar denenir
+ERROR_TRANSIENT = "transient"     # 5xx, zaman aşımı, bağlantı hatası: geri çekilip tekrar denenir
+ERROR_BLOCKED = "blocked"         # Güvenlik filtresi yanıtı engelledi: aynı prompt tekrar denenmez
+ERROR_FATAL = "fatal"             # Geçersiz istek, yetki, bulunamayan model: tekrar denenmez
+RETRYABLE_ERRORS = (ERROR_RATE_LIMIT, ERROR_TRANSIENT)
+
+RATE_LIMIT_NAMES = ("ResourceExhausted", "TooManyRequests")
+TRANSIENT_NAMES = ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+                   "BadGateway", "Aborted", "RetryError", "Timeout", "ConnectionError", "ConnectTimeout")
+BLOCKED_NAMES = ("BlockedPromptException", "StopCandidateException")
+
+
+class GeminiCallError(Exception):
+    def __init__(self, message, kind, attempts=0):
+        super().__init__(message)
+        self.kind = kind
+        self.attempts = attempts
+
+
+class CircuitOpenError(GeminiCallError):
+    def __init__(self, retry_in):
+        super().__init__(f"Gemini API geçici olarak devre dışı, {retry_in:.0f} sn sonra tekrar denenecek", ERROR_TRANSIENT)
+        self.retry_in = retry_in
+
+
+# İstisnayı sınıf adı ve HTTP kodu üzerinden sınıflandır (google.api_core içe aktarılmadan, sahte hatalarla da çalışır).
+# Sadece bilinen ağ / 5xx / 429 hataları tekrar denenir; tanınmayan hatalar (ör. istemci tarafındaki bir TypeError)
+# tekrar denemeyle düzelmeyeceği ve devre kesiciyi açmaması gerektiği için kalıcı sayılır.
+def classify_error(error):
+    if isinstance(error, GeminiCallError):
+        return error.kind
+    names = {cls.__name__ for cls in type(error).__mro__}
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else getattr(error, "status_code", None)
+    if names.intersection(RATE_LIMIT_NAMES) or code == 429:
+        return ERROR_RATE_LIMIT
+    if names.intersection(BLOCKED_NAMES):
+        return ERROR_BLOCKED
+    if names.intersection(TRANSIENT_NAMES) or isinstance(error, (TimeoutError, ConnectionError)):
+        return ERROR_TRANSIENT
+    if isinstance(code, int):
+        return ERROR_TRANSIENT if code >= 500 else ERROR_FATAL
+    if "quota" in str(error).lower() or "429" in str(error):
+        return ERROR_RATE_LIMIT
+    return ERROR_FATAL
+
+
+# Yanıt metnini oku. response.text, aday yanıt engellendiğinde (geçerli bir Part yoksa) ValueError fırlatır;
+# sadece bu erişimdeki ValueError engelleme sayılır.
+def response_text(response):
+    try:
+        return response.text
+    except ValueError as error:
+        raise GeminiCallError(str(error), ERROR_BLOCKED) from error
+
+
+# Dakika başına sınırlanan kaynak için token kovası; kapasite bir dakikalık miktardır
+class TokenBucket:
+    def __init__(self, per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # amount kadar kaynak ayır, gerekirse bekle; timeout içinde ayrılamazsa False
+    def acquire(self, amount=1, timeout=60.0):
+        if self.capacity <= 0:
+            return True
+        amount = min(float(amount), self.capacity)
+        deadline = self.clock() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+            if self.clock() + wait > deadline:
+                return False
+            self.sleep(wait)
+
+
+# Üst üste failure_threshold geçici hatadan sonra açılır, reset_timeout boyunca çağrıları reddeder,
+# ardından tek bir deneme çağrısına izin verir (yarı açık); deneme başarılıysa kapanır.
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    # Çağrıya izin yoksa kalan bekleme süresini, varsa None döndür
+    def check(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return None
+            elapsed = self.clock() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return None
+            return max(0.0, self.reset_timeout - elapsed)
+
+    # İzin verilen deneme çağrısı hiç yapılmadıysa hakkı geri ver
+    def release_probe(self):
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"Gemini circuit breaker opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+                self.probe_in_flight = False
+
+
+class GeminiClient:
+    def __init__(self, max_concurrency=4, requests_per_minute=60, tokens_per_minute=1_000_000,
+                 max_retries=4, base_delay=1.0, max_delay=30.0, rate_limit_wait=60.0,
+                 failure_threshold=5, reset_timeout=30.0, clock=time.monotonic, sleep=time.sleep):
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self.request_bucket = TokenBucket(requests_per_minute, clock, sleep)
+        self.token_bucket = TokenBucket(tokens_per_minute, clock, sleep)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_wait = rate_limit_wait
+        self.sleep = sleep
+        self.counters = {
+            "calls": 0, "success": 0, "retries": 0, "rate_limited": 0, "transient_errors": 0,
+            "blocked": 0, "fatal_errors": 0, "circuit_open": 0, "throttled": 0
+        }
+        self.counter_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self.counter_lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self.counter_lock:
+            counters = dict(self.counters)
+        counters["circuit_state"] = self.breaker.state
+        return counters
+
+    # Tam jitter'lı üstel geri çekilme süresi
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    # model.generate_content çağır ve yanıt metnini döndür. Hatalar GeminiCallError olarak fırlatılır.
+    # estimated_tokens, dakika başına token sınırı için prompt'un tahmini boyutudur.
+    # on_chunk verilirse yanıt akış halinde istenir ve her metin parçası geldikçe on_chunk(metin) çağrılır;
+    # parça iletildikten sonra oluşan hatada tekrar denenmez (alıcı yarım yanıtı zaten görmüştür).
+    def generate(self, model, prompt, estimated_tokens=1, on_chunk=None, **kwargs):
+        self._count("calls")
+        attempt = 0
+        while True:
+            retry_in = self.breaker.check()
+            if retry_in is not None:
+                self._count("circuit_open")
+                raise CircuitOpenError(retry_in)
+
+            if not (self.request_bucket.acquire(1, self.rate_limit_wait)
+                    and self.token_bucket.acquire(estimated_tokens, self.rate_limit_wait)):
+                self._count("throttled")
+                # Ayrılan deneme hakkı kullanılmadı; yarı açık devrede deneme beklemede kalmasın
+                self.breaker.release_probe()
+                raise GeminiCallError("Yerel hız sınırı nedeniyle Gemini isteği gönderilemedi", ERROR_RATE_LIMIT, attempt)
+
+            delivered = []
+            try:
+                with self.slots:
+                    if on_chunk:
+                        text = self._stream(model, prompt, on_chunk, delivered, kwargs)
+                    else:
+                        response = model.generate_content(prompt, **kwargs)
+                        text = response_text(response) if response is not None else None
+                if not text:
+                    raise GeminiCallError("Gemini API boş yanıt döndü", ERROR_TRANSIENT)
+            except Exception as error:
+                kind = classify_error(error)
+                if delivered:
+                    self._count("transient_errors")
+                    self.breaker.record_failure()
+                    raise GeminiCallError(f"Gemini yanıt akışı yarıda kesildi: {str(error)}", kind, attempt + 1) from error
+                if kind == ERROR_BLOCKED:
+                    self._count("blocked")
+                    self.breaker.record_success()  # API ayakta, içerik engellendi
+                    raise GeminiCallError(f"Gemini yanıtı engellendi: {str(error)}", kind, attempt + 1) from error
+                if kind == ERROR_FATAL:
+                    self._count("fatal_errors")
+                    self.breaker.record_success()
+                    raise GeminiCallError(f"Gemini isteği geçersiz: {str(error)}", kind, attempt + 1) from error
+
+                self._count("rate_limited" if kind == ERROR_RATE_LIMIT else "transient_errors")
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise GeminiCallError(f"Gemini isteği {attempt + 1} denemede başarısız: {str(error)}", kind, attempt + 1) from error
+                delay = self.backoff_delay(attempt)
+                logging.warning(f"Gemini call failed ({kind}): {str(error)}; retrying in {delay:.1f}s")
+                self._count("retries")
+                self.sleep(delay)
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            self._count("success")
+            return text
+
+    # Akış yanıtını parça parça oku; iletilen parçalar delivered listesine eklenir
+    def _stream(self, model, prompt, on_chunk, delivered, kwargs):
+        for chunk in model.generate_content(prompt, stream=True, **kwargs):
+            try:
+                text = response_text(chunk)
+            except GeminiCallError:
+                # Metin içermeyen son parça (yalnızca bitiş nedeni); ilk parçadaysa yanıt engellenmiştir
+                if not delivered:
+                    raise
+                continue
+            if text:
+                delivered.append(text)
+                on_chunk(text)
+        return "".join(delivered)
@@ -0,0 +1,174 @@
+# Harici bağımlılık gerektirmeyen küçük bir Prometheus metrik kaydı ve istek bazlı süre ölçümü.
+# span("aşama") bloğu süreyi hem süreç geneli histograma hem de (varsa) o isteğin zaman dökümüne yazar.
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    # Başka bir yerde tutulan, süreç başından beri artan bir sayacı olduğu gibi yansıt
+    def set_total(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = value
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, [], value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self.series = {}  # etiketler -> [kova sayıları, toplam, adet]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        result = []
+        with self.lock:
+            for key, (bucket_counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    result.append((f"{self.name}_bucket", key, [("le", _format_value(bound))], cumulative))
+                result.append((f"{self.name}_sum", key, [], total))
+                result.append((f"{self.name}_count", key, [], count))
+        return result
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    # Prometheus metin biçimi (text/plain; version=0.0.4)
+    def render(self):
+        lines = []
+        with self.lock:
+            metrics = list(self.metrics)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+STAGE_SECONDS = registry.histogram("yorum_stage_duration_seconds", "Duration of pipeline stages", ["stage"])
+
+
+# Bir isteğin aşama bazlı süre dökümü; aynı aşama birden çok kez çalışırsa süreler toplanır
+class RequestTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self.lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def breakdown(self):
+        with self.lock:
+            stages = {stage: {"seconds": round(entry["seconds"], 4), "count": entry["count"]}
+                      for stage, entry in self.stages.items()}
+        return {"total_seconds": round(time.perf_counter() - self.started, 4), "stages": stages}
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+# Bloğun süresini ölç. Aşamalar iç içe olabilir (ör. kaydırma sırasında yapılan çıkarma).
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+# Bu bağlamdaki istek dökümünü başlat; token current_trace.reset ile geri alınır
+def start_trace():
+    trace = RequestTrace()
+    return trace, current_trace.set(trace)
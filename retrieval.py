@@ -0,0 +1,55 @@
+# Takip sorularında yorumların tamamı yerine soruyla ilgili olanları seçen erişim aşaması.
+# Yorumlar BM25 ile puanlanır. Türkçe eklemeli olduğu için kelimeler ilk STEM_LENGTH harflerine indirgenir
+# ("sesi", "sesin", "sesler" -> "ses..."), böylece soru ve yorumdaki farklı çekimler eşleşir.
+import heapq
+import math
+
+from dedup import normalize_text
+
+STEM_LENGTH = 5
+MIN_WORD_LENGTH = 2
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Soruda anlam taşımayan sık kelimeler (kök biçiminde karşılaştırılır)
+STOP_WORDS = {
+    "bu", "şu", "o", "ne", "neler", "nedir", "nasıl", "mı", "mi", "mu", "mü", "ve", "ile", "için", "da", "de",
+    "ki", "var", "yok", "hakkında", "insanlar", "kişiler", "izleyiciler", "yorum", "yorumlar", "yorumlarda",
+    "diyor", "düşünüyor", "söylüyor", "the", "a", "an", "is", "are", "what", "how", "do", "does", "about",
+    "people", "say", "think", "of", "to", "in", "on",
+}
+STOP_STEMS = {word[:STEM_LENGTH] for word in STOP_WORDS}
+
+
+def stems(text):
+    return [word[:STEM_LENGTH] for word in normalize_text(text).split()
+            if len(word) >= MIN_WORD_LENGTH and word[:STEM_LENGTH] not in STOP_STEMS]
+
+
+# Yorum metinleri üzerinde BM25 dizini; bir kez kurulur, her soruda sadece sorgu kelimelerinin listeleri taranır
+class CommentIndex:
+    def __init__(self, texts):
+        self.size = len(texts)
+        self.lengths = []
+        self.postings = {}  # kök -> [(yorum sırası, geçme sayısı)]
+        for position, text in enumerate(texts):
+            counts = {}
+            for stem in stems(text):
+                counts[stem] = counts.get(stem, 0) + 1
+            self.lengths.append(sum(counts.values()))
+            for stem, count in counts.items():
+                self.postings.setdefault(stem, []).append((position, count))
+        self.average_length = (sum(self.lengths) / self.size) if self.size else 0.0
+
+    # Soruya en ilgili en fazla limit yorumun (sıra, puan) listesi, puana göre azalan; eşleşme yoksa boş liste
+    def search(self, query, limit):
+        scores = {}
+        for stem in set(stems(query)):
+            postings = self.postings.get(stem)
+            if not postings:
+                continue
+            idf = math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, count in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / (self.average_length or 1))
+                scores[position] = scores.get(position, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
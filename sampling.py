@@ -0,0 +1,121 @@
+# Token bütçesi altında en bilgilendirici yorum alt kümesini seçen örnekleme aşaması.
+# Seçim açgözlü (lazy greedy) yapılır: bir yorumun kazancı beğeni sayısı ve tekrar sayısıyla artar,
+# daha önce seçilen yorumlarda geçen kelimeleri tekrar ettikçe ve zaman dilimi doldukça azalır.
+import heapq
+import math
+import re
+
+import numpy as np
+
+TIME_BUCKETS = 6  # Yayın zamanı aralığı bu kadar dilime bölünür
+NOVELTY_FLOOR = 0.25  # Tamamen tekrar eden kelimelerden oluşan bir yorumun kazancından kalan pay
+
+LIKE_PATTERN = re.compile(r"(\d+(?:[.,\s]\d+)*)\s*([^\W\d_]*)")
+AGE_PATTERN = re.compile(r"(\d+)\s*([^\W\d_]+)")
+WORD_PATTERN = re.compile(r"\w{3,}")
+
+# Kısaltılmış beğeni sayılarındaki çarpanlar (YouTube'un farklı dillerdeki gösterimleri)
+LIKE_SUFFIXES = {
+    "k": 1_000, "b": 1_000, "bin": 1_000, "mil": 1_000, "tsd": 1_000, "тыс": 1_000,
+    "m": 1_000_000, "mn": 1_000_000, "mio": 1_000_000, "mln": 1_000_000, "млн": 1_000_000,
+}
+
+# Göreli tarih birimleri (önek -> saniye); "2 yıl önce", "3 weeks ago" vb.
+AGE_UNITS = [
+    ("sec", 1), ("san", 1), ("min", 60), ("dak", 60), ("hour", 3600), ("saa", 3600),
+    ("day", 86400), ("gün", 86400), ("week", 604800), ("haf", 604800),
+    ("mon", 2592000), ("ay", 2592000), ("year", 31536000), ("yıl", 31536000),
+]
+
+
+# "1.2K", "1,2 B", "15 bin", "1.234" gibi gösterimleri tam sayıya çevir; okunamazsa 0
+def parse_like_count(text):
+    match = LIKE_PATTERN.search(str(text or "").strip().lower())
+    if not match:
+        return 0
+    number, suffix = match.groups()
+    multiplier = LIKE_SUFFIXES.get(suffix, 1)
+    number = re.sub(r"\s", "", number)
+    if multiplier > 1:
+        # Kısaltmalı sayılarda ayraç ondalık ayraçtır ("1,2 B" = 1200)
+        return int(round(float(number.replace(",", ".")) * multiplier))
+    # Kısaltmasız sayılarda ayraçlar binlik ayracıdır ("1.234" = 1234)
+    return int(re.sub(r"[.,]", "", number))
+
+
+# "3 gün önce" / "2 years ago (edited)" gibi göreli tarihleri saniyeye çevir; okunamazsa None
+def parse_relative_age(text):
+    match = AGE_PATTERN.search(str(text or "").lower())
+    if not match:
+        return None
+    amount, unit = match.groups()
+    for prefix, seconds in AGE_UNITS:
+        if unit.startswith(prefix):
+            return int(amount) * seconds
+    return None
+
+
+# Bilinen yaşları eşit nüfuslu zaman dilimlerine ayır; yaşı bilinmeyenler ayrı bir dilime düşer
+def assign_time_buckets(ages):
+    buckets = np.full(len(ages), TIME_BUCKETS, dtype=np.int64)
+    known = np.array([age is not None for age in ages], dtype=bool)
+    if known.any():
+        known_ages = np.array([age for age in ages if age is not None], dtype=np.float64)
+        edges = np.quantile(known_ages, np.linspace(0, 1, TIME_BUCKETS + 1)[1:-1])
+        buckets[known] = np.searchsorted(edges, known_ages, side="right")
+    return buckets
+
+
+# Bütçeye sığan yorumların sıra numaralarını (orijinal sırada) ve kapsam istatistiğini döndür.
+# costs: her yorumun token maliyeti; likes/ages/multiplicities verilmezse eşit kabul edilir.
+def select_comments(texts, costs, token_budget, likes=None, ages=None, multiplicities=None):
+    count = len(texts)
+    likes = list(likes) if likes is not None else [0] * count
+    ages = list(ages) if ages is not None else [None] * count
+    multiplicities = list(multiplicities) if multiplicities is not None else [1] * count
+    buckets = assign_time_buckets(ages)
+
+    word_sets = [set(WORD_PATTERN.findall((text or "").lower())) for text in texts]
+    base_gains = [1 + math.log1p(like) + math.log1p(multiplicity - 1) for like, multiplicity in zip(likes, multiplicities)]
+    covered_words = set()
+    bucket_picks = {}
+
+    def gain(index):
+        words = word_sets[index]
+        novelty = len(words - covered_words) / len(words) if words else 1.0
+        picks = bucket_picks.get(buckets[index], 0)
+        return base_gains[index] * (NOVELTY_FLOOR + (1 - NOVELTY_FLOOR) * novelty) / math.sqrt(1 + picks)
+
+    # Kazançlar sadece azalabildiği için eski değerler üst sınırdır; sadece yığının tepesi yeniden hesaplanır
+    heap = [(-base_gains[index], index) for index in range(count)]
+    heapq.heapify(heap)
+    selected = []
+    used_tokens = 0
+    while heap:
+        _, index = heapq.heappop(heap)
+        if used_tokens + costs[index] > token_budget:
+            continue
+        current = gain(index)
+        if heap and current < -heap[0][0]:
+            heapq.heappush(heap, (-current, index))
+            continue
+        selected.append(index)
+        used_tokens += costs[index]
+        covered_words |= word_sets[index]
+        bucket_picks[buckets[index]] = bucket_picks.get(buckets[index], 0) + 1
+
+    selected.sort()
+    stats = {"analiz_edilen": len(selected), "aday_yorum": count}
+    stats.update(coverage_stats(likes, buckets, selected))
+    stats["tahmini_token"] = used_tokens
+    return selected, stats
+
+
+# Seçilen yorumların (sıra numaraları) toplam beğeniden ve zaman dilimlerinden aldığı pay
+def coverage_stats(likes, buckets, selected):
+    total_likes = sum(likes)
+    selected_likes = sum(likes[index] for index in selected)
+    return {
+        "begeni_kapsami": f"{round(selected_likes * 100 / total_likes) if total_likes else 100}%",
+        "zaman_dilimi_kapsami": f"{len({int(buckets[index]) for index in selected})}/{len(set(buckets.tolist()))}"
+    }
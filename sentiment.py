@@ -0,0 +1,152 @@
+# Ağ ve GPU gerektirmeyen, Türkçe ve İngilizce yorumlar için sözlük tabanlı duygu sınıflandırıcı.
+# Tüm yorumlar tek bir NumPy geçişinde puanlanır: her farklı kelimenin puanı bir kez hesaplanır,
+# olumsuzlama çevirmeleri ve yorum toplamları vektörel işlemlerle yapılır.
+import re
+
+import numpy as np
+
+# Kelime kökü -> puan. Türkçe ekler için kelimeler en uzun kök önekine göre eşleştirilir
+# (ör. "güzeldi" -> "güzel", "beğenmedim" -> "beğenmedi").
+POSITIVE_WORDS = {
+    # Türkçe
+    "güzel": 1, "harika": 2, "mükemmel": 2, "süper": 2, "muhteşem": 2, "iyi": 1, "başarılı": 1,
+    "başarı": 1, "beğen": 1, "seviyorum": 2, "sevdim": 2, "sevgi": 1, "teşekkür": 1, "sağol": 1,
+    "sağlık": 1, "bravo": 2, "efsane": 2, "tebrik": 1, "helal": 2, "şahane": 2, "enfes": 2,
+    "faydalı": 1, "yararlı": 1, "öğretici": 1, "eğlenceli": 1, "kral": 1, "müthiş": 2,
+    "destek": 1, "mutlu": 1, "keyif": 1, "ilham": 1, "kaliteli": 1, "anlaşılır": 1, "akıcı": 1,
+    "bayıldım": 2, "hayran": 2, "tavsiye": 1, "gurur": 1, "emeğin": 1, "emeğiniz": 1,
+    # İngilizce
+    "good": 1, "great": 2, "awesome": 2, "amazing": 2, "love": 2, "excellent": 2, "best": 2,
+    "nice": 1, "beautiful": 2, "perfect": 2, "thanks": 1, "thank": 1, "helpful": 1, "fantastic": 2,
+    "brilliant": 2, "cool": 1, "wonderful": 2, "enjoy": 1, "funny": 1, "incredible": 2,
+    "masterpiece": 2, "legend": 2, "wow": 1, "underrated": 1, "favorite": 1, "favourite": 1,
+    "respect": 1, "recommend": 1,
+}
+
+NEGATIVE_WORDS = {
+    # Türkçe
+    "kötü": -1, "berbat": -2, "rezalet": -2, "rezil": -2, "saçma": -1, "sıkıcı": -1, "boş": -1,
+    "iğrenç": -2, "nefret": -2, "beğenmedi": -1, "beğenmiyor": -1, "beğenmem": -1, "kırıklığı": -1,
+    "yalan": -1, "sahte": -1, "abartı": -1, "gereksiz": -1, "vasat": -1, "çöp": -2, "korkunç": -2,
+    "facia": -2, "yanlış": -1, "kandır": -1, "dolandırıcı": -2, "üzücü": -1, "üzgün": -1,
+    "sinir": -1, "bıktım": -1, "tiksin": -2, "maalesef": -1, "yazık": -1, "şikayet": -1,
+    "kalitesiz": -1, "anlamsız": -1, "kaybı": -1, "boktan": -2, "bozuk": -1, "sorun": -1,
+    # İngilizce
+    "bad": -1, "worst": -2, "terrible": -2, "awful": -2, "hate": -2, "boring": -1, "stupid": -1,
+    "dislike": -1, "disappoint": -1, "poor": -1, "waste": -1, "useless": -1, "fake": -1,
+    "clickbait": -1, "annoying": -1, "wrong": -1, "horrible": -2, "trash": -2, "garbage": -2,
+    "sad": -1, "cringe": -1, "scam": -2, "lame": -1, "overrated": -1,
+}
+
+POSITIVE_EMOJIS = "😀😃😄😁😆😊😍🥰😘👍👏❤💕💖🔥💯🙏😂🤣✨💪🎉🥳👌"
+NEGATIVE_EMOJIS = "👎😡😠🤬😢😭😞😒🙄💩🤮😤💔"
+
+# Kendinden sonraki kelimeyi olumsuzlayanlar (İngilizce: "not good")
+NEGATORS_BEFORE = {"not", "no", "never", "dont", "don't", "didnt", "didn't", "isnt", "isn't",
+                   "wasnt", "wasn't", "doesnt", "doesn't", "cant", "can't", "hiç"}
+# Kendinden önceki kelimeyi olumsuzlayanlar (Türkçe: "güzel değil")
+NEGATORS_AFTER_PREFIX = "değil"
+
+# Önek eşleşmesi için en kısa kök uzunluğu; daha kısa kökler sadece tam eşleşir
+MIN_PREFIX_LENGTH = 4
+
+TOKEN_PATTERN = re.compile(r"[\w']+|[^\w\s]")
+
+LABEL_POSITIVE = 1
+LABEL_NEUTRAL = 0
+LABEL_NEGATIVE = -1
+
+
+# Türkçe büyük "İ" harfini doğru küçült, sonra kelimelere böl
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.replace("İ", "i").lower())
+
+
+class LexiconSentimentAnalyzer:
+    def __init__(self, positive_words=None, negative_words=None):
+        self.lexicon = dict(positive_words or POSITIVE_WORDS)
+        self.lexicon.update(negative_words or NEGATIVE_WORDS)
+        for emoji in POSITIVE_EMOJIS:
+            self.lexicon[emoji] = 1
+        for emoji in NEGATIVE_EMOJIS:
+            self.lexicon[emoji] = -1
+        self._max_stem_length = max(len(word) for word in self.lexicon)
+        self._token_cache = {}
+
+    # Bir kelimenin puanı: tam eşleşme, yoksa en uzun kök öneki
+    def _token_score(self, token):
+        score = self._token_cache.get(token)
+        if score is not None:
+            return score
+        score = self.lexicon.get(token, 0)
+        if not score:
+            for length in range(min(len(token), self._max_stem_length), MIN_PREFIX_LENGTH - 1, -1):
+                score = self.lexicon.get(token[:length], 0)
+                if score:
+                    break
+        self._token_cache[token] = score
+        return score
+
+    # Tüm yorumların ham puanlarını tek geçişte hesapla
+    def score(self, texts):
+        vocabulary = {}
+        token_ids = []
+        doc_ids = []
+        for doc_index, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            doc_ids.extend([doc_index] * len(tokens))
+
+        if not token_ids:
+            return np.zeros(len(texts), dtype=np.float64)
+
+        words = list(vocabulary)
+        vocab_scores = np.fromiter((self._token_score(w) for w in words), dtype=np.float64, count=len(words))
+        negates_next = np.fromiter((w in NEGATORS_BEFORE for w in words), dtype=bool, count=len(words))
+        negates_previous = np.fromiter((w.startswith(NEGATORS_AFTER_PREFIX) for w in words), dtype=bool, count=len(words))
+
+        token_ids = np.asarray(token_ids, dtype=np.int64)
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        token_scores = vocab_scores[token_ids]
+
+        # Olumsuzlama yorum sınırını aşmamalı
+        same_doc = doc_ids[1:] == doc_ids[:-1]
+        flip = np.zeros(len(token_ids), dtype=bool)
+        flip[1:] |= negates_next[token_ids[:-1]] & same_doc
+        flip[:-1] |= negates_previous[token_ids[1:]] & same_doc
+        token_scores = np.where(flip, -token_scores, token_scores)
+
+        return np.bincount(doc_ids, weights=token_scores, minlength=len(texts))
+
+    # Her yorum için 1 (pozitif), 0 (nötr) veya -1 (negatif) etiketi
+    def classify(self, texts):
+        return np.sign(self.score(texts)).astype(np.int8)
+
+
+# Etiketlerden yüzdelik dağılım hesapla; yüzdeler toplamı her zaman 100 olur
+def label_distribution(labels):
+    labels = np.asarray(labels)
+    total = len(labels)
+    if not total:
+        return {"pozitif": "0%", "negatif": "0%", "notr": "100%"}
+    counts = np.array([
+        np.count_nonzero(labels == LABEL_POSITIVE),
+        np.count_nonzero(labels == LABEL_NEGATIVE),
+        np.count_nonzero(labels == LABEL_NEUTRAL),
+    ])
+    exact = counts * 100.0 / total
+    percents = np.floor(exact).astype(int)
+    # En büyük kalan yöntemiyle yuvarla
+    for index in np.argsort(-(exact - percents))[:100 - percents.sum()]:
+        percents[index] += 1
+    return {"pozitif": f"{percents[0]}%", "negatif": f"{percents[1]}%", "notr": f"{percents[2]}%"}
+
+
+default_analyzer = LexiconSentimentAnalyzer()
+
+
+# Yorum sözlüklerinden (textDisplay) duygu dağılımı üret
+def comment_sentiment_distribution(comments, analyzer=None):
+    analyzer = analyzer or default_analyzer
+    labels = analyzer.classify([comment.get("textDisplay", "") for comment in comments])
+    return label_distribution(labels)
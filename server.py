@@ -1,23 +1,52 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, g
 from flask_cors import CORS
 import time
 import re
+import queue
+import threading
+import atexit
+import contextvars
+import uuid
+import sqlite3
+import html
+import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 import os
 import logging
 import google.generativeai as genai
 import json
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
+from sentiment import comment_sentiment_distribution
+from dedup import group_near_duplicates, normalize_text
+from retrieval import CommentIndex
+from sampling import assign_time_buckets, coverage_stats, parse_like_count, parse_relative_age, select_comments
+from gemini_client import ERROR_FATAL, GeminiCallError, GeminiClient, classify_error
+from analysis_schema import (ANSWER_FIELDS, CHANGE_FIELDS, QUALITATIVE_FIELDS, SENTIMENT_FIELDS, SENTIMENT_KEYS, SectionStreamParser, analysis_fields,
+                             normalize_sentiment, parse_json_object, parse_percentage, response_schema, validate_analysis)
+from metrics import registry as metrics_registry, span, start_trace, current_trace
 
 # Logging ayarları
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Prometheus metrikleri (/metrics); aşama süreleri metrics.span ile yazılır
+REQUESTS_TOTAL = metrics_registry.counter("yorum_http_requests_total", "HTTP requests by endpoint and status", ["endpoint", "method", "status"])
+REQUEST_SECONDS = metrics_registry.histogram("yorum_http_request_duration_seconds", "HTTP request duration", ["endpoint"])
+PROMPT_TOKENS = metrics_registry.histogram("yorum_prompt_tokens", "Estimated prompt size per Gemini call", buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000))
+CACHE_LOOKUPS = metrics_registry.counter("yorum_cache_lookups_total", "Result cache lookups", ["result"])
+GEMINI_CALLS = metrics_registry.counter("yorum_gemini_calls_total", "Gemini call layer outcomes since start", ["outcome"])
+GEMINI_CIRCUIT_OPEN = metrics_registry.gauge("yorum_gemini_circuit_open", "1 while the Gemini circuit breaker is open")
+JOBS_PENDING = metrics_registry.gauge("yorum_jobs_pending", "Queued and running background jobs")
+
 # API anahtarını çevre değişkeninden yükle
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 
@@ -52,210 +81,746 @@ chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x
 # ChromeDriver yolunu manuel olarak ayarla
 CHROME_DRIVER_PATH = "chromedriver.exe"  # ChromeDriver'ın yolunu projenin kök dizinine göre ayarlayın
 
+# Tarayıcı havuzu ayarları (çevre değişkenleri ile değiştirilebilir)
+CHROME_POOL_SIZE = int(os.environ.get("CHROME_POOL_SIZE", "2"))  # Aynı anda açık tutulacak en fazla tarayıcı
+CHROME_DRIVER_MAX_USES = int(os.environ.get("CHROME_DRIVER_MAX_USES", "50"))  # Bu kadar kullanımdan sonra tarayıcı yenilenir
+CHROME_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("CHROME_POOL_ACQUIRE_TIMEOUT", "120"))  # Boş tarayıcı için en fazla bekleme (sn)
+
+# Önceden açılmış Chrome oturumlarını tekrar kullanan sınırlı havuz
+class ChromeDriverPool:
+    def __init__(self, size, max_uses, acquire_timeout):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()  # En son kullanılan (sıcak) tarayıcı önce verilir
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _create_driver(self):
+        service = Service(executable_path=CHROME_DRIVER_PATH)
+        driver = webdriver.Chrome(service=service, options=chrome_options)
+        with self._lock:
+            self._uses[id(driver)] = 0
+        logging.info("Launched new Chrome session for pool")
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.debug(f"Error quitting Chrome session: {str(e)}")
+
+    # Tarayıcının hâlâ yanıt verip vermediğini kontrol et
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script("return 1;") == 1 and len(driver.window_handles) > 0
+        except Exception:
+            return False
+
+    # Bir sonraki istek önceki oturumdan iz taşımasın diye tarayıcıyı temizle
+    def _reset(self, driver):
+        try:
+            driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+        except Exception:
+            pass
+        try:
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                "origin": "https://www.youtube.com",
+                "storageTypes": "all"
+            })
+        except Exception as e:
+            logging.debug(f"CDP storage clear failed: {str(e)}")
+        driver.delete_all_cookies()
+        driver.get("about:blank")
+
+    # Havuzu önceden doldur, böylece ilk istekler de tarayıcı açılışını beklemez
+    def warm_up(self):
+        launched = []
+        for _ in range(self.size):
+            if not self._slots.acquire(blocking=False):
+                break
+            try:
+                launched.append(self._create_driver())
+            except Exception as e:
+                self._slots.release()
+                logging.error(f"Could not pre-launch Chrome session: {str(e)}")
+                break
+        for driver in launched:
+            self._idle.put(driver)
+            self._slots.release()
+        logging.info(f"Chrome pool warmed up with {len(launched)} sessions")
+
+    def acquire(self):
+        if self._closed:
+            raise Exception("Tarayıcı havuzu kapatıldı")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise Exception("Tüm tarayıcılar meşgul, lütfen daha sonra tekrar deneyin")
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._create_driver()
+                if self._is_healthy(driver):
+                    return driver
+                logging.warning("Discarding unhealthy Chrome session")
+                self._discard(driver)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, broken=False):
+        try:
+            with self._lock:
+                uses = self._uses.get(id(driver), 0) + 1
+                self._uses[id(driver)] = uses
+            if broken or self._closed or uses >= self.max_uses:
+                logging.info(f"Recycling Chrome session after {uses} uses (broken={broken})")
+                self._discard(driver)
+                return
+            try:
+                self._reset(driver)
+            except Exception as e:
+                logging.warning(f"Chrome session reset failed, recycling: {str(e)}")
+                self._discard(driver)
+                return
+            self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+driver_pool = ChromeDriverPool(CHROME_POOL_SIZE, CHROME_DRIVER_MAX_USES, CHROME_POOL_ACQUIRE_TIMEOUT)
+atexit.register(driver_pool.shutdown)
+
 # URL'den video kimliğini çıkar
+# İzleme sayfası ve yorum API'si için kök adres (ör. benchmark'larda yerel kayıt sunucusu)
+YOUTUBE_BASE_URL = os.environ.get("YOUTUBE_BASE_URL", "https://www.youtube.com").rstrip("/")
+
 def extract_video_id(url):
     youtube_regex = r'(?:youtube\.com\/(?:[^\/\n\s]+\/\S+\/|(?:v|e(?:mbed)?)\/|\S*?[?&]v=)|youtu\.be\/)([a-zA-Z0-9_-]{11})'
     match = re.search(youtube_regex, url)
     return match.group(1) if match else None
 
-# Yorumları Gemini API ile analiz et
-def analyze_comments_with_gemini(video_title, comments):
-    try:
-        logging.info(f"Analyzing {len(comments)} comments with Gemini API")
-        
-        # Mevcut modelleri listele
-        available_models = list_available_models()
-        
-        # Gemini'den cevap için maksimum token sınırlaması, çok uzun yorumlar için
-        MAX_COMMENT_LENGTH = 400
-        # MAX_COMMENTS_TO_ANALYZE = min(len(comments), 100)  # En fazla 100 yorum analiz edilsin (KALDIRILDI)
-        
-        # UYARI: Çok fazla yorumda API token limiti aşılabilir!
-        if len(comments) > 200:
-            logging.warning("Çok fazla yorum analiz ediliyor. Gemini API token limiti aşılabilir!")
-        
-        # Yorumları formatlı string olarak birleştir
-        formatted_comments = []
-        for i, comment in enumerate(comments):  # TÜM YORUMLAR
-            # Yorum metni çok uzunsa kısalt
-            text = comment["textDisplay"]
-            if len(text) > MAX_COMMENT_LENGTH:
-                text = text[:MAX_COMMENT_LENGTH] + "..."
-                
-            formatted_comment = f"Yorum {i+1}: \"{text}\" - {comment['authorDisplayName']}"
-            formatted_comments.append(formatted_comment)
-        
-        # Yorumları tek bir string'e dönüştür
-        all_comments_text = "\n".join(formatted_comments)
-        
-        # Güncel Gemini model adını kullan - gemini-1.5-flash yeni önerilen model
-        model_name = "gemini-1.5-flash"
-        
-        # Mevcut modeller içinde uygun bir model bul
-        if available_models:
-            for m in available_models:
-                if "gemini-1.5" in m.lower():
-                    model_name = m
-                    logging.info(f"Using model: {model_name}")
-                    break
-        
-        try:
-            model = genai.GenerativeModel(model_name)
-        except Exception as model_error:
-            logging.error(f"Error creating model with {model_name}: {str(model_error)}")
-            # Alternatif güncel modelleri dene
-            fallback_models = ["gemini-1.5-flash", "gemini-1.5-pro", "gemini-1.0-pro-latest"]
-            
-            model = None
-            for fallback_model in fallback_models:
-                try:
-                    model = genai.GenerativeModel(fallback_model)
-                    model_name = fallback_model
-                    logging.info(f"Successfully created model with fallback: {model_name}")
-                    break
-                except Exception as fallback_error:
-                    logging.error(f"Error creating model with {fallback_model}: {str(fallback_error)}")
+# Gemini'den cevap için maksimum token sınırlaması, çok uzun yorumlar için
+MAX_COMMENT_LENGTH = 400
+# Tahmini prompt boyutu bu sınırı aşarsa yorumlar parçalara bölünüp paralel analiz edilir
+ANALYSIS_BATCH_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_BATCH_TOKEN_BUDGET", "8000"))
+ANALYSIS_MAX_WORKERS = int(os.environ.get("ANALYSIS_MAX_WORKERS", "4"))  # Aynı anda en fazla kaç parça analiz edilir
+
+GENERATION_CONFIG = {
+    "temperature": 0.9,
+    "top_p": 1,
+    "top_k": 1,
+    "max_output_tokens": 4096,  # Daha uzun yanıtlar alabilmek için arttırıldı
+}
+
+# Güncel safety settings formatını kullan
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+]
+
+# Süreç genelinde aynı anda yapılabilecek en fazla Gemini çağrısı (toplu analizler dahil)
+GEMINI_MAX_CONCURRENCY = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+# Süreç genelinde dakika başına istek ve prompt token sınırı (0 = sınırsız)
+GEMINI_REQUESTS_PER_MINUTE = int(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_TOKENS_PER_MINUTE = int(os.environ.get("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "4"))
+# Üst üste bu kadar geçici hatadan sonra çağrılar GEMINI_CIRCUIT_RESET_TIMEOUT sn boyunca hemen reddedilir
+GEMINI_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("GEMINI_CIRCUIT_FAILURE_THRESHOLD", "5"))
+GEMINI_CIRCUIT_RESET_TIMEOUT = float(os.environ.get("GEMINI_CIRCUIT_RESET_TIMEOUT", "30"))
+
+gemini_client = GeminiClient(
+    max_concurrency=GEMINI_MAX_CONCURRENCY,
+    requests_per_minute=GEMINI_REQUESTS_PER_MINUTE,
+    tokens_per_minute=GEMINI_TOKENS_PER_MINUTE,
+    max_retries=GEMINI_MAX_RETRIES,
+    failure_threshold=GEMINI_CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=GEMINI_CIRCUIT_RESET_TIMEOUT
+)
+
+# Kaba token tahmini (Gemini için ortalama ~4 karakter = 1 token)
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+# Yorumları "Yorum N: ..." satırlarına dönüştür
+# counts verilirse birden fazla kez geçen yorumlara "[N benzer yorum]" eklenir
+def format_comments(comments, counts=None):
+    formatted_comments = []
+    for i, comment in enumerate(comments):  # TÜM YORUMLAR
+        # Yorum metni çok uzunsa kısalt
+        text = comment["textDisplay"]
+        if len(text) > MAX_COMMENT_LENGTH:
+            text = text[:MAX_COMMENT_LENGTH] + "..."
             
-            if not model:
-                raise Exception("Hiçbir Gemini modeli oluşturulamadı. API anahtarınızı kontrol edin.")
+        formatted_comment = f"Yorum {i+1}: \"{text}\" - {comment['authorDisplayName']}"
+        if counts and counts[i] > 1:
+            formatted_comment += " " + DUPLICATE_MARKER.format(n=counts[i])
+        # Açılmış yanıtlar üst yorumun altında girintili satırlar olarak eklenir
+        for reply in comment.get("replies") or []:
+            reply_text = reply["textDisplay"]
+            if len(reply_text) > MAX_COMMENT_LENGTH:
+                reply_text = reply_text[:MAX_COMMENT_LENGTH] + "..."
+            formatted_comment += f"\n    ↳ Yanıt: \"{reply_text}\" - {reply['authorDisplayName']}"
+        formatted_comments.append(formatted_comment)
+    return formatted_comments
+
+# Tekrar birleştirme ayarları
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "1") == "1"
+DEDUP_SIMILARITY_THRESHOLD = float(os.environ.get("DEDUP_SIMILARITY_THRESHOLD", "0.8"))
+# Birleştirilmiş satırın sonuna eklenen ek; sayıyı okuyan desen de bu biçimden üretilir
+DUPLICATE_MARKER = "[{n} benzer yorum]"
+DUPLICATE_COUNT_PATTERN = re.compile(" " + re.escape(DUPLICATE_MARKER).replace(re.escape("{n}"), r"(\d+)") + "$")
+
+# Formatlanmış yorum satırlarının temsil ettiği yorum sayısı ("[N benzer yorum]" ile birleştirilmiş satır N yorumdur)
+def represented_comment_count(formatted_comments):
+    total = 0
+    for line in formatted_comments:
+        match = DUPLICATE_COUNT_PATTERN.search(line.split("\n", 1)[0])
+        total += int(match.group(1)) if match else 1
+    return total
+
+# Aynı ve neredeyse aynı yorumları tek satırda topla.
+# (temsilci yorumlar, her temsilcinin grubundaki yorum sıra numaraları, token tasarrufu istatistiği) döndürür.
+def collapse_duplicate_comments(comments):
+    if not DEDUP_ENABLED or len(comments) < 2:
+        return comments, [[i] for i in range(len(comments))], None
+    groups = group_near_duplicates([comment["textDisplay"] for comment in comments], DEDUP_SIMILARITY_THRESHOLD)
+    representatives = [comments[group[0]] for group in groups]
+    counts = [len(group) for group in groups]
+
+    tokens_before = estimate_tokens("\n".join(format_comments(comments)))
+    tokens_after = estimate_tokens("\n".join(format_comments(representatives, counts)))
+    stats = {
+        "orijinal_yorum": len(comments),
+        "benzersiz_yorum": len(representatives),
+        "tahmini_token_once": tokens_before,
+        "tahmini_token_sonra": tokens_after,
+        "tasarruf_edilen_token": max(0, tokens_before - tokens_after)
+    }
+    logging.info(f"Collapsed {len(comments)} comments into {len(representatives)} unique lines, saving ~{stats['tasarruf_edilen_token']} tokens")
+    return representatives, groups, stats
+
+# Tüm analiz çağrılarına giden yorum satırlarının toplam token üst sınırı (0 = sınırsız)
+ANALYSIS_MAX_PROMPT_TOKENS = int(os.environ.get("ANALYSIS_MAX_PROMPT_TOKENS", str(3 * ANALYSIS_BATCH_TOKEN_BUDGET)))
+
+# Temsilci yorumlar bütçeyi aşıyorsa beğeni, kelime çeşitliliği ve zaman kapsamına göre örnekle.
+# Yorum sözlükleri değiştirilmez (önbelleğe ve API yanıtına aynen gider); analize giren yorum sayısı istatistikte döner.
+# (örneklenen temsilciler, tekrar sayıları, örnekleme istatistiği) döndürür; örnekleme gerekmezse istatistik None.
+# token_budget verilmezse ANALYSIS_MAX_PROMPT_TOKENS kullanılır.
+def sample_comments_for_prompt(comments, representatives, groups, token_budget=None):
+    token_budget = ANALYSIS_MAX_PROMPT_TOKENS if token_budget is None else token_budget
+    counts = [len(group) for group in groups]
+    costs = [estimate_tokens(line) + 1 for line in format_comments(representatives, counts)]
+    if token_budget <= 0 or sum(costs) <= token_budget:
+        return representatives, counts, None
+
+    selected, stats = select_comments(
+        [comment["textDisplay"] for comment in representatives],
+        costs,
+        token_budget,
+        likes=[parse_like_count(comment.get("likeCount")) for comment in representatives],
+        ages=[parse_relative_age(comment.get("publishedAt")) for comment in representatives],
+        multiplicities=counts
+    )
+    stats["kapsanan_yorum"] = sum(counts[position] for position in selected)
+    stats["toplam_yorum"] = len(comments)
+    logging.info(f"Sampled {len(selected)} of {len(representatives)} unique comments within {token_budget} prompt tokens")
+    return [representatives[position] for position in selected], [counts[position] for position in selected], stats
+
+# Analiz için prompt oluştur (Türkçe)
+# include_sentiment=False ise duygu dağılımı yerel modelden gelir, model sadece niteliksel alanları üretir
+# previous_analysis verilirse yorumlar o analizden sonra gelen yeni yorumlardır; model ayrıca neyin değiştiğini özetler
+# Prompt şablonundaki duygu dağılımı örneği: şemalı çıktıda şema tam sayı ister, şemasız yanıtta "60%" gibi metin istenir
+def sentiment_example(structured, values=(60, 30, 10)):
+    return json.dumps({key: value if structured else f"{value}%" for key, value in zip(SENTIMENT_KEYS, values)})
+
+# Prompt'un yanıt şablonu; structured verilmezse STRUCTURED_OUTPUT ayarı kullanılır
+def build_analysis_prompt(video_title, total_count, formatted_comments, include_sentiment=True, previous_analysis=None, structured=None):
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    all_comments_text = "\n".join(formatted_comments)
+    tasks = [
+        "Öne Çıkan Konular: İnsanların en çok bahsettiği konular neler? Önemli konuları frekanslarına göre sırala.",
+        "Video Hakkında Genel Görüş: İzleyiciler video hakkında genel olarak ne düşünüyor? Detaylı bir özet sun.",
+        "Tartışmalı/İlgi Çeken Noktalar: Yorumlarda tartışma yaratan veya özellikle ilgi gören noktalar neler?",
+        "Öneriler veya İstekler: Kullanıcıların videonun içeriği veya gelecek içerikler hakkında önerileri var mı?",
+        "Özet: Video ve izleyici tepkileri hakkında kısa bir özet."
+    ]
+    sentiment_schema = ""
+    closing = "Yukarıdaki şablonu kullanarak JSON formatında yanıt ver."
+    if include_sentiment:
+        tasks.insert(0, "Genel Duygu Analizi: Yorumların genel duygu tonu nedir (pozitif, negatif, nötr, karışık)? Yüzde olarak dağılım tahmin et.")
+        sentiment_schema = f""""genel_duygu": {sentiment_example(structured)},
+            """
+        if structured:
+            closing += " genel_duygu değerlerini örnekteki gibi toplamı 100 olan 0-100 arası tam sayı yüzdeler olarak ver."
+        else:
+            closing += ' genel_duygu değerlerini örnekteki gibi "60%" biçiminde gerçek yüzdeler olarak ver.'
+    task_lines = "\n        ".join(f"{i + 1}. {task}" for i, task in enumerate(tasks))
+    multiplicity_note = ""
+    if any(DUPLICATE_COUNT_PATTERN.search(line.split("\n", 1)[0]) for line in formatted_comments):
+        multiplicity_note = f"Bir yorumun sonundaki {DUPLICATE_MARKER.format(n='N')} ifadesi, o yorumla aynı veya neredeyse aynı N yorum yapıldığını gösterir; konuların ve duyguların yaygınlığını değerlendirirken bunu dikkate al.\n        "
+    previous_section = ""
+    change_schema = ""
+    if previous_analysis:
+        previous = {k: previous_analysis.get(k) for k in ("genel_duygu", "genel_izlenim", "one_cikan_konular", "tartismali_noktalar", "ozet")}
+        previous_section = f"""Bu yorumlar, daha önceki yorumlara dayanan aşağıdaki analizden SONRA yazılmış yeni yorumlardır:
+        {json.dumps(previous, ensure_ascii=False)}
+        Raporu sadece yeni yorumlara göre hazırla; ayrıca önceki analizde olmayan konuları ve neyin değiştiğini belirt.
         
-        # Analiz için prompt oluştur (Türkçe)
-        prompt = f"""
-        Bu bir YouTube videosu analiz görevidir. Video başlığı: "{video_title}" ve videoya yapılmış toplam {len(comments)} yorumdan {len(formatted_comments)} tanesini analiz edeceksin.
+        """
+        change_schema = ''',
+            "yeni_konular": ["Önceki analizde olmayan konu 1", ...],
+            "degisim_ozeti": "Önceki analize göre neyin değiştiğinin kısa özeti"'''
+    return f"""
+        Bu bir YouTube videosu analiz görevidir. Video başlığı: "{video_title}" ve videoya yapılmış toplam {total_count} yorumdan {len(formatted_comments)} tanesini analiz edeceksin.
         
         Yorumlar:
         {all_comments_text}
         
-        Bu yorumları detaylı olarak analiz et ve şu bilgileri içeren kapsamlı bir rapor hazırla:
+        {previous_section}{multiplicity_note}Bu yorumları detaylı olarak analiz et ve şu bilgileri içeren kapsamlı bir rapor hazırla:
         
-        1. Genel Duygu Analizi: Yorumların genel duygu tonu nedir (pozitif, negatif, nötr, karışık)? Yüzde olarak dağılım tahmin et.
-        2. Öne Çıkan Konular: İnsanların en çok bahsettiği konular neler? Önemli konuları frekanslarına göre sırala.
-        3. Video Hakkında Genel Görüş: İzleyiciler video hakkında genel olarak ne düşünüyor? Detaylı bir özet sun.
-        4. Tartışmalı/İlgi Çeken Noktalar: Yorumlarda tartışma yaratan veya özellikle ilgi gören noktalar neler?
-        5. Öneriler veya İstekler: Kullanıcıların videonun içeriği veya gelecek içerikler hakkında önerileri var mı?
-        6. Özet: Video ve izleyici tepkileri hakkında kısa bir özet.
+        {task_lines}
         
         Raporun her bölümünde yorumlarda geçen konkret örnekler ve kanıtlar kullan. 
         Analiz net, objektif ve detaylı olmalı. Lütfen sadece mevcut yorumlara dayanan bir analiz yapın, varsayımlardan kaçının.
         Cevabı JSON formatında olmalı ve aşağıdaki yapıyı takip etmelidir:
 
         {{
-            "genel_duygu": {{
-                "pozitif": "yüzde_değeri",
-                "negatif": "yüzde_değeri",
-                "notr": "yüzde_değeri"
-            }},
-            "genel_izlenim": "Genel izlenimin kısa özeti",
+            {sentiment_schema}"genel_izlenim": "Genel izlenimin kısa özeti",
             "one_cikan_konular": ["Konu 1", "Konu 2", "Konu 3", ...],
             "tartismali_noktalar": ["Tartışmalı nokta 1", "Tartışmalı nokta 2", ...],
             "oneriler": ["Öneri 1", "Öneri 2", ...],
-            "ozet": "Detaylı özet"
+            "ozet": "Detaylı özet"{change_schema}
         }}
 
-        Yukarıdaki şablonu kullanarak JSON formatında yanıt ver. Yüzde_değeri yerine "60%" gibi gerçek değerler kullan.
+        {closing}
         """
-        
+
+# Gemini yanıtındaki JSON'u ayıkla, onar (kesik JSON, sondaki virgüller) ve beklenen alanlara göre doğrula.
+# (analiz, eksik alanlar) döndürür; beklenen alanlardan hiçbiri kurtarılamazsa analiz bir hata sözlüğüdür.
+def parse_analysis_response(response_text, fields=None):
+    fields = fields or analysis_fields()
+    analysis, missing = validate_analysis(parse_json_object(response_text), fields)
+    if analysis is None or len(missing) == len(fields):
+        logging.error("Could not recover any analysis field from the Gemini response")
+        return {
+            "error": "JSON formatı bulunamadı" if analysis is None else "Yanıttaki JSON beklenen alanları içermiyor",
+            "raw_response": response_text
+        }, list(fields)
+    return analysis, missing
+
+# Yanıtı şemaya bağlı JSON olarak iste (1) ya da sadece prompt'taki şablona güven (0)
+STRUCTURED_OUTPUT = os.environ.get("STRUCTURED_OUTPUT", "1") == "1"
+# Şemalı çıktıyı reddeden modeller; bunlara sonraki çağrılarda şema gönderilmez
+_unstructured_models = set()
+# Şemalı çıktının reddedildiğini gösteren hata metinleri (400 InvalidArgument ya da istemci kütüphanesinin şema hatası)
+SCHEMA_REJECTION_MARKERS = ("response_schema", "response_mime_type", "schema", "mime type", "mimetype", "json mode")
+
+# Bu modele yanıt şeması gönderiliyor mu
+def structured_output_enabled(model_name):
+    return STRUCTURED_OUTPUT and model_name not in _unstructured_models
+
+# Kalıcı hata gerçekten şemalı çıktıyla mı ilgili (geçersiz anahtar, bulunamayan model vb. değil)
+def is_schema_rejection(error):
+    if error.kind != ERROR_FATAL:
+        return False
+    message = f"{error} {error.__cause__ or ''}".lower()
+    return any(marker in message for marker in SCHEMA_REJECTION_MARKERS)
+
+# Modeli ortak çağrı katmanı (tekrar deneme, hız sınırı, devre kesici) üzerinden çağır ve yanıt metnini döndür.
+# Model response_schema'yı geçersiz istek olarak reddederse çağrı bir kez şemasız tekrarlanır ve model hatırlanır;
+# başka kalıcı hatalar (yetki, model adı vb.) olduğu gibi iletilir.
+# on_chunk verilirse yanıt akış halinde istenir (bkz. GeminiClient.generate).
+def request_analysis(model, model_name, prompt, fields, on_chunk=None):
+    logging.info(f"Sending request to Gemini API with model {model_name}")
+    prompt_tokens = estimate_tokens(prompt)
+    PROMPT_TOKENS.observe(prompt_tokens)
+    structured = structured_output_enabled(model_name)
+    config = GENERATION_CONFIG
+    if structured:
+        config = dict(GENERATION_CONFIG, response_mime_type="application/json", response_schema=response_schema(fields))
+    with span("gemini"):
         try:
-            # Gemini API'ye istek gönder
-            generation_config = {
-                "temperature": 0.9,
-                "top_p": 1,
-                "top_k": 1,
-                "max_output_tokens": 4096,  # Daha uzun yanıtlar alabilmek için arttırıldı
-            }
-            
-            # Güncel safety settings formatını kullan
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-                }
-            ]
-            
-            # Model API'sini hata yönetimi ile çağır
-            response = None
+            return gemini_client.generate(model, prompt, estimated_tokens=prompt_tokens, on_chunk=on_chunk, generation_config=config, safety_settings=SAFETY_SETTINGS)
+        except GeminiCallError as e:
+            if not structured or not is_schema_rejection(e):
+                raise
+            logging.warning(f"Model {model_name} rejected structured output, retrying without a schema: {str(e)}")
+            _unstructured_models.add(model_name)
+        return gemini_client.generate(model, prompt, estimated_tokens=prompt_tokens, on_chunk=on_chunk, generation_config=GENERATION_CONFIG, safety_settings=SAFETY_SETTINGS)
+
+# Eksik kalan niteliksel alanları tamamlat: yorumlar tekrar gönderilmez, elde edilen alanlar bağlam olarak verilir.
+# Duygu dağılımı yorumlar olmadan tahmin edilemeyeceği için istenmez; çağıran yerel modele düşer.
+def complete_missing_fields(model, model_name, analysis, missing):
+    logging.info(f"Re-prompting {model_name} for missing fields: {', '.join(missing)}")
+    known = {field: analysis[field] for field in QUALITATIVE_FIELDS + CHANGE_FIELDS + ANSWER_FIELDS if field in analysis}
+    prompt = f"""
+        Bir YouTube videosunun yorum analizi yarım kaldı. Analizin elde edilen kısmı:
+        {json.dumps(known, ensure_ascii=False)}
+
+        Bu bilgilere dayanarak sadece şu alanları üret: {", ".join(missing)}.
+        Cevabı sadece bu alanları içeren JSON olarak ver.
+        """
+    try:
+        with span("json_repair"):
+            response_text = request_analysis(model, model_name, prompt, missing)
+            completion, still_missing = parse_analysis_response(response_text, missing)
+        if "error" not in completion:
+            analysis.update({field: completion[field] for field in missing if field in completion})
+        if still_missing:
+            logging.warning(f"Fields still missing after re-prompt: {', '.join(still_missing)}")
+    except Exception as e:
+        logging.warning(f"Could not complete missing fields: {str(e)}")
+    return analysis
+
+# Yanıtı akış halinde iste ve bölümleri kapandıkça ilet (0 = yanıtın tamamını bekle)
+ANALYSIS_STREAMING = os.environ.get("ANALYSIS_STREAMING", "1") == "1"
+
+# Akan yanıt parçalarını izleyip beklenen alanlardan kapananları doğrulanmış olarak on_section(alan, değer)'e ileten geri çağrı
+def section_relay(fields, on_section):
+    parser = SectionStreamParser()
+
+    def on_chunk(text):
+        for field, value in parser.feed(text):
+            if field not in fields:
+                continue
+            section, missing = validate_analysis({field: value}, (field,))
+            if not missing:
+                on_section(field, section[field])
+    return on_chunk
+
+# Analiz prompt'unu gönder, yanıtı doğrula ve sadece eksik alanlar için kısa bir tamamlama isteği yap
+# fields: prompt'un beklediği alanlar (varsayılan: duygu dağılımı + niteliksel alanlar)
+# on_section verilirse (ve ANALYSIS_STREAMING açıksa) her bölüm, yanıtın geri kalanı beklenmeden on_section(alan, değer) ile iletilir
+def generate_analysis(model, model_name, prompt, fields=None, on_section=None):
+    fields = fields or analysis_fields()
+    on_chunk = section_relay(fields, on_section) if on_section and ANALYSIS_STREAMING else None
+    response_text = request_analysis(model, model_name, prompt, fields, on_chunk)
+    with span("json_parse"):
+        analysis, missing = parse_analysis_response(response_text, fields)
+    missing = [field for field in missing if field not in SENTIMENT_FIELDS]
+    if "error" not in analysis and missing:
+        analysis = complete_missing_fields(model, model_name, analysis, missing)
+    return analysis
+
+# Yorumları token bütçesini aşmayacak parçalara böl
+def split_into_batches(formatted_comments, token_budget):
+    batches = []
+    current = []
+    current_tokens = 0
+    for line in formatted_comments:
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > token_budget:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+# Parça duygu dağılımlarını parçanın temsil ettiği yorum sayısına göre ağırlıklandırarak birleştir
+def merge_sentiments(partials):
+    totals = {"pozitif": 0.0, "negatif": 0.0, "notr": 0.0}
+    total_weight = 0
+    for weight, analysis in partials:
+        sentiment = analysis.get("genel_duygu") or {}
+        if not sentiment:
+            continue
+        for key in totals:
+            totals[key] += parse_percentage(sentiment.get(key)) * weight
+        total_weight += weight
+    normalized = normalize_sentiment(totals) if total_weight else None
+    if not normalized:
+        return {"pozitif": "0%", "negatif": "0%", "notr": "100%"}
+    return {key: f"{percent}%" for key, percent in normalized.items()}
+
+# Listeleri tekrar sayısına göre sıralayarak birleştir (birleştirme çağrısı başarısız olursa kullanılır)
+def merge_lists_locally(partials, field, limit=10):
+    counts = {}
+    labels = {}
+    for _, analysis in partials:
+        for item in analysis.get(field) or []:
+            key = str(item).strip().lower()
+            counts[key] = counts.get(key, 0) + 1
+            labels.setdefault(key, str(item).strip())
+    ranked = sorted(counts, key=lambda k: -counts[k])
+    return [labels[k] for k in ranked[:limit]]
+
+# Parça analizlerini tek bir rapor halinde birleştir (reduce adımı)
+# extra_comments: parça analizlerine girmemiş yorum satırları (ör. çekimin son kısmı); birleştirme prompt'una eklenir
+# on_section: birleştirme yanıtının bölümleri kapandıkça iletilir (bkz. generate_analysis)
+def merge_batch_analyses(model, model_name, video_title, partials, total_count, extra_comments=None, on_section=None):
+    merged = {
+        "genel_duygu": merge_sentiments(partials),
+        "genel_izlenim": "",
+        "one_cikan_konular": merge_lists_locally(partials, "one_cikan_konular"),
+        "tartismali_noktalar": merge_lists_locally(partials, "tartismali_noktalar"),
+        "oneriler": merge_lists_locally(partials, "oneriler"),
+        "ozet": " ".join(a.get("ozet", "") for _, a in partials if a.get("ozet"))
+    }
+    merged["genel_izlenim"] = next((a.get("genel_izlenim") for _, a in partials if a.get("genel_izlenim")), "")
+
+    qualitative = [
+        {k: a.get(k) for k in ("genel_izlenim", "one_cikan_konular", "tartismali_noktalar", "oneriler", "ozet")}
+        for _, a in partials
+    ]
+    extra_section = ""
+    extra_schema = ""
+    if extra_comments:
+        extra_section = f"Parça analizlerine girmemiş {len(extra_comments)} yorum daha var, bunları da rapora dahil et:\n" + "\n".join(extra_comments)
+        extra_schema = f'"ek_yorum_duygu": {sentiment_example(structured_output_enabled(model_name))},\n            '
+    reduce_prompt = f"""
+        Aşağıda "{video_title}" başlıklı YouTube videosunun toplam {total_count} yorumunun farklı bölümleri için yapılmış {len(partials)} ayrı analiz var.
+        Bunları tek ve tutarlı bir rapor halinde birleştir. Tekrar eden konuları birleştir, en sık geçenleri öne al.
+
+        Parça analizleri:
+        {json.dumps(qualitative, ensure_ascii=False)}
+        {extra_section}
+
+        Cevabı sadece aşağıdaki yapıda JSON olarak ver{" (ek_yorum_duygu sadece eklenen yorumların duygu dağılımıdır)" if extra_comments else ""}:
+        {{
+            {extra_schema}"genel_izlenim": "Genel izlenimin kısa özeti",
+            "one_cikan_konular": ["Konu 1", "Konu 2", ...],
+            "tartismali_noktalar": ["Tartışmalı nokta 1", ...],
+            "oneriler": ["Öneri 1", ...],
+            "ozet": "Detaylı özet"
+        }}
+        """
+    # Duygu dağılımı parçalardan yerelde hesaplanır; ek yorum yoksa birleştirme çağrısı beklenmeden gönderilebilir
+    if on_section and not extra_comments:
+        on_section("genel_duygu", merged["genel_duygu"])
+    try:
+        reduced = generate_analysis(model, model_name, reduce_prompt, QUALITATIVE_FIELDS + (("ek_yorum_duygu",) if extra_comments else ()), on_section)
+        if "error" in reduced:
+            raise Exception(reduced["error"])
+        for key in ("genel_izlenim", "one_cikan_konular", "tartismali_noktalar", "oneriler", "ozet"):
+            if reduced.get(key):
+                merged[key] = reduced[key]
+        if extra_comments and reduced.get("ek_yorum_duygu"):
+            merged["genel_duygu"] = merge_sentiments(list(partials) + [(represented_comment_count(extra_comments), {"genel_duygu": reduced["ek_yorum_duygu"]})])
+    except Exception as e:
+        logging.warning(f"Reduce step failed, using locally merged analysis: {str(e)}")
+    return merged
+
+# Yorum parçalarını paralel analiz edip birleştir (map-reduce)
+def analyze_in_batches(model, model_name, video_title, formatted_comments, batches, include_sentiment=True, total_count=None, on_section=None):
+    total_count = total_count or len(formatted_comments)
+    logging.info(f"Analyzing {len(formatted_comments)} comments in {len(batches)} batches")
+
+    def analyze_batch(batch):
+        prompt = build_analysis_prompt(video_title, total_count, batch, include_sentiment, structured=structured_output_enabled(model_name))
+        return generate_analysis(model, model_name, prompt, analysis_fields(include_sentiment))
+
+    partials = []
+    with ThreadPoolExecutor(max_workers=max(1, ANALYSIS_MAX_WORKERS)) as executor:
+        # Her parça isteğin zaman dökümüne yazabilsin diye bağlam kopyalanır
+        futures = {executor.submit(contextvars.copy_context().run, analyze_batch, batch): represented_comment_count(batch) for batch in batches}
+        for future in as_completed(futures):
             try:
-                logging.info(f"Sending request to Gemini API with model {model_name}")
-                response = model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
-                    safety_settings=safety_settings
-                )
-            except Exception as api_error:
-                logging.error(f"First attempt failed: {str(api_error)}")
-                
+                analysis = future.result()
+            except Exception as e:
+                logging.error(f"Batch analysis failed: {str(e)}")
+                continue
+            if "error" in analysis:
+                logging.error(f"Batch analysis returned unusable response: {analysis['error']}")
+                continue
+            partials.append((futures[future], analysis))
+
+    if not partials:
+        raise Exception("Hiçbir yorum parçası analiz edilemedi")
+    return merge_batch_analyses(model, model_name, video_title, partials, total_count, on_section=on_section)
+
+# Model adı çözümlemesinin geçerlilik süresi (sn); süre dolunca list_models tekrar çağrılır
+MODEL_REGISTRY_TTL = float(os.environ.get("MODEL_REGISTRY_TTL", "3600"))
+# Alternatif güncel modeller
+FALLBACK_MODELS = ["gemini-1.5-flash", "gemini-1.5-pro", "gemini-1.0-pro-latest"]
+
+# Süreç genelinde model adını bir kez çözen ve model nesnelerini saklayan kayıt
+class GeminiModelRegistry:
+    def __init__(self, ttl, fallback_models):
+        self.ttl = ttl
+        self.fallback_models = list(fallback_models)
+        self._lock = threading.Lock()
+        self._resolved_name = None
+        self._resolved_at = 0.0
+        self._preferred_name = None  # En son başarılı olan model
+        self._models = {}
+
+    # Mevcut modeller içinde uygun bir model bul
+    def _resolve_name(self):
+        # Güncel Gemini model adını kullan - gemini-1.5-flash yeni önerilen model
+        model_name = "gemini-1.5-flash"
+        for m in list_available_models():
+            if "gemini-1.5" in m.lower():
+                model_name = m
+                break
+        logging.info(f"Resolved Gemini model: {model_name}")
+        return model_name
+
+    def _get_or_create(self, model_name):
+        model = self._models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            self._models[model_name] = model
+        return model
+
+    # Denenecek modelleri sırayla döndür: önce en son başarılı olan, sonra çözülen ad, sonra yedekler
+    def candidates(self):
+        with self._lock:
+            stale = self._resolved_name is None or time.time() - self._resolved_at > self.ttl
+        if stale:
+            # Model listesi ağ çağrısıdır; diğer istekleri bekletmemek için kilit dışında çözülür
+            resolved_name = self._resolve_name()
+            with self._lock:
+                self._resolved_name = resolved_name
+                self._resolved_at = time.time()
+        with self._lock:
+            names = []
+            for name in [self._preferred_name, self._resolved_name] + self.fallback_models:
+                if name and name not in names:
+                    names.append(name)
+            result = []
+            for name in names:
                 try:
-                    # Safety settings olmadan tekrar dene
-                    logging.info("Trying without safety settings")
-                    response = model.generate_content(
-                        prompt,
-                        generation_config=generation_config
-                    )
-                    logging.info("Generated content without safety settings successfully")
-                except Exception as second_error:
-                    logging.error(f"Second attempt failed: {str(second_error)}")
-                    
-                    try:
-                        # Basit bir prompt ile tekrar dene
-                        logging.info("Trying with simplified prompt")
-                        simple_prompt = f"Aşağıdaki YouTube video yorumlarını analiz et ve duygu analizi, öne çıkan konular ve genel izlenim hakkında JSON formatında yanıt ver:\n\n{all_comments_text[:1000]}"
-                        response = model.generate_content(simple_prompt)
-                        logging.info("Generated content with simplified prompt successfully")
-                    except Exception as third_error:
-                        logging.error(f"Third attempt failed: {str(third_error)}")
-                        raise third_error
-            
-            # Null response kontrolü
-            if not response:
-                raise Exception("Gemini API boş yanıt döndü")
-            
-            # JSON formatındaki yanıtı parse et
-            try:
-                # Bazen Gemini JSON içinde açıklayıcı metinler döndürebilir
-                # Yanıttan sadece JSON kısmını ayıklayalım
-                response_text = response.text
-                
-                # JSON formatındaki metni bul (ilk { ve son } arasındaki metin)
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                
-                if json_start != -1 and json_end != -1:
-                    json_str = response_text[json_start:json_end]
-                    analysis_result = json.loads(json_str)
-                else:
-                    # Eğer JSON formatı bulunamazsa, tüm yanıtı döndür
-                    analysis_result = {
-                        "error": "JSON formatı bulunamadı",
-                        "raw_response": response_text
-                    }
-            except json.JSONDecodeError as e:
-                # JSON parse hatası durumunda ham yanıtı döndür
-                logging.error(f"JSON parse error: {str(e)}")
-                analysis_result = {
-                    "error": f"JSON parse hatası: {str(e)}",
-                    "raw_response": response.text
-                }
-            
-            return analysis_result
+                    result.append((self._get_or_create(name), name))
+                except Exception as model_error:
+                    logging.error(f"Error creating model with {name}: {str(model_error)}")
+        if not result:
+            raise Exception("Hiçbir Gemini modeli oluşturulamadı. API anahtarınızı kontrol edin.")
+        return result
+
+    def mark_success(self, model_name):
+        with self._lock:
+            if self._preferred_name != model_name:
+                logging.info(f"Preferring Gemini model {model_name} for subsequent requests")
+            self._preferred_name = model_name
+
+    def mark_failure(self, model_name):
+        with self._lock:
+            if self._preferred_name == model_name:
+                self._preferred_name = None
+            self._models.pop(model_name, None)
+
+    # Elle yenileme: bir sonraki istekte model listesi tekrar çekilir
+    def refresh(self):
+        with self._lock:
+            self._resolved_name = None
+            self._resolved_at = 0.0
+            self._preferred_name = None
+            self._models.clear()
+        return self.candidates()[0][1]
+
+model_registry = GeminiModelRegistry(MODEL_REGISTRY_TTL, FALLBACK_MODELS)
+
+# Hata sonraki modele geçmeyi gerektiriyor mu: sadece kalıcı (bulunamayan model, geçersiz istek gibi modele özgü) hatalar.
+# Hız sınırı, geçici hatalar, açık devre kesici ve engellenen içerik her modelde aynı sonucu verir; model hatalı sayılmadan iletilir.
+def should_fail_over(error):
+    return classify_error(error) == ERROR_FATAL
+
+# Duygu dağılımının kaynağı: "llm" (Gemini tahmini) veya "fast" (yerel model; Gemini sadece niteliksel alanları üretir)
+SENTIMENT_MODE = os.environ.get("SENTIMENT_MODE", "llm").lower()
+
+# Yerel modelle duygu dağılımı; hata durumunda None
+def local_sentiment(comments):
+    try:
+        return comment_sentiment_distribution(comments)
+    except Exception as e:
+        logging.error(f"Local sentiment classification failed: {str(e)}")
+        return None
+
+# Yorumları Gemini API ile analiz et
+# chunked=None iken yorumlar token bütçesini aşarsa otomatik olarak parçalı (map-reduce) moda geçilir.
+# model verilirse (ör. testlerde sahte bir model nesnesi) genai.GenerativeModel oluşturulmaz.
+# previous_analysis: artımlı yenilemede önceki analiz; tek prompt'a sığan yorumlarda değişim özeti de istenir
+# on_section: analiz bölümleri model yanıtı sürerken kapandıkça on_section(alan, değer) ile iletilir
+def analyze_comments_with_gemini(video_title, comments, chunked=None, model=None, sentiment_mode=None, previous_analysis=None, on_section=None):
+    fast_sentiment = (sentiment_mode or SENTIMENT_MODE) == "fast"
+    try:
+        logging.info(f"Analyzing {len(comments)} comments with Gemini API")
+        
+        # Tekrarlayan yorumları birleştir, bütçeye sığacak şekilde örnekle, sonra formatlı string olarak birleştir
+        with span("prompt_build"):
+            representatives, groups, dedup_stats = collapse_duplicate_comments(comments)
+            prompt_comments, counts, sampling_stats = sample_comments_for_prompt(comments, representatives, groups)
+            formatted_comments = format_comments(prompt_comments, counts)
+        
+        # Kayıttaki modeller (en son başarılı olan önce) veya verilen model
+        if model is None:
+            candidates = model_registry.candidates()
+        else:
+            candidates = [(model, getattr(model, "model_name", "custom-model"))]
+        
+        # Çok fazla yorumda tek prompt token limitini aşabilir, parçalara böl
+        batches = split_into_batches(formatted_comments, ANALYSIS_BATCH_TOKEN_BUDGET)
+        if chunked is None:
+            chunked = len(batches) > 1
+        
+        try:
+            last_error = None
+            for candidate_model, model_name in candidates:
+                try:
+                    if chunked and len(batches) > 1:
+                        result = analyze_in_batches(candidate_model, model_name, video_title, formatted_comments, batches, not fast_sentiment, len(comments), on_section)
+                    else:
+                        prompt = build_analysis_prompt(video_title, len(comments), formatted_comments, not fast_sentiment, previous_analysis, structured_output_enabled(model_name))
+                        result = generate_analysis(candidate_model, model_name, prompt, analysis_fields(not fast_sentiment, previous_analysis), on_section)
+                    # Hızlı modda ya da yanıttaki dağılım kurtarılamadıysa duygu dağılımı yerel modelden gelir
+                    if (fast_sentiment or not result.get("genel_duygu")) and "error" not in result:
+                        result["genel_duygu"] = local_sentiment(comments) or result.get("genel_duygu")
+                        result["duygu_kaynagi"] = "yerel"
+                    if dedup_stats:
+                        result["tekrar_birlestirme"] = dedup_stats
+                    if sampling_stats:
+                        result["ornekleme"] = sampling_stats
+                    if model is None:
+                        model_registry.mark_success(model_name)
+                    return result
+                except Exception as model_error:
+                    logging.error(f"Analysis with model {model_name} failed: {str(model_error)}")
+                    if not should_fail_over(model_error):
+                        raise
+                    if model is None:
+                        model_registry.mark_failure(model_name)
+                    last_error = model_error
+            raise last_error
         except Exception as api_error:
             logging.error(f"Gemini API request error: {str(api_error)}")
             
-            # API hatası durumunda alternatif bir çözüm olarak basit bir analiz döndür
+            # API hatası durumunda duygu dağılımını yerel modelle gerçek yorum etiketlerinden hesapla
             return {
                 "error": f"Gemini API isteği hatası: {str(api_error)}",
-                "genel_duygu": {"pozitif": "50%", "negatif": "25%", "notr": "25%"},
+                "genel_duygu": local_sentiment(comments) or {"pozitif": "0%", "negatif": "0%", "notr": "100%"},
+                "duygu_kaynagi": "yerel",
                 "genel_izlenim": "API hatası nedeniyle gerçek analiz yapılamadı. Basit bir değerlendirme sunuluyor.",
                 "one_cikan_konular": ["Yorumlar analiz edilemedi"],
                 "tartismali_noktalar": ["API hatası nedeniyle belirlenemedi"],
@@ -267,7 +832,8 @@ def analyze_comments_with_gemini(video_title, comments):
         logging.error(f"Error in Gemini API analysis: {str(e)}")
         return {
             "error": f"Gemini API hatası: {str(e)}",
-            "genel_duygu": {"pozitif": "0%", "negatif": "0%", "notr": "100%"},
+            "genel_duygu": local_sentiment(comments) or {"pozitif": "0%", "negatif": "0%", "notr": "100%"},
+            "duygu_kaynagi": "yerel",
             "genel_izlenim": "Analiz yapılamadı",
             "one_cikan_konular": ["Analiz hatası"],
             "tartismali_noktalar": [],
@@ -275,422 +841,1039 @@ def analyze_comments_with_gemini(video_title, comments):
             "ozet": "Yorumlar analiz edilirken bir hata oluştu."
         }
 
+# Yorumlar çekilirken dolan parçaların analizini beklemeden başlat (0 = önce tüm yorumları çek, sonra analiz et)
+ANALYSIS_PIPELINE = os.environ.get("ANALYSIS_PIPELINE", "1") == "1"
+
+# Çekim sürerken gelen yorumları kuyrukta biriktirir; kuyruk ANALYSIS_BATCH_TOKEN_BUDGET'i doldurunca parçayı
+# hemen Gemini'ye gönderir (map), çekim bitince kalanları gönderip parça analizlerini birleştirir (reduce).
+# Toplam yorum tek parçaya sığıyorsa hiçbir şey erken gönderilmez ve normal tek çağrılı analiz yapılır.
+# Beklenen yorumlar ANALYSIS_MAX_PROMPT_TOKENS'a sığmayacaksa bütçe geliş sırasına göre harcanmaz: erken gönderim
+# durur ve örnekleme (sample_comments_for_prompt) çekim bitince kalan bütün yorumlar üzerinde yapılır.
+class PipelinedAnalysis:
+    def __init__(self, video_title=None, token_budget=None, sentiment_mode=None, expected_comments=None):
+        self.video_title = video_title or "YouTube Video"
+        self.token_budget = token_budget or ANALYSIS_BATCH_TOKEN_BUDGET
+        self.sentiment_mode = sentiment_mode
+        self.fast_sentiment = (sentiment_mode or SENTIMENT_MODE) == "fast"
+        self.expected_comments = min(MAX_COMMENTS, expected_comments or MAX_COMMENTS)  # Çekilmesi beklenen yorum sayısı
+        self.received = []  # Gelen tüm yorumlar, geliş sırasıyla
+        self.queue = []  # Henüz gönderilmemiş yorumlar
+        self.queue_tokens = 0
+        self.submitted_tokens = 0  # Gönderilen parçaların prompt token toplamı
+        self.submitted_representatives = []  # Gönderilen prompt satırlarının yorumları
+        self.submitted_keys = set()  # Analize giren yorumların normalleştirilmiş metinleri
+        self.covered_comments = 0  # Gönderilen parçalara giren (veya onlardaki bir yorumun tekrarı olan) yorum sayısı
+        self.buffering = False  # Örnekleme gerekecek; yorumlar çekim bitene kadar biriktirilir
+        self.dedup_stats = {}
+        self.futures = []  # (parçadaki yorum sayısı, future)
+        self.executor = None
+
+    # progress geri çağrısını sar: başlık ve yeni yorum olayları analizciye de iletilir
+    def tap(self, progress):
+        def forward(stage, **info):
+            if stage == "title" and info.get("video_title"):
+                self.video_title = info["video_title"]
+            elif stage == "comments":
+                self.add(info.get("comments") or [])
+            report_progress(progress, stage, **info)
+        return forward
+
+    def add(self, comments):
+        for comment in comments:
+            self.received.append(comment)
+            # Daha önce gönderilmiş bir yorumun birebir tekrarı bir sonraki parçaya tekrar konmaz
+            if DEDUP_ENABLED and normalize_text(comment["textDisplay"]) in self.submitted_keys:
+                self.covered_comments += 1
+                self.dedup_stats["orijinal_yorum"] = self.dedup_stats.get("orijinal_yorum", 0) + 1
+                continue
+            self.queue.append(comment)
+            if self.buffering:
+                continue
+            self.queue_tokens += estimate_tokens(format_comments([comment])[0]) + 1
+            if self.queue_tokens > self.token_budget:
+                self._flush()
+
+    def _add_dedup_stats(self, dedup_stats):
+        for key, value in (dedup_stats or {}).items():
+            self.dedup_stats[key] = self.dedup_stats.get(key, 0) + value
+
+    def _format_queue(self):
+        with span("prompt_build"):
+            representatives, groups, dedup_stats = collapse_duplicate_comments(self.queue)
+            formatted = format_comments(representatives, [len(group) for group in groups])
+        return representatives, formatted, estimate_tokens("\n".join(formatted)), dedup_stats
+
+    # Şimdiye kadarki yorum başına token ortalamasıyla beklenen yorumların prompt bütçesini aşıp aşmayacağı
+    def _needs_sampling(self, queue_tokens):
+        if ANALYSIS_MAX_PROMPT_TOKENS <= 0:
+            return False
+        per_comment = (self.submitted_tokens + queue_tokens) / max(1, len(self.received))
+        return per_comment * max(self.expected_comments, len(self.received)) > ANALYSIS_MAX_PROMPT_TOKENS
+
+    # Tekrarlar birleşince kuyruk hâlâ bütçeye sığıyorsa biriktirmeye devam et, sığmıyorsa parçayı gönder
+    def _flush(self):
+        representatives, formatted, tokens, dedup_stats = self._format_queue()
+        if tokens <= self.token_budget:
+            self.queue_tokens = tokens
+            return
+        if self._needs_sampling(tokens):
+            logging.info(f"Expecting more than {ANALYSIS_MAX_PROMPT_TOKENS} prompt tokens, buffering comments for sampling")
+            self.buffering = True
+            return
+        batch = self.queue
+        self.queue, self.queue_tokens = [], 0
+        self.covered_comments += len(batch)
+        self._add_dedup_stats(dedup_stats)
+        self.submitted_tokens += tokens
+        self.submitted_representatives.extend(representatives)
+        if DEDUP_ENABLED:
+            self.submitted_keys.update(normalize_text(comment["textDisplay"]) for comment in batch)
+        logging.info(f"Submitting batch of {len(batch)} comments for analysis while scraping continues")
+        self._submit(formatted, len(batch))
+
+    def _submit(self, formatted, weight):
+        prompt = build_analysis_prompt(self.video_title, len(self.received), formatted, not self.fast_sentiment)
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=max(1, ANALYSIS_MAX_WORKERS), thread_name_prefix="pipeline")
+        # Parça isteğin zaman dökümüne yazabilsin diye bağlam kopyalanır
+        future = self.executor.submit(contextvars.copy_context().run, self._analyze, prompt)
+        self.futures.append((weight, future))
+
+    # Gönderilmemiş yorumları tekrarları birleştirip kalan prompt bütçesiyle örnekle. Bir parçaya sığan satırlar
+    # (birleştirme prompt'una eklenmek üzere) döner, sığmayanlar ayrı parçalar olarak gönderilir.
+    # (satırlar, örnekleme istatistiği) döndürür; örnekleme gerekmediyse istatistik None.
+    def _sample_remainder(self, comments):
+        remainder = self.queue
+        self.queue, self.queue_tokens = [], 0
+        with span("prompt_build"):
+            representatives, groups, dedup_stats = collapse_duplicate_comments(remainder)
+            budget = max(1, ANALYSIS_MAX_PROMPT_TOKENS - self.submitted_tokens) if ANALYSIS_MAX_PROMPT_TOKENS > 0 else 0
+            prompt_comments, counts, sampling_stats = sample_comments_for_prompt(remainder, representatives, groups, budget)
+            formatted = format_comments(prompt_comments, counts)
+        self._add_dedup_stats(dedup_stats)
+        tokens = estimate_tokens("\n".join(formatted)) if formatted else 0
+
+        stats = None
+        if sampling_stats:
+            # Kapsam, erken gönderilen satırlarla birlikte bütün aday satırlar üzerinden hesaplanır
+            candidates = self.submitted_representatives + representatives
+            chosen = {id(comment) for comment in prompt_comments}
+            selected = list(range(len(self.submitted_representatives))) + [
+                len(self.submitted_representatives) + position
+                for position, comment in enumerate(representatives) if id(comment) in chosen
+            ]
+            stats = {"analiz_edilen": len(selected), "aday_yorum": len(candidates)}
+            stats.update(coverage_stats(
+                [parse_like_count(comment.get("likeCount")) for comment in candidates],
+                assign_time_buckets([parse_relative_age(comment.get("publishedAt")) for comment in candidates]),
+                selected
+            ))
+            stats["tahmini_token"] = self.submitted_tokens + tokens
+            stats["kapsanan_yorum"] = self.covered_comments + sampling_stats["kapsanan_yorum"]
+            stats["toplam_yorum"] = len(comments)
+        self.submitted_tokens += tokens
+        self.submitted_representatives.extend(prompt_comments)
+
+        batches = split_into_batches(formatted, self.token_budget)
+        if len(batches) <= 1:
+            return formatted, stats
+        start = 0
+        for batch in batches:
+            self._submit(batch, sum(counts[start:start + len(batch)]))
+            start += len(batch)
+        return [], stats
+
+    # Bir parçayı kayıttaki modellerle sırayla dene
+    def _analyze(self, prompt):
+        last_error = None
+        for model, model_name in model_registry.candidates():
+            try:
+                analysis = generate_analysis(model, model_name, prompt, analysis_fields(not self.fast_sentiment))
+            except Exception as model_error:
+                logging.error(f"Pipelined batch with model {model_name} failed: {str(model_error)}")
+                if not should_fail_over(model_error):
+                    raise
+                model_registry.mark_failure(model_name)
+                last_error = model_error
+                continue
+            model_registry.mark_success(model_name)
+            return analysis
+        raise last_error
+
+    # Çekim bitti: parçaları bekle ve birleştir. Çekimden sonra sadece birleştirme çağrısı (ve hâlâ süren parçalar) beklenir.
+    # Hiç parça gönderilmediyse (tek parçaya sığan ya da baştan örnekleme gerektiren yorumlar) veya comments erken
+    # gönderilen yorumlarla aynı değilse (ör. başka bir seçiciye düşüldüyse) normal analiz yapılır.
+    def finish(self, video_title, comments, on_section=None):
+        self.video_title = video_title or self.video_title
+        same_comments = len(comments) == len(self.received) and all(a is b for a, b in zip(comments, self.received))
+        if not self.futures or not same_comments:
+            self.close()
+            return analyze_comments_with_gemini(self.video_title, comments, sentiment_mode=self.sentiment_mode, on_section=on_section)
+
+        # Kalan yorumlar bir parçadan küçükse ayrı bir çağrı yerine birleştirme prompt'una eklenir
+        tail = []
+        sampling_stats = None
+        if self.queue:
+            tail, sampling_stats = self._sample_remainder(comments)
+
+        partials = []
+        for weight, future in self.futures:
+            try:
+                analysis = future.result()
+            except Exception as e:
+                logging.error(f"Batch analysis failed: {str(e)}")
+                continue
+            if "error" in analysis:
+                logging.error(f"Batch analysis returned unusable response: {analysis['error']}")
+                continue
+            partials.append((weight, analysis))
+        batch_count = len(self.futures)
+        self.close()
+        if not partials:
+            return analyze_comments_with_gemini(self.video_title, comments, sentiment_mode=self.sentiment_mode, on_section=on_section)
+
+        if len(partials) == 1 and not tail:
+            result = partials[0][1]
+        else:
+            model, model_name = model_registry.candidates()[0]
+            result = merge_batch_analyses(model, model_name, self.video_title, partials, len(comments), tail, on_section)
+        if self.fast_sentiment:
+            result["genel_duygu"] = local_sentiment(comments) or result.get("genel_duygu")
+            result["duygu_kaynagi"] = "yerel"
+        if self.dedup_stats:
+            result["tekrar_birlestirme"] = self.dedup_stats
+        if sampling_stats:
+            result["ornekleme"] = sampling_stats
+        result["parcali_analiz"] = {"parca": batch_count, "birlestirmeye_eklenen_yorum": len(tail)}
+        return result
+
+    # Bekleyen parçaları iptal et (çekim başarısız olduğunda veya analiz bittiğinde)
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+# Başlık, toplam yorum sayısı ve "yorumlar kapalı" bilgisini sayfa içinde tek çağrıyla oku.
+# Önce sayfanın yapısal verisine (ytInitialPlayerResponse / ytInitialData), yoksa DOM'a bakılır;
+# page_source Python'a hiç taşınmaz.
+PAGE_INFO_SCRIPT = """
+const data = window.ytInitialData || {};
+const player = window.ytInitialPlayerResponse || {};
+const textOf = el => el ? (el.innerText || el.textContent || '').trim() : '';
+const runsText = value => !value ? '' : (value.simpleText || (value.runs || []).map(run => run.text).join(''));
+const firstText = selectors => {
+    for (const selector of selectors) {
+        const text = textOf(document.querySelector(selector));
+        if (text) return text;
+    }
+    return '';
+};
+
+let title = (player.videoDetails && player.videoDetails.title) || firstText([
+    'h1.ytd-watch-metadata yt-formatted-string', 'h1.title.style-scope.ytd-video-primary-info-renderer',
+    'h1.title', 'h1#title', '#container h1'
+]);
+if (!title) {
+    const meta = document.querySelector('meta[name="title"]');
+    title = meta ? meta.content : '';
+}
+
+let count = firstText(['ytd-comments-header-renderer #count', 'h2#count', '#count > yt-formatted-string']);
+let disabled = textOf(document.querySelector('ytd-comments ytd-message-renderer')) !== '';
+// Yapısal veride yalnızca bilinen yollara bakılır: yorum paneli başlığı ve izleme sayfasındaki yorum bölümü
+if (!count) {
+    for (const item of data.engagementPanels || []) {
+        const panel = item.engagementPanelSectionListRenderer;
+        if (panel && panel.panelIdentifier === 'engagement-panel-comments-section') {
+            const header = panel.header && panel.header.engagementPanelTitleHeaderRenderer;
+            count = header ? runsText(header.contextualInfo) : '';
+            break;
+        }
+    }
+}
+if (!disabled) {
+    const watch = (data.contents || {}).twoColumnWatchNextResults || {};
+    const results = (watch.results || {}).results || {};
+    for (const item of results.contents || []) {
+        const section = item.itemSectionRenderer;
+        if (section && section.sectionIdentifier === 'comment-item-section') {
+            disabled = (section.contents || []).some(content => content && content.messageRenderer);
+            break;
+        }
+    }
+}
+return {title: title.trim(), count: count, disabled: disabled};
+"""
+
+def probe_page_info(driver):
+    with span("page_info"):
+        info = driver.execute_script(PAGE_INFO_SCRIPT) or {}
+    count_text = info.get("count") or ""
+    return {
+        "video_title": info.get("title") or "",
+        "total_comments": parse_like_count(count_text) if re.search(r"\d", count_text) else None,
+        "comments_disabled": bool(info.get("disabled"))
+    }
+
+# Sayfa bilgisini tek çağrıyla oku; başlık yapısal veride yoksa tarayıcı sekme başlığına düşülür
+def read_page_info(driver):
+    info = {"video_title": "", "total_comments": None, "comments_disabled": False}
+    try:
+        info.update(probe_page_info(driver))
+    except Exception as e:
+        logging.warning(f"Could not read page info: {str(e)}")
+    if not info["video_title"]:
+        title = (getattr(driver, "title", "") or "").strip()
+        info["video_title"] = re.sub(r"\s*-\s*YouTube$", "", title)
+    if not info["video_title"]:
+        logging.warning("Video title could not be read from page data")
+    return info
+
 # Video başlığını getir
 def get_video_title(driver):
-    try:
-        title_element = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "h1.title.style-scope.ytd-video-primary-info-renderer"))
-        )
-        return title_element.text.strip()
-    except:
-        try:
-            # Alternatif başlık selektörleri
-            title_selectors = [
-                "h1.title", 
-                "h1#title", 
-                "yt-formatted-string.ytd-video-primary-info-renderer", 
-                "#container h1"
-            ]
-            
-            for selector in title_selectors:
-                elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                if elements:
-                    return elements[0].text.strip()
-        except:
-            pass
-        
-        return "YouTube Video"
+    return read_page_info(driver)["video_title"] or "YouTube Video"
 
 # Toplam yorum sayısını getir
 def get_total_comment_count(driver):
     try:
-        # YouTube'da yorum sayısı genellikle "... Comments" şeklindeki bir metin içinde yer alır
-        comment_count_selectors = [
-            "h2#count yt-formatted-string span:first-child", 
-            "h2#count span:first-child",
-            "h2.ytd-comments-header-renderer span:first-child",
-            "#count > yt-formatted-string"
-        ]
-        
-        for selector in comment_count_selectors:
-            try:
-                count_element = driver.find_element(By.CSS_SELECTOR, selector)
-                count_text = count_element.text.strip()
-                
-                # Sayıyı metinden ayıkla ("123,456 Comments" -> "123,456")
-                if count_text:
-                    # Virgüllü veya noktalarla ayrılmış rakamları ayıklama
-                    count_text = ''.join(c for c in count_text if c.isdigit() or c in [',', '.'])
-                    # Sayısal olmayan diğer karakterleri temizle
-                    count_text = re.sub(r'[^\d]', '', count_text)
-                    
-                    if count_text.isdigit():
-                        return int(count_text)
-            except Exception as e:
-                logging.debug(f"Selector {selector} failed: {str(e)}")
-                continue
-        
-        # Alternatif deneme: HTML içinde geçen yorum sayısını ara
-        try:
-            html = driver.page_source
-            comment_count_patterns = [
-                r"(\d{1,3}(?:,\d{3})*)\s*yorum",  # Türkçe: "1,234 yorum"
-                r"(\d{1,3}(?:,\d{3})*)\s*comments",  # İngilizce: "1,234 comments"
-                r"Comments\s*\((\d{1,3}(?:,\d{3})*)\)",  # "Comments (1,234)"
-                r"yorumlar\s*\((\d{1,3}(?:,\d{3})*)\)"   # "yorumlar (1,234)"
-            ]
-            
-            for pattern in comment_count_patterns:
-                matches = re.search(pattern, html, re.IGNORECASE)
-                if matches:
-                    count_text = matches.group(1)
-                    # Virgül ve nokta gibi ayırıcıları temizle
-                    count_text = re.sub(r'[^\d]', '', count_text)
-                    return int(count_text)
-        except Exception as e:
-            logging.debug(f"Regex extraction failed: {str(e)}")
-        
-        return None
+        return probe_page_info(driver)["total_comments"]
     except Exception as e:
         logging.warning(f"Could not get total comment count: {str(e)}")
         return None
 
-# YouTube yorumlarını çek
-def fetch_youtube_comments(url):
-    video_id = extract_video_id(url)
-    if not video_id:
-        return {"error": "Geçersiz YouTube URL'si"}
-    
-    # YouTube yorum sayfasına git
-    comments_url = f"https://www.youtube.com/watch?v={video_id}"
-    
-    driver = None
+# İlerleme bildirimi (ör. arka plan işleri için); progress None ise hiçbir şey yapılmaz
+def report_progress(progress, stage, **info):
+    if progress is None:
+        return
     try:
-        # ChromeDriver kurulumu
-        service = Service(executable_path=CHROME_DRIVER_PATH)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        logging.info(f"Fetching video: {video_id}")
-        driver.get(comments_url)
-        
-        # Video başlığını al
-        video_title = get_video_title(driver)
-        logging.info(f"Video title: {video_title}")
-        
-        # Sayfanın temel yüklenmesi için bekle
-        time.sleep(5)
-        
-        # Çerezleri kabul et (varsa)
-        try:
-            cookie_buttons = driver.find_elements(By.XPATH, 
-                "//button[contains(@aria-label, 'Accept') or contains(@aria-label, 'Kabul') or contains(text(), 'Accept') or contains(text(), 'Kabul') or contains(text(), 'I agree')]")
-            if cookie_buttons:
-                cookie_buttons[0].click()
-                time.sleep(2)
-                logging.info("Cookie consent clicked")
-        except Exception as e:
-            logging.info(f"Cookie consent handling: {str(e)}")
-        
-        # Sayfa yüklenmesi için scroll yapalım
-        logging.info("Scrolling to load comments")
-        
-        # Sayfa sonuna kadar kaydır ve bekle
-        driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-        time.sleep(3)
-        
-        # Sayfa boyunca ilerleyerek yorum bölümüne ulaş
-        for i in range(10):
-            driver.execute_script("window.scrollBy(0, 500);")
-            time.sleep(0.5)
-        
-        # 2023-2025 için YouTube yorum bölümü Xpath'i
-        comments_section_xpath = "//ytd-comments[@id='comments']"
-        try:
-            # Yorum bölümünü bul
-            comments_section = driver.find_element(By.XPATH, comments_section_xpath)
-            driver.execute_script("arguments[0].scrollIntoView(true);", comments_section)
-            logging.info("Found comments section")
-            time.sleep(2)
-            
-            # Yorumları yüklemek için tekrar kaydırma yapalım
-            for i in range(5):
-                driver.execute_script("window.scrollBy(0, 500);")
-                time.sleep(1)
-        except Exception as e:
-            logging.warning(f"Could not find comments section: {e}")
-        
-        # Modern YouTube (2023-2025) yorum selektörleri
-        comment_thread_xpath = "//ytd-comment-thread-renderer"
-        try:
-            # Yorum thread'lerini bekleyip bul
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, comment_thread_xpath))
-            )
-            
-            # Yorumları yüklemek için daha fazla scroll et
-            MAX_COMMENTS = 200  # Maksimum 200 yorum çek
-            previous_comment_count = 0
-            scroll_count = 0
-            max_scroll_attempts = 30
-            
-            comment_threads = driver.find_elements(By.XPATH, comment_thread_xpath)
-            current_comment_count = len(comment_threads)
-            
-            # Daha fazla yorum yüklemek için scroll
-            while current_comment_count < MAX_COMMENTS and current_comment_count > previous_comment_count and scroll_count < max_scroll_attempts:
-                previous_comment_count = current_comment_count
-                
-                # Sayfanın sonuna doğru kaydır
-                driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-                time.sleep(2)
-                
-                # Yeni yorum count'u al
-                comment_threads = driver.find_elements(By.XPATH, comment_thread_xpath)
-                current_comment_count = len(comment_threads)
-                
-                logging.info(f"Loaded {current_comment_count} comments after scroll {scroll_count + 1}")
-                scroll_count += 1
-                
-                # Verimi arttırmak ve sıkışma durumlarını önlemek için
-                if scroll_count % 5 == 0:
-                    # Sayfanın başına dön ve tekrar aşağı kaydır (bazen bu yeni yorumların yüklenmesine yardımcı olur)
-                    driver.execute_script("window.scrollTo(0, 0);")
-                    time.sleep(1)
-                    driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-                    time.sleep(2)
-            
-            # Tüm yorumların parçalarını çıkar
-            logging.info(f"Found {len(comment_threads)} total comment threads")
-            results = []
-            for thread in comment_threads:  # Tüm yorumları al
-                try:
-                    # Yazar adı - birkaç farklı olası xpath
-                    author_name = "Anonim Kullanıcı"
-                    try:
-                        author_el = thread.find_element(By.XPATH, ".//a[@id='author-text'] | .//span[contains(@class, 'ytd-comment-renderer')]")
-                        author_name = author_el.text.strip()
-                    except:
-                        pass
-                    
-                    # Profil resmi
-                    author_img = None
-                    try:
-                        img_el = thread.find_element(By.XPATH, ".//img[@id='img'] | .//yt-img-shadow/img")
-                        author_img = img_el.get_attribute("src")
-                    except:
-                        pass
-                    
-                    # Yorum metni
-                    comment_text = ""
-                    try:
-                        content_el = thread.find_element(By.XPATH, ".//yt-formatted-string[@id='content-text'] | .//div[@id='content-text']")
-                        comment_text = content_el.text.strip()
-                    except:
-                        # Başka bir yöntemle dene
-                        try:
-                            content_el = thread.find_element(By.XPATH, ".//*[contains(@id, 'content-text')]")
-                            comment_text = content_el.text.strip() 
-                        except:
-                            pass
-                    
-                    # Yorum tarihi
-                    published_at = "Tarih alınamadı"
-                    try:
-                        date_el = thread.find_element(By.XPATH, ".//yt-formatted-string[@class='published-time-text'] | .//span[contains(@class, 'published-time-text')]")
-                        published_at = date_el.text.strip()
-                    except:
-                        pass
-                    
-                    # Beğeni sayısı
-                    like_count = "0"
+        progress(stage, **info)
+    except Exception as e:
+        logging.debug(f"Progress callback failed: {str(e)}")
+
+# Analiz bölümlerini "section" ilerleme olayı olarak ilet; dinleyen yoksa yanıt akış halinde istenmez
+def section_reporter(progress):
+    if progress is None:
+        return None
+    return lambda field, value: report_progress(progress, "section", field=field, value=value)
+
+# Çekilecek en fazla yorum (Selenium ve HTTP kaynakları)
+MAX_COMMENTS = int(os.environ.get("MAX_COMMENTS", "200"))
+# Yüksek hacim modu (Selenium): toplanan thread düğümleri DOM'dan silinir, böylece binlerce yorumda da
+# tarayıcıdaki eleman sayısı ve bellek sabit kalır. "auto" iken MAX_COMMENTS HIGH_VOLUME_THRESHOLD'u aşınca açılır.
+HIGH_VOLUME_MODE = os.environ.get("HIGH_VOLUME_MODE", "auto").lower()
+HIGH_VOLUME_THRESHOLD = int(os.environ.get("HIGH_VOLUME_THRESHOLD", "500"))  # "auto" modda bu yorum sınırının üstünde açılır
+DOM_PRUNE_KEEP = int(os.environ.get("DOM_PRUNE_KEEP", "20"))  # Silinmeden bırakılan son thread sayısı
+
+def high_volume_enabled(max_comments=None):
+    if HIGH_VOLUME_MODE == "auto":
+        return (max_comments or MAX_COMMENTS) > HIGH_VOLUME_THRESHOLD
+    return HIGH_VOLUME_MODE in ("1", "true", "on")
+
+# Kaydırma turu sınırı: her turda ~20 thread yüklenir, üst sınır yorum sınırıyla ölçeklenir
+def max_scroll_attempts_for(max_comments, minimum=30):
+    return max(minimum, max_comments // 10)
+
+# Bir isteğin tarayıcıyla yorum çekme süresine üst sınır (sn); dolunca o ana kadar toplananlarla devam edilir
+SCRAPE_DEADLINE = float(os.environ.get("SCRAPE_DEADLINE", "90"))
+
+# Süre sınırına kalan süre (sn), en fazla cap; deadline None ise sınır yoktur ve cap döner
+def time_left(deadline, cap=None):
+    if deadline is None:
+        return cap
+    left = max(0.0, deadline - time.monotonic())
+    return left if cap is None else min(cap, left)
+
+def deadline_passed(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+# Artımlı yenilemede yorumu tanıyan anahtar: yorum kimliği, yoksa normalize edilmiş metin
+def comment_key(comment):
+    return comment.get("commentId") or normalize_text(comment.get("textDisplay") or "")
+
+# Daha önce kaydedilmiş yorumları ayıkla; (yeni yorumlar, kayıtlı yorum görüldü mü) döndürür.
+# newest_first=True ise liste en yeniden eskiye sıralıdır: ilk kayıtlı yorumdan sonrası da eskidir ve atılır.
+def split_new_comments(comments, known_keys, newest_first):
+    if newest_first:
+        for index, comment in enumerate(comments):
+            if comment_key(comment) in known_keys:
+                return comments[:index], True
+        return comments, False
+    fresh = [comment for comment in comments if comment_key(comment) not in known_keys]
+    return fresh, len(fresh) < len(comments)
+
+# Kaydırma beklemeleri: sabit time.sleep yerine yeni yorum gelene kadar kısa aralıklarla yokla
+SCROLL_GROWTH_TIMEOUT = float(os.environ.get("SCROLL_GROWTH_TIMEOUT", "4"))  # Bir kaydırmadan sonra büyüme için en fazla bekleme (sn)
+SCROLL_POLL_INTERVAL = 0.25
+
+# Eleman sayısını ve yorum listesinin sonundaki "devamını yükle" öğesini tek çağrıda oku
+LOAD_STATE_SCRIPT = """
+const count = document.querySelectorAll(arguments[0]).length;
+const continuation = document.querySelector('ytd-comments ytd-continuation-item-renderer');
+return [count, continuation !== null];
+"""
+
+def get_load_state(driver, css_selector):
+    count, has_continuation = driver.execute_script(LOAD_STATE_SCRIPT, css_selector)
+    return count, has_continuation
+
+# Sayfanın temel yüklenmesini bekle
+def wait_for_page_ready(driver, timeout=10):
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=SCROLL_POLL_INTERVAL).until(
+            lambda d: d.execute_script("return document.readyState;") == "complete"
+        )
+    except TimeoutException:
+        logging.warning("Page did not reach readyState=complete in time")
+
+# Yorum sayısı artana ya da yükleyici kaybolana kadar bekle (en fazla timeout saniye)
+def wait_for_growth(driver, css_selector, previous_count, timeout=SCROLL_GROWTH_TIMEOUT):
+    state = {"count": previous_count, "has_continuation": True}
+
+    def grown_or_finished(d):
+        state["count"], state["has_continuation"] = get_load_state(d, css_selector)
+        return state["count"] > previous_count or not state["has_continuation"]
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=SCROLL_POLL_INTERVAL).until(grown_or_finished)
+    except TimeoutException:
+        pass
+    return state["count"], state["has_continuation"]
+
+# Yorumlar artmayı bırakana kadar sayfanın sonuna kaydır
+# on_growth verilirse her büyüyen turdan sonra yeni eleman sayısıyla çağrılır (ör. yeni yorumları toplamak için);
+# True döndürürse kaydırma durur (ör. artımlı yenilemede kayıtlı bir yoruma ulaşıldığında)
+# deadline geçince (time.monotonic()) kaydırma o ana kadar yüklenenlerle biter
+def scroll_until_stalled(driver, css_selector, max_items, max_scroll_attempts=30, progress=None, on_growth=None, deadline=None):
+    with span("scroll"):
+        current_count, _ = get_load_state(driver, css_selector)
+        scroll_count = 0
+
+        while current_count < max_items and scroll_count < max_scroll_attempts:
+            if deadline_passed(deadline):
+                logging.warning(f"Scrape deadline reached after {scroll_count} scrolls with {current_count} elements")
+                break
+            driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+            new_count, has_continuation = wait_for_growth(driver, css_selector, current_count, time_left(deadline, SCROLL_GROWTH_TIMEOUT))
+            scroll_count += 1
+
+            if new_count <= current_count:
+                # Sıkışma durumunda bir kez yukarı-aşağı kaydırıp tekrar dene, yine artmazsa dur
+                driver.execute_script("window.scrollBy(0, -window.innerHeight); window.scrollTo(0, document.documentElement.scrollHeight);")
+                new_count, has_continuation = wait_for_growth(driver, css_selector, current_count, time_left(deadline, SCROLL_GROWTH_TIMEOUT))
+                if new_count <= current_count:
+                    logging.info(f"Comment loading stalled at {current_count} after scroll {scroll_count} (continuation={has_continuation})")
+                    break
+
+            current_count = new_count
+            logging.info(f"Loaded {current_count} elements ({css_selector}) after scroll {scroll_count}")
+            report_progress(progress, "scrolling", loaded=current_count, scrolls=scroll_count)
+            if on_growth and on_growth(current_count):
+                logging.info(f"Scrolling stopped by the harvester after scroll {scroll_count}")
+                break
+
+        return current_count
+
+# Tembel yüklenen yorum bölümü DOM'a gelene kadar aşağı kaydır
+def scroll_to_comments_section(driver, timeout=10):
+    with span("scroll_to_comments"):
+        comments_section_xpath = "//ytd-comments[@id='comments']"
+
+        def find_section(d):
+            sections = d.find_elements(By.XPATH, comments_section_xpath)
+            if sections:
+                return sections[0]
+            d.execute_script("window.scrollBy(0, 500);")
+            return False
+
+        comments_section = WebDriverWait(driver, timeout, poll_frequency=SCROLL_POLL_INTERVAL).until(find_section)
+        driver.execute_script("arguments[0].scrollIntoView(true);", comments_section)
+        # Yorumların yüklenmesini tetiklemek için bölümün biraz altına in
+        driver.execute_script("window.scrollBy(0, 500);")
+        return comments_section
+
+# Bir yorum düğümünü {id, author, avatar, text, published, likes} nesnesine çeviren ortak yardımcılar
+COMMENT_NODE_JS = """
+const pick = (root, selectors) => {
+    for (const selector of selectors) {
+        const el = root.querySelector(selector);
+        if (el) return el;
+    }
+    return null;
+};
+const textOf = el => el ? (el.innerText || el.textContent || '').trim() : '';
+const toItem = node => {
+    const img = pick(node, ['img#img', 'yt-img-shadow img']);
+    // Yorum kimliği, yayın zamanı bağlantısının lc parametresindedir
+    const link = pick(node, ['#published-time-text a', 'a#published-time-text', '.published-time-text a']);
+    const id = link ? /[?&]lc=([^&#]+)/.exec(link.getAttribute('href') || '') : null;
+    return {
+        id: id ? decodeURIComponent(id[1]) : null,
+        author: textOf(pick(node, ['#author-text', 'span.ytd-comment-renderer'])),
+        avatar: img ? (img.getAttribute('src') || null) : null,
+        text: textOf(pick(node, ['yt-formatted-string#content-text', 'div#content-text', '[id*="content-text"]'])),
+        published: textOf(pick(node, ['#published-time-text', '.published-time-text'])),
+        likes: textOf(pick(node, ['#vote-count-middle', '.vote-count-middle']))
+    };
+};
+"""
+
+# arguments[1] sırasından itibaren tüm yorum düğümlerini sayfa içinde gezip tek seferde listele.
+# hasReplies, thread'in "yanıtları göster" düğmesi olup olmadığını belirtir.
+EXTRACT_COMMENTS_SCRIPT = COMMENT_NODE_JS + """
+return Array.from(document.querySelectorAll(arguments[0])).slice(arguments[1] || 0).map(node => {
+    const item = toItem(node);
+    item.hasReplies = node.querySelector('#more-replies') !== null;
+    return item;
+});
+"""
+
+# start sırasındaki düğümden itibaren yorumları tek execute_script çağrısıyla çıkar.
+# (yorumlar, bir sonraki başlangıç sırası) döndürür; böylece kaydırma sırasında sadece yeni düğümler okunur.
+# on_item verilirse her yorum (düğüm sırası, yorum, yanıtı var mı) ile bildirilir
+def harvest_new_comments(driver, css_selector, start=0, on_item=None):
+    with span("extract"):
+        items = driver.execute_script(EXTRACT_COMMENTS_SCRIPT, css_selector, start) or []
+        results = []
+        for offset, item in enumerate(items):
+            # Sadece yorum metni varsa ekle
+            if not item.get("text"):
+                continue
+            comment = comment_from_item(item)
+            results.append(comment)
+            if on_item:
+                on_item(start + offset, comment, bool(item.get("hasReplies")))
+        return results, start + len(items)
+
+# Yüksek hacim modu: henüz toplanmamış thread'leri okuyup işaretle, sondaki arguments[1] düğüm dışında
+# toplanmış düğümleri sil. Silme, devam yükleyicisini ve kaydırma konumunu bozmamak için sondakilere dokunmaz.
+HARVEST_AND_PRUNE_SCRIPT = COMMENT_NODE_JS + """
+const nodes = Array.from(document.querySelectorAll(arguments[0]));
+const items = [];
+for (const node of nodes) {
+    if (node.hasAttribute('data-harvested')) continue;
+    node.setAttribute('data-harvested', '');
+    items.push(toItem(node));
+}
+const removable = nodes.slice(0, Math.max(0, nodes.length - arguments[1]));
+removable.forEach(node => node.remove());
+return {
+    items: items,
+    pruned: removable.length,
+    remaining: nodes.length - removable.length,
+    heap: performance.memory ? performance.memory.usedJSHeapSize : null,
+    domNodes: document.getElementsByTagName('*').length
+};
+"""
+
+# Toplanan yorumları kimliğe göre tekilleştirip DOM'u budayan toplayıcı; tepe bellek ve hız istatistiği tutar
+class PrunedHarvester:
+    def __init__(self, driver, css_selector, keep=DOM_PRUNE_KEEP):
+        self.driver = driver
+        self.css_selector = css_selector
+        self.keep = max(1, keep)
+        self.seen = set()
+        self.count = 0  # Toplanan benzersiz yorum sayısı
+        self.dom_count = 0  # Budamadan sonra sayfada kalan thread sayısı
+        self.pruned = 0
+        self.duplicates = 0
+        self.peak_heap = 0
+        self.peak_dom_nodes = 0
+        self.started = time.perf_counter()
+
+    def harvest(self):
+        with span("extract"):
+            state = self.driver.execute_script(HARVEST_AND_PRUNE_SCRIPT, self.css_selector, self.keep) or {}
+        comments = []
+        for item in state.get("items") or []:
+            if not item.get("text"):
+                continue
+            # Kimlik yoksa (eski işaretleme) yazar + metin anahtar olarak kullanılır
+            key = item.get("id") or (item.get("author"), item["text"])
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            comments.append(comment_from_item(item))
+        self.count += len(comments)
+        self.dom_count = state.get("remaining") or 0
+        self.pruned += state.get("pruned") or 0
+        self.peak_heap = max(self.peak_heap, state.get("heap") or 0)
+        self.peak_dom_nodes = max(self.peak_dom_nodes, state.get("domNodes") or 0)
+        return comments
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "comments": self.count,
+            "seconds": round(elapsed, 2),
+            "comments_per_second": round(self.count / elapsed, 1) if elapsed > 0 else None,
+            "peak_js_heap_mb": round(self.peak_heap / (1024 * 1024), 1) if self.peak_heap else None,
+            "peak_dom_nodes": self.peak_dom_nodes,
+            "pruned_threads": self.pruned,
+            "duplicate_threads": self.duplicates
+        }
+
+# Yüksek hacim modunda kaydırma: her büyümede yeni thread'ler toplanır ve eski düğümler silinir.
+# Büyüme budamadan sonra kalan düğüm sayısına göre ölçülür, sınır ise toplanan yorum sayısına uygulanır.
+# on_growth True döndürürse kaydırma durur.
+def scroll_and_prune(driver, harvester, max_items, max_scroll_attempts, progress=None, on_growth=None, deadline=None):
+    with span("scroll"):
+        scroll_count = 0
+        while harvester.count < max_items and scroll_count < max_scroll_attempts:
+            if deadline_passed(deadline):
+                logging.warning(f"Scrape deadline reached after {scroll_count} scrolls with {harvester.count} comments")
+                break
+            driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
+            new_count, has_continuation = wait_for_growth(driver, harvester.css_selector, harvester.dom_count, time_left(deadline, SCROLL_GROWTH_TIMEOUT))
+            scroll_count += 1
+
+            if new_count <= harvester.dom_count:
+                driver.execute_script("window.scrollBy(0, -window.innerHeight); window.scrollTo(0, document.documentElement.scrollHeight);")
+                new_count, has_continuation = wait_for_growth(driver, harvester.css_selector, harvester.dom_count, time_left(deadline, SCROLL_GROWTH_TIMEOUT))
+                if new_count <= harvester.dom_count:
+                    logging.info(f"Comment loading stalled at {harvester.count} after scroll {scroll_count} (continuation={has_continuation})")
+                    break
+
+            if on_growth:
+                stop = on_growth(harvester.count)
+            else:
+                stop = False
+                harvester.harvest()
+            report_progress(progress, "scrolling", loaded=harvester.count, scrolls=scroll_count)
+            if stop:
+                logging.info(f"Scrolling stopped by the harvester after scroll {scroll_count}")
+                break
+
+        return harvester.count
+
+# Sayfa içi betiğin döndürdüğü nesneyi sonuç sözlüğüne çevir
+def comment_from_item(item):
+    return {
+        "commentId": item.get("id"),
+        "authorDisplayName": item.get("author") or "Anonim Kullanıcı",
+        "authorProfileImageUrl": item.get("avatar"),
+        "textDisplay": item["text"],
+        "publishedAt": item.get("published") or "Tarih alınamadı",
+        "likeCount": item.get("likes") or "0"
+    }
+
+# Yanıt genişletme (isteğe bağlı): en çok beğenilen REPLY_EXPAND_TOP_THREADS thread'in yanıtları açılır
+REPLY_EXPAND_TOP_THREADS = int(os.environ.get("REPLY_EXPAND_TOP_THREADS", "0"))  # 0 = kapalı
+REPLY_MAX_PER_THREAD = int(os.environ.get("REPLY_MAX_PER_THREAD", "10"))
+REPLY_MAX_TOTAL = int(os.environ.get("REPLY_MAX_TOTAL", "100"))
+REPLY_SETTLE_TIMEOUT = float(os.environ.get("REPLY_SETTLE_TIMEOUT", "3"))  # Kaydırma bittikten sonra açılan yanıtlar için en fazla bekleme (sn)
+
+# arguments[1] sıralarındaki thread'lerin "yanıtları göster" düğmelerine tek çağrıda tıkla, tıklananları döndür
+EXPAND_REPLIES_SCRIPT = """
+const threads = document.querySelectorAll(arguments[0]);
+const clicked = [];
+for (const index of arguments[1]) {
+    const button = threads[index] ? threads[index].querySelector('#more-replies button, #more-replies') : null;
+    if (button) {
+        button.click();
+        clicked.push(index);
+    }
+}
+return clicked;
+"""
+
+# arguments[1] sıralarındaki thread'lerin yüklenmiş yanıtlarını (thread başına en fazla arguments[2]) tek çağrıda oku
+EXTRACT_REPLIES_SCRIPT = COMMENT_NODE_JS + """
+const threads = document.querySelectorAll(arguments[0]);
+const replySelector = 'ytd-comment-replies-renderer ytd-comment-renderer, ytd-comment-replies-renderer ytd-comment-view-model';
+return arguments[1].map(index => {
+    const thread = threads[index];
+    return thread ? Array.from(thread.querySelectorAll(replySelector)).slice(0, arguments[2]).map(toItem) : [];
+});
+"""
+
+# Açılan thread'lerin yanıtlarının hepsinin geldiğini kontrol et
+REPLIES_LOADED_SCRIPT = """
+const threads = document.querySelectorAll(arguments[0]);
+return arguments[1].every(index => !threads[index] || threads[index].querySelector('ytd-comment-replies-renderer ytd-comment-renderer, ytd-comment-replies-renderer ytd-comment-view-model') !== null);
+"""
+
+# Kaydırma döngüsüyle birlikte çalışan yanıt genişletici.
+# Her turda önceki turda açılan yanıtlar toplanır ve o ana kadarki en çok beğenilen thread'ler tek çağrıda açılır;
+# yanıtlar bir sonraki kaydırma beklemesi sırasında yüklenir, thread başına bekleme yapılmaz.
+class ReplyExpander:
+    def __init__(self, driver, css_selector, top_threads, per_thread, total):
+        self.driver = driver
+        self.css_selector = css_selector
+        self.top_threads = top_threads
+        self.per_thread = per_thread
+        self.total = total
+        self.candidates = {}  # düğüm sırası -> yorum (yanıtı olan thread'ler)
+        self.expanded = []
+
+    def observe(self, index, comment, has_replies):
+        if has_replies:
+            self.candidates[index] = comment
+
+    def _expand_top(self):
+        budget = self.top_threads - len(self.expanded)
+        if budget <= 0:
+            return
+        expanded = set(self.expanded)
+        ranked = sorted(
+            (index for index in self.candidates if index not in expanded),
+            key=lambda index: -parse_like_count(self.candidates[index]["likeCount"])
+        )[:budget]
+        if ranked:
+            self.expanded.extend(self.driver.execute_script(EXPAND_REPLIES_SCRIPT, self.css_selector, ranked) or [])
+
+    # Açılmış thread'lerin yanıtlarını oku ve genel sınır içinde üst yorumlara ekle
+    def _collect(self):
+        if not self.expanded:
+            return
+        remaining = self.total
+        reply_lists = self.driver.execute_script(EXTRACT_REPLIES_SCRIPT, self.css_selector, self.expanded, self.per_thread) or []
+        for index, items in zip(self.expanded, reply_lists):
+            replies = [comment_from_item(item) for item in items if item.get("text")][:max(0, remaining)]
+            remaining -= len(replies)
+            if replies:
+                self.candidates[index]["replies"] = replies
+
+    def step(self):
+        with span("replies"):
+            self._collect()
+            self._expand_top()
+
+    # Kaydırma bittikten sonra: son açılanların yüklenmesini kısa süre (en geç deadline'a kadar) bekle ve yanıtları topla
+    def finish(self, deadline=None):
+        with span("replies"):
+            self._expand_top()
+            if self.expanded:
+                try:
+                    WebDriverWait(self.driver, time_left(deadline, REPLY_SETTLE_TIMEOUT), poll_frequency=SCROLL_POLL_INTERVAL).until(
+                        lambda d: d.execute_script(REPLIES_LOADED_SCRIPT, self.css_selector, self.expanded)
+                    )
+                except TimeoutException:
+                    logging.info("Some expanded reply threads did not load in time")
+            self._collect()
+        replies = sum(len(comment.get("replies", [])) for comment in self.candidates.values())
+        logging.info(f"Expanded {len(self.expanded)} reply threads, collected {replies} replies")
+
+# Yorumları tek execute_script çağrısıyla çıkar ve sonuç sözlüklerine dönüştür
+def extract_comments_bulk(driver, css_selector):
+    return harvest_new_comments(driver, css_selector)[0]
+
+# Yorum bölümündeki işaretleme türleri, öncelik sırasıyla: thread (2023+), tekil renderer (eski), sadece metin alanları
+COMMENT_MARKUP_VARIANTS = (
+    ("thread", "ytd-comment-thread-renderer"),
+    ("renderer", "ytd-comment-renderer"),
+    ("content_text", "ytd-comments [id*='content-text']"),
+)
+COMMENT_MARKUP_SELECTORS = dict(COMMENT_MARKUP_VARIANTS)
+COMMENT_MARKUP_TIMEOUT = float(os.environ.get("COMMENT_MARKUP_TIMEOUT", "10"))  # Yorum bölümünün belirmesi için en fazla bekleme (sn)
+
+# Sayfada bulunan ilk işaretleme türünü ya da yorumlar kapalıysa "disabled" döndür; henüz hiçbiri yoksa null
+DETECT_MARKUP_SCRIPT = """
+for (const [name, selector] of arguments[0]) {
+    if (document.querySelector(selector)) return name;
+}
+const message = document.querySelector('ytd-comments ytd-message-renderer');
+return message && (message.innerText || message.textContent || '').trim() ? 'disabled' : null;
+"""
+
+# İşaretleme türü belli olana kadar kısa aralıklarla yokla; timeout içinde belirmezse None
+def wait_for_comment_markup(driver, timeout=COMMENT_MARKUP_TIMEOUT):
+    state = {"variant": None}
+
+    def detected(d):
+        state["variant"] = d.execute_script(DETECT_MARKUP_SCRIPT, [list(variant) for variant in COMMENT_MARKUP_VARIANTS])
+        return state["variant"] is not None
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=SCROLL_POLL_INTERVAL).until(detected)
+    except TimeoutException:
+        logging.info("No comment markup appeared before the timeout")
+    return state["variant"]
+
+# Sıralama menüsünü açıp ikinci seçeneği ("En yeni") tıkla. Menü öğeleri henüz çizilmediyse menüyü açıp false döner,
+# bir sonraki yoklamada tıklanır. Mevcut thread'ler işaretlenir; işaretliler kaybolunca liste yeniden yüklenmiş demektir.
+SORT_NEWEST_SCRIPT = """
+const menu = document.querySelector('ytd-comments yt-sort-filter-sub-menu-renderer, ytd-comments #sort-menu');
+if (!menu) return false;
+const items = menu.querySelectorAll('tp-yt-paper-listbox a, tp-yt-paper-listbox tp-yt-paper-item');
+if (items.length < 2) {
+    const trigger = menu.querySelector('#trigger, tp-yt-paper-button, yt-dropdown-menu');
+    if (trigger) trigger.click();
+    return false;
+}
+document.querySelectorAll(arguments[0]).forEach(el => el.setAttribute('data-before-sort', ''));
+items[1].click();
+return true;
+"""
+
+SORT_RELOADED_SCRIPT = """
+const nodes = document.querySelectorAll(arguments[0]);
+return nodes.length > 0 && !Array.from(nodes).some(el => el.hasAttribute('data-before-sort'));
+"""
+
+# Yorumları en yeniden eskiye sırala; liste yeniden yüklendiyse True
+def sort_comments_newest_first(driver, css_selector, timeout=5):
+    with span("sort_comments"):
+        started = time.monotonic()
+        try:
+            WebDriverWait(driver, timeout, poll_frequency=SCROLL_POLL_INTERVAL).until(
+                lambda d: d.execute_script(SORT_NEWEST_SCRIPT, css_selector))
+            remaining = max(0.5, timeout - (time.monotonic() - started))
+            WebDriverWait(driver, remaining, poll_frequency=SCROLL_POLL_INTERVAL).until(
+                lambda d: d.execute_script(SORT_RELOADED_SCRIPT, css_selector))
+            return True
+        except TimeoutException:
+            logging.warning("Could not switch comments to newest first")
+            return False
+
+# Sadece metin alanları bulunan sayfalarda start sırasından itibaren metinleri tek çağrıda al.
+# Yeterince uzun metinler yorum kabul edilir; (yorumlar, bir sonraki başlangıç sırası) döndürür.
+def harvest_comment_texts(driver, css_selector, start=0):
+    with span("extract"):
+        texts = driver.execute_script(
+            "return Array.from(document.querySelectorAll(arguments[0])).slice(arguments[1]).map(el => (el.innerText || '').trim());",
+            css_selector, start
+        ) or []
+        results = []
+        for offset, text in enumerate(texts):
+            if text and len(text) > 20:  # Muhtemelen yorumdur
+                results.append({
+                    "authorDisplayName": f"YouTube Kullanıcı {start + offset + 1}",
+                    "authorProfileImageUrl": None,
+                    "textDisplay": text,
+                    "publishedAt": "Tarih alınamadı",
+                    "likeCount": "0"
+                })
+        return results, start + len(texts)
+
+# YouTube yorumlarını çek
+# deadline: time.monotonic() cinsinden çekimin en geç biteceği an; verilmezse tarayıcı alındıktan SCRAPE_DEADLINE sn sonrası
+# Artımlı yenileme: newest_first=True ile yorumlar en yeniden eskiye sıralanır, known_keys'teki (comment_key) bir yoruma
+# ulaşınca kaydırma durur ve sadece yeni yorumlar döner. analyze_fn(başlık, yorumlar) verilirse analiz onunla yapılır.
+def fetch_youtube_comments(url, progress=None, deadline=None, newest_first=False, known_keys=None, analyze_fn=None):
+    started = time.monotonic()
+    video_id = extract_video_id(url)
+    if not video_id:
+        return {"error": "Geçersiz YouTube URL'si"}
+    
+    # YouTube yorum sayfasına git
+    comments_url = f"{YOUTUBE_BASE_URL}/watch?v={video_id}"
+    
+    driver = None
+    driver_broken = False
+    analyzer = None
+    
+    # Tarayıcıyla işimiz bitince analiz beklenmeden havuza geri ver
+    def release_driver():
+        nonlocal driver
+        if driver:
+            driver_pool.release(driver, broken=driver_broken)
+            driver = None
+    
+    try:
+        # Havuzdan hazır bir tarayıcı al
+        with span("driver_acquire"):
+            driver = driver_pool.acquire()
+        # Zaman aşımı mesajı için bu çekime gerçekten tanınan süre (çağıranın verdiği deadline daha dar olabilir)
+        budget = SCRAPE_DEADLINE if deadline is None else deadline - started
+        if deadline is None:
+            deadline = time.monotonic() + SCRAPE_DEADLINE
+        
+        logging.info(f"Fetching video: {video_id}")
+        report_progress(progress, "navigating")
+        with span("page_load"):
+            driver.set_page_load_timeout(max(1, time_left(deadline)))
+            try:
+                driver.get(comments_url)
+            except TimeoutException:
+                # Sayfa tamamen yüklenmese de yorum bölümü çoğu zaman kullanılabilir durumdadır
+                logging.warning("Page load timed out, continuing with the partially loaded page")
+        
+        # Başlık, yorum sayısı ve yorumların kapalı olup olmadığını tek sayfa içi çağrıyla al
+        page_info = read_page_info(driver)
+        video_title = page_info["video_title"] or "YouTube Video"
+        logging.info(f"Video title: {video_title}")
+        report_progress(progress, "title", video_title=video_title)
+        if page_info["comments_disabled"]:
+            return {
+                "comments": [],
+                "error": "Bu videoda yorumlar kapatılmış",
+                "video_title": video_title,
+                "total_comments": 0
+            }
+        
+        # Yüksek hacim modunda thread düğümleri silindiği için (düğüm sırasına dayanan) yanıt açma kullanılmaz
+        high_volume = high_volume_enabled(MAX_COMMENTS)
+        expand_replies = REPLY_EXPAND_TOP_THREADS > 0 and not high_volume
+        if REPLY_EXPAND_TOP_THREADS > 0 and high_volume:
+            logging.info("Reply expansion is disabled in high-volume mode")
+        scrape_stats = None
+        
+        # Kaydırma sırasında dolan yorum parçaları hemen analize gönderilir.
+        # Yanıtlar üst yoruma sonradan eklendiği için yanıt açma etkinken erken gönderim yapılmaz.
+        if ANALYSIS_PIPELINE and not expand_replies and analyze_fn is None:
+            analyzer = PipelinedAnalysis(video_title, expected_comments=page_info["total_comments"])
+            progress = analyzer.tap(progress)
+        
+        # Tarayıcıyı havuza bırakıp analiz et (ardışık modda analiz burada başlar)
+        def analyze(results):
+            release_driver()
+            report_progress(progress, "analyzing", comments=len(results))
+            if analyzer:
+                return analyzer.finish(video_title, results, on_section=section_reporter(progress))
+            if analyze_fn:
+                return analyze_fn(video_title, results)
+            return analyze_comments_with_gemini(video_title, results, on_section=section_reporter(progress))
+        
+        # Yorum sayısı başlığı yorum bölümüyle birlikte yüklenir; ilk okumada yoksa kaydırmadan sonra en fazla bir kez daha bakılır
+        reprobed = False
+        def refresh_page_info():
+            nonlocal reprobed
+            if not reprobed:
+                reprobed = True
+                try:
+                    info = probe_page_info(driver)
+                except Exception as e:
+                    logging.warning(f"Could not refresh page info: {str(e)}")
+                    return
+                if page_info["total_comments"] is None:
+                    page_info["total_comments"] = info["total_comments"]
+                page_info["comments_disabled"] = page_info["comments_disabled"] or info["comments_disabled"]
+        
+        def total_comment_count():
+            if page_info["total_comments"] is None:
+                refresh_page_info()
+            return page_info["total_comments"]
+        
+        # Sayfanın temel yüklenmesini bekle
+        with span("page_load"):
+            wait_for_page_ready(driver, timeout=time_left(deadline, 10))
+        
+        # Çerezleri kabul et (varsa)
+        with span("cookie_consent"):
+            try:
+                cookie_buttons = driver.find_elements(By.XPATH, 
+                    "//button[contains(@aria-label, 'Accept') or contains(@aria-label, 'Kabul') or contains(text(), 'Accept') or contains(text(), 'Kabul') or contains(text(), 'I agree')]")
+                if cookie_buttons:
+                    cookie_buttons[0].click()
                     try:
-                        like_el = thread.find_element(By.XPATH, ".//*[@id='vote-count-middle'] | .//*[contains(@class, 'vote-count-middle')]")
-                        like_count = like_el.text.strip()
-                        if not like_count:
-                            like_count = "0"
-                    except:
+                        WebDriverWait(driver, 3, poll_frequency=SCROLL_POLL_INTERVAL).until(EC.staleness_of(cookie_buttons[0]))
+                    except TimeoutException:
                         pass
-                    
-                    # Yorumu sonuçlara ekle
-                    if comment_text:  # Sadece yorum metni varsa ekle
-                        results.append({
-                            "authorDisplayName": author_name,
-                            "authorProfileImageUrl": author_img,
-                            "textDisplay": comment_text,
-                            "publishedAt": published_at,
-                            "likeCount": like_count
-                        })
-                except Exception as e:
-                    logging.error(f"Error parsing comment: {str(e)}")
-                    continue
-            
-            # Eğer yorum varsa analiz et ve döndür
-            if results:
-                # Gemini API ile analiz et
-                analysis = analyze_comments_with_gemini(video_title, results)
-                
-                # Toplam yorum sayısını al
-                total_comments = get_total_comment_count(driver)
-                
-                return {
-                    "comments": results,
-                    "analysis": analysis,
-                    "video_title": video_title,
-                    "total_comments": total_comments
-                }
-            
-            # Yorum thread'leri bulunamadıysa
-            logging.info("No comments found in thread view, trying renderer view")
-        except Exception as e:
-            logging.warning(f"Failed to extract comment threads: {str(e)}")
+                    logging.info("Cookie consent clicked")
+            except Exception as e:
+                logging.info(f"Cookie consent handling: {str(e)}")
         
-        # İkinci yöntem: Doğrudan yorum rendererları bul
-        comment_renderer_xpath = "//ytd-comment-renderer"
+        # Sayfa yüklenmesi için scroll yapalım
+        logging.info("Scrolling to load comments")
+        report_progress(progress, "scrolling", loaded=0)
+        
+        # Yorum bölümüne ulaşana kadar kaydır (2023-2025 YouTube yapısı)
         try:
-            comment_renderers = driver.find_elements(By.XPATH, comment_renderer_xpath)
-            logging.info(f"Found {len(comment_renderers)} comment renderers")
-            
-            # Daha fazla yorum yüklemek için scroll et
-            MAX_COMMENTS = 200  # Maksimum 200 yorum çek
-            previous_comment_count = 0
-            scroll_count = 0
-            max_scroll_attempts = 30
+            scroll_to_comments_section(driver, timeout=time_left(deadline, 10))
+            logging.info("Found comments section")
+        except Exception as e:
+            logging.warning(f"Could not find comments section: {e}")
+        
+        # Sayfanın hangi yorum işaretlemesini kullandığını (ya da yorumların kapalı olduğunu) kaydırmaya başlamadan belirle
+        variant = wait_for_comment_markup(driver, timeout=time_left(deadline, COMMENT_MARKUP_TIMEOUT))
+        logging.info(f"Comment markup variant: {variant}")
+        if variant == "disabled":
+            return {
+                "comments": [],
+                "error": "Bu videoda yorumlar kapatılmış",
+                "video_title": video_title,
+                "total_comments": 0
+            }
+        
+        # Tek kaydırma turu: her büyümede sadece yeni yüklenen düğümler, bulunan işaretlemeye uygun yöntemle tek çağrıda toplanır
+        results = []
+        reached_known = False
+        if variant:
+            selector = COMMENT_MARKUP_SELECTORS[variant]
+            # Sıralama değiştirilemezse kayıtlı yorumlar sadece ayıklanır, kaydırma erken bitmez
+            sorted_newest = False
+            if newest_first and variant != "content_text":
+                sorted_newest = sort_comments_newest_first(driver, selector, timeout=time_left(deadline, 5))
+            harvested = 0
+            replies = None
+            if expand_replies and variant == "thread":
+                replies = ReplyExpander(driver, selector, REPLY_EXPAND_TOP_THREADS, REPLY_MAX_PER_THREAD, REPLY_MAX_TOTAL)
+            # Yüksek hacim modunda okunan düğümler DOM'dan silinir, yorumlar kimliğe göre tekilleştirilir
+            harvester = PrunedHarvester(driver, selector) if high_volume and variant != "content_text" else None
             
-            current_comment_count = len(comment_renderers)
+            def harvest(_count=None):
+                nonlocal harvested, reached_known
+                if reached_known and sorted_newest:
+                    return True
+                if harvester:
+                    batch = harvester.harvest()[:max(0, MAX_COMMENTS - len(results))]
+                elif variant == "content_text":
+                    batch, harvested = harvest_comment_texts(driver, selector, harvested)
+                else:
+                    batch, harvested = harvest_new_comments(driver, selector, harvested, on_item=replies.observe if replies else None)
+                if known_keys:
+                    batch, seen_known = split_new_comments(batch, known_keys, sorted_newest)
+                    reached_known = reached_known or seen_known
+                if batch:
+                    results.extend(batch)
+                    report_progress(progress, "comments", comments=batch)
+                if replies:
+                    replies.step()
+                return reached_known and sorted_newest
             
-            # Daha fazla yorum yüklemek için scroll
-            while current_comment_count < MAX_COMMENTS and current_comment_count > previous_comment_count and scroll_count < max_scroll_attempts:
-                previous_comment_count = current_comment_count
-                
-                # Sayfanın sonuna doğru kaydır
-                driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-                time.sleep(2)
-                
-                # Yeni yorum count'u al
-                comment_renderers = driver.find_elements(By.XPATH, comment_renderer_xpath)
-                current_comment_count = len(comment_renderers)
+            try:
+                # Yorumlar artmayı bırakana, süre dolana ya da (artımlı yenilemede) kayıtlı yoruma ulaşılana kadar scroll et
+                if not harvest():
+                    if harvester:
+                        scroll_and_prune(driver, harvester, MAX_COMMENTS, max_scroll_attempts_for(MAX_COMMENTS), progress=progress, on_growth=harvest, deadline=deadline)
+                    else:
+                        scroll_until_stalled(driver, selector, MAX_COMMENTS, max_scroll_attempts=max_scroll_attempts_for(MAX_COMMENTS), progress=progress, on_growth=harvest, deadline=deadline)
                 
-                logging.info(f"Loaded {current_comment_count} renderer comments after scroll {scroll_count + 1}")
-                scroll_count += 1
-            
-            # Yorum parçalarını çıkar
-            results = []
-            for comment in comment_renderers:  # Tüm yorumları al
-                try:
-                    # Yorum metnini doğrudan al
-                    comment_text = ""
-                    try:
-                        content_el = comment.find_element(By.XPATH, ".//yt-formatted-string[@id='content-text']")
-                        comment_text = content_el.text.strip()
-                    except:
-                        pass
-                    
-                    # Eğer yorum metni bulunduysa diğer bilgileri ekstra
-                    if comment_text:
-                        # Yazar adı
-                        author_name = "Anonim Kullanıcı"
-                        try:
-                            author_el = comment.find_element(By.XPATH, ".//a[@id='author-text']")
-                            author_name = author_el.text.strip()
-                        except:
-                            pass
-                        
-                        # Diğer bilgiler
-                        results.append({
-                            "authorDisplayName": author_name,
-                            "authorProfileImageUrl": None,
-                            "textDisplay": comment_text,
-                            "publishedAt": "Tarih alınamadı",
-                            "likeCount": "0"
-                        })
-                except Exception as e:
-                    logging.error(f"Error parsing renderer comment: {str(e)}")
-                    continue
+                # Son turda kalan düğümleri de al
+                report_progress(progress, "extracting")
+                harvest()
+                if replies:
+                    replies.finish(deadline)
+            except Exception as e:
+                # Kaydırma yarıda kalsa da o ana kadar toplanan yorumlar kullanılır
+                logging.warning(f"Failed to extract comments ({variant}): {str(e)}")
+            logging.info(f"Extracted {len(results)} comments ({variant})")
+            if harvester:
+                scrape_stats = harvester.stats()
+                logging.info(f"High-volume scrape: {scrape_stats}")
             
             # Eğer yorum varsa analiz et ve döndür
             if results:
-                # Gemini API ile analiz et
-                analysis = analyze_comments_with_gemini(video_title, results)
-                
                 # Toplam yorum sayısını al
-                total_comments = get_total_comment_count(driver)
+                total_comments = total_comment_count()
                 
-                return {
+                # Gemini API ile analiz et
+                analysis = analyze(results)
+                
+                result = {
                     "comments": results,
                     "analysis": analysis,
                     "video_title": video_title,
                     "total_comments": total_comments
                 }
-        except Exception as e:
-            logging.warning(f"Failed to extract comment renderers: {str(e)}")
-        
-        # Son çare: Sayfada XPATH ile içerik-metin alanlarını ara
-        content_text_xpath = "//*[contains(@id, 'content-text')]"
-        try:
-            content_texts = driver.find_elements(By.XPATH, content_text_xpath)
-            logging.info(f"Found {len(content_texts)} content text elements")
+                if scrape_stats:
+                    result["scrape_stats"] = scrape_stats
+                return result
             
-            # Daha fazla yorum yüklemek için scroll et
-            MAX_COMMENTS = 200
-            previous_content_count = 0
-            scroll_count = 0
-            max_scroll_attempts = 20
-            
-            current_content_count = len(content_texts)
-            
-            # Daha fazla içerik yüklemek için scroll
-            while current_content_count < MAX_COMMENTS and current_content_count > previous_content_count and scroll_count < max_scroll_attempts:
-                previous_content_count = current_content_count
-                
-                # Sayfanın sonuna doğru kaydır
-                driver.execute_script("window.scrollTo(0, document.documentElement.scrollHeight);")
-                time.sleep(2)
-                
-                # Yeni içerik count'u al
-                content_texts = driver.find_elements(By.XPATH, content_text_xpath)
-                current_content_count = len(content_texts)
-                
-                logging.info(f"Loaded {current_content_count} content elements after scroll {scroll_count + 1}")
-                scroll_count += 1
-            
-            # Yeterince uzun metinleri yorum olarak al
-            results = []
-            for i, element in enumerate(content_texts):  # Tüm içerikleri al
-                try:
-                    text = element.text.strip()
-                    if text and len(text) > 20:  # Muhtemelen yorumdur
-                        results.append({
-                            "authorDisplayName": f"YouTube Kullanıcı {i+1}",
-                            "authorProfileImageUrl": None,
-                            "textDisplay": text,
-                            "publishedAt": "Tarih alınamadı",
-                            "likeCount": "0"
-                        })
-                except Exception as e:
-                    logging.error(f"Error parsing text element: {str(e)}")
-                    continue
-            
-            # Eğer yorum varsa analiz et ve döndür
-            if results:
-                # Gemini API ile analiz et
-                analysis = analyze_comments_with_gemini(video_title, results)
-                
-                # Toplam yorum sayısını al
-                total_comments = get_total_comment_count(driver)
-                
+            # Artımlı yenilemede sadece kayıtlı yorumlar bulunduysa yeni yorum yoktur (hata değil)
+            if reached_known:
                 return {
-                    "comments": results,
-                    "analysis": analysis,
+                    "comments": [],
+                    "analysis": None,
                     "video_title": video_title,
-                    "total_comments": total_comments
+                    "total_comments": total_comment_count()
                 }
-        except Exception as e:
-            logging.warning(f"Failed to extract content text elements: {str(e)}")
         
         # Yorumlar bulunamadıysa
-        # Sayfadaki durum kontrolü (yorumlar kapatılmış mı?)
-        page_source = driver.page_source
-        if "Bu videoda yorumlar kapatıldı" in page_source or "Comments are turned off" in page_source:
+        # Sayfadaki durum kontrolü (yorumlar kapatılmış mı?); mesaj kaydırmadan sonra yüklenmiş olabilir
+        refresh_page_info()
+        if page_info["comments_disabled"]:
             return {
                 "comments": [], 
                 "error": "Bu videoda yorumlar kapatılmış", 
@@ -698,64 +1881,794 @@ def fetch_youtube_comments(url):
                 "total_comments": 0
             }
         
-        # Ekran görüntüsü al (debug için)
-        try:
-            screenshot_path = "debug_screenshot.png"
-            driver.save_screenshot(screenshot_path)
-            logging.info(f"Saved debug screenshot to {screenshot_path}")
-        except Exception as e:
-            logging.error(f"Failed to save screenshot: {str(e)}")
-        
-        # Son çare olarak sayfadaki tüm metin içeren elementleri al
-        try:
-            text_elements = driver.find_elements(By.XPATH, "//div[string-length(text()) > 20]")
-            if text_elements and len(text_elements) > 0:
-                results = []
-                for i, el in enumerate(text_elements[:10]):
-                    text = el.text.strip()
-                    if text:
-                        results.append({
-                            "authorDisplayName": "Bilinmeyen Kullanıcı",
-                            "authorProfileImageUrl": None,
-                            "textDisplay": text,
-                            "publishedAt": "Tarih alınamadı",
-                            "likeCount": "0"
-                        })
-                
-                if results:
-                    # Gemini API ile analiz et
-                    analysis = analyze_comments_with_gemini(video_title, results)
-                    
-                    # Toplam yorum sayısını al
-                    total_comments = get_total_comment_count(driver)
-                    
-                    return {
-                        "comments": results, 
-                        "warning": "Yorumlar tam olarak çıkarılamadı, sadece metin içeriği gösteriliyor",
-                        "analysis": analysis,
-                        "video_title": video_title,
-                        "total_comments": total_comments
-                    }
-        except Exception as e:
-            logging.error(f"Last resort text extraction failed: {str(e)}")
-        
         # Toplam yorum sayısını al
-        total_comments = get_total_comment_count(driver)
+        total_comments = total_comment_count()
 
         return {
             "comments": [], 
-            "error": "Yorumlar bulunamadı veya yüklenemedi", 
+            "error": f"Yorumlar {max(0, budget):.0f} sn içinde yüklenemedi" if deadline_passed(deadline) else "Yorumlar bulunamadı veya yüklenemedi", 
             "video_title": video_title, 
             "total_comments": total_comments
         }
     
     except Exception as e:
         logging.error(f"Error fetching comments: {str(e)}")
+        # Tarayıcı çöktüyse havuza geri koyma
+        driver_broken = isinstance(e, WebDriverException)
         return {"error": str(e), "comments": [], "video_title": "Bilinmeyen Video", "total_comments": None}
     
     finally:
-        if driver:
-            driver.quit()
+        release_driver()
+        if analyzer:
+            analyzer.close()
+
+# Yorum kaynağı: "http" (tarayıcısız, varsayılan) veya "selenium". HTTP başarısız olursa Selenium'a düşülür.
+COMMENT_SOURCE = os.environ.get("COMMENT_SOURCE", "http").lower()
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "15"))
+HTTP_MAX_PAGES = max(30, MAX_COMMENTS // 10)  # En fazla bu kadar yorum devam sayfası çekilir (sayfa başına ~20 yorum)
+
+# Tüm HTTP isteklerinin paylaştığı bağlantı havuzlu oturum
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2))
+http_session.headers.update({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Accept-Language": "tr-TR,tr;q=0.9,en-US;q=0.8,en;q=0.7"
+})
+# AB çerez onay sayfasına yönlendirilmemek için onay çerezini önceden ayarla
+http_session.cookies.set("SOCS", "CAI", domain=".youtube.com")
+
+# Sayfa içine gömülü bir JSON nesnesini (ör. ytInitialData) bul ve çöz
+def extract_embedded_json(page_html, variable_name):
+    match = re.search(r'(?:var\s+|window\[["\'])' + re.escape(variable_name) + r'(?:["\']\])?\s*=\s*', page_html)
+    if not match:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(page_html, match.end())
+        return data
+    except json.JSONDecodeError as e:
+        logging.warning(f"Could not decode {variable_name}: {str(e)}")
+        return None
+
+# Verilen anahtarın iç içe JSON içindeki tüm değerlerini sırayla döndür
+def iter_json_key(obj, key):
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            for k, v in current.items():
+                if k == key:
+                    yield v
+                if isinstance(v, (dict, list)):
+                    stack.append(v)
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+def find_json_key(obj, key, default=None):
+    return next(iter_json_key(obj, key), default)
+
+# YouTube metin nesnesini ({"simpleText"} veya {"runs": [...]}) düz metne çevir
+def youtube_text(value):
+    if not value:
+        return ""
+    if isinstance(value, str):
+        return value
+    if "simpleText" in value:
+        return value["simpleText"]
+    return "".join(run.get("text", "") for run in value.get("runs", []))
+
+def parse_count_text(text):
+    digits = re.sub(r'[^\d]', '', text or "")
+    return int(digits) if digits else None
+
+# İzleme sayfası HTML'inden başlık, API ayarları ve ilk yorum devam anahtarını çıkar
+def parse_watch_page(page_html):
+    initial_data = extract_embedded_json(page_html, "ytInitialData")
+    if not initial_data:
+        raise Exception("Sayfada ytInitialData bulunamadı")
+
+    video_title = youtube_text(find_json_key(find_json_key(initial_data, "videoPrimaryInfoRenderer", {}), "title"))
+    if not video_title:
+        meta = re.search(r'<meta\s+name="title"\s+content="([^"]*)"', page_html)
+        video_title = html.unescape(meta.group(1)) if meta else "YouTube Video"
+
+    api_key = re.search(r'"INNERTUBE_API_KEY"\s*:\s*"([^"]+)"', page_html)
+    client_version = re.search(r'"INNERTUBE_CONTEXT_CLIENT_VERSION"\s*:\s*"([^"]+)"', page_html)
+    client_version = client_version.group(1) if client_version else "2.20240101.00.00"
+
+    # Yorum bölümü "comment-item-section" kimlikli itemSectionRenderer içindedir
+    continuation = None
+    comments_disabled = False
+    for section in iter_json_key(initial_data, "itemSectionRenderer"):
+        if section.get("sectionIdentifier") != "comment-item-section":
+            continue
+        command = find_json_key(section, "continuationCommand")
+        if command:
+            continuation = command.get("token")
+        elif find_json_key(section, "messageRenderer"):
+            comments_disabled = True
+        break
+
+    return {
+        "video_title": video_title,
+        "api_key": api_key.group(1) if api_key else None,
+        "context": {"client": {"clientName": "WEB", "clientVersion": client_version, "hl": "tr"}},
+        "continuation": continuation,
+        "comments_disabled": comments_disabled
+    }
+
+# Eski (commentRenderer) yapıdaki bir yorumu sonuç sözlüğüne çevir
+def comment_from_renderer(renderer):
+    thumbnails = (renderer.get("authorThumbnail") or {}).get("thumbnails") or [{}]
+    return {
+        "commentId": renderer.get("commentId"),
+        "authorDisplayName": youtube_text(renderer.get("authorText")) or "Anonim Kullanıcı",
+        "authorProfileImageUrl": thumbnails[-1].get("url"),
+        "textDisplay": youtube_text(renderer.get("contentText")),
+        "publishedAt": youtube_text(renderer.get("publishedTimeText")) or "Tarih alınamadı",
+        "likeCount": youtube_text(renderer.get("voteCount")) or "0"
+    }
+
+# Yeni (commentViewModel + entity) yapıdaki bir yorumu sonuç sözlüğüne çevir
+def comment_from_entity(entity):
+    properties = entity.get("properties", {})
+    author = entity.get("author", {})
+    toolbar = entity.get("toolbar", {})
+    return {
+        "commentId": properties.get("commentId"),
+        "authorDisplayName": author.get("displayName") or "Anonim Kullanıcı",
+        "authorProfileImageUrl": author.get("avatarThumbnailUrl"),
+        "textDisplay": (properties.get("content") or {}).get("content", ""),
+        "publishedAt": properties.get("publishedTime") or "Tarih alınamadı",
+        "likeCount": (toolbar.get("likeCountNotliked") or "").strip() or "0"
+    }
+
+# Bir yorum devam yanıtından yorumları, sonraki devam anahtarını ve toplam yorum sayısını çıkar
+def parse_comment_continuation(payload):
+    entities = {}
+    for mutation in iter_json_key(payload, "mutations"):
+        for item in mutation:
+            entity = (item.get("payload") or {}).get("commentEntityPayload")
+            if entity:
+                entities[item.get("entityKey") or entity.get("key")] = entity
+
+    comments = []
+    next_token = None
+    total_comments = None
+    for endpoint in payload.get("onResponseReceivedEndpoints", []):
+        action = endpoint.get("reloadContinuationItemsCommand") or endpoint.get("appendContinuationItemsAction") or {}
+        for item in action.get("continuationItems", []):
+            if "commentThreadRenderer" in item:
+                thread = item["commentThreadRenderer"]
+                if "comment" in thread:
+                    comment = comment_from_renderer(thread["comment"].get("commentRenderer", {}))
+                else:
+                    key = find_json_key(thread.get("commentViewModel", {}), "commentKey")
+                    if key not in entities:
+                        continue
+                    comment = comment_from_entity(entities[key])
+                if comment["textDisplay"]:
+                    comments.append(comment)
+            elif "commentsHeaderRenderer" in item:
+                header = item["commentsHeaderRenderer"]
+                total_comments = parse_count_text(youtube_text(header.get("countText") or header.get("commentsCount")))
+            elif "continuationItemRenderer" in item:
+                command = find_json_key(item["continuationItemRenderer"], "continuationCommand")
+                if command:
+                    next_token = command.get("token")
+
+    return comments, next_token, total_comments
+
+# Yorum başlığındaki sıralama menüsünden "En yeni" seçeneğinin (ikinci öğe) devam anahtarını bul
+def find_newest_sort_token(payload):
+    menu = find_json_key(payload, "sortFilterSubMenuRenderer") or {}
+    items = menu.get("subMenuItems") or []
+    if len(items) < 2:
+        return None
+    command = find_json_key(items[1], "continuationCommand")
+    return command.get("token") if command else None
+
+# Tarayıcı açmadan, izleme sayfası ve yorum devam istekleriyle yorumları çek
+# newest_first/known_keys: fetch_youtube_comments'teki artımlı yenileme seçenekleri
+def scrape_comments_http(video_id, max_comments=None, session=None, progress=None, deadline=None, newest_first=False, known_keys=None):
+    session = session or http_session
+    max_comments = max_comments or MAX_COMMENTS
+    deadline = deadline or time.monotonic() + SCRAPE_DEADLINE
+    report_progress(progress, "navigating")
+    with span("http_watch_page"):
+        response = session.get(f"{YOUTUBE_BASE_URL}/watch?v={video_id}", timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        page = parse_watch_page(response.text)
+    logging.info(f"[http] Video title: {page['video_title']}")
+    report_progress(progress, "title", video_title=page["video_title"])
+
+    comments = []
+    total_comments = None
+    token = page["continuation"]
+    page_count = 0
+    sort_pending = newest_first
+    sorted_newest = False
+    reached_known = False
+    while token and len(comments) < max_comments and page_count < HTTP_MAX_PAGES:
+        if deadline_passed(deadline):
+            logging.warning(f"[http] Scrape deadline reached after {page_count} pages with {len(comments)} comments")
+            break
+        with span("http_comment_page"):
+            response = session.post(
+                f"{YOUTUBE_BASE_URL}/youtubei/v1/next",
+                params={"key": page["api_key"], "prettyPrint": "false"} if page["api_key"] else {"prettyPrint": "false"},
+                json={"context": page["context"], "continuation": token},
+                headers={
+                    "X-YouTube-Client-Name": "1",
+                    "X-YouTube-Client-Version": page["context"]["client"]["clientVersion"]
+                },
+                timeout=time_left(deadline, HTTP_TIMEOUT) or 1
+            )
+            response.raise_for_status()
+            payload = response.json()
+            batch, token, count = parse_comment_continuation(payload)
+        page_count += 1
+        if total_comments is None:
+            total_comments = count
+        # İlk sayfa varsayılan sıradadır; "En yeni" sıralamasına geçip baştan başla
+        if sort_pending:
+            sort_pending = False
+            newest_token = find_newest_sort_token(payload)
+            if newest_token:
+                token = newest_token
+                sorted_newest = True
+                continue
+            logging.warning("[http] Newest-first sort option not found, filtering known comments instead")
+        if known_keys:
+            batch, seen_known = split_new_comments(batch, known_keys, sorted_newest)
+            reached_known = reached_known or seen_known
+        batch = batch[:max_comments - len(comments)]
+        comments.extend(batch)
+        if batch:
+            report_progress(progress, "comments", comments=batch)
+        logging.info(f"[http] Loaded {len(comments)} comments after page {page_count}")
+        report_progress(progress, "scrolling", loaded=len(comments), pages=page_count)
+        if reached_known and sorted_newest:
+            logging.info(f"[http] Reached a stored comment after page {page_count}")
+            break
+
+    return {
+        "comments": comments,
+        "video_title": page["video_title"],
+        "total_comments": total_comments,
+        "comments_disabled": page["comments_disabled"],
+        "reached_known": reached_known
+    }
+
+# HTTP kaynağıyla yorumları çek ve analiz et (fetch_youtube_comments ile aynı çıktı yapısı ve seçenekler)
+def fetch_youtube_comments_http(url, progress=None, newest_first=False, known_keys=None, analyze_fn=None):
+    video_id = extract_video_id(url)
+    if not video_id:
+        return {"error": "Geçersiz YouTube URL'si"}
+
+    # Sayfa sayfa gelen yorumlar dolan parçalar halinde çekim sürerken analize gönderilir
+    analyzer = PipelinedAnalysis() if ANALYSIS_PIPELINE and analyze_fn is None else None
+    try:
+        scraped = scrape_comments_http(video_id, progress=analyzer.tap(progress) if analyzer else progress,
+                                       newest_first=newest_first, known_keys=known_keys)
+        if scraped["comments_disabled"]:
+            return {
+                "comments": [],
+                "error": "Bu videoda yorumlar kapatılmış",
+                "video_title": scraped["video_title"],
+                "total_comments": 0
+            }
+        if not scraped["comments"] and scraped["reached_known"]:
+            # Artımlı yenilemede son kayıttan bu yana yeni yorum yok
+            return {
+                "comments": [],
+                "analysis": None,
+                "video_title": scraped["video_title"],
+                "total_comments": scraped["total_comments"]
+            }
+        if not scraped["comments"]:
+            raise Exception("HTTP kaynağından yorum alınamadı")
+
+        report_progress(progress, "analyzing", comments=len(scraped["comments"]))
+        if analyzer:
+            analysis = analyzer.finish(scraped["video_title"], scraped["comments"], on_section=section_reporter(progress))
+        elif analyze_fn:
+            analysis = analyze_fn(scraped["video_title"], scraped["comments"])
+        else:
+            analysis = analyze_comments_with_gemini(scraped["video_title"], scraped["comments"], on_section=section_reporter(progress))
+    finally:
+        if analyzer:
+            analyzer.close()
+    return {
+        "comments": scraped["comments"],
+        "analysis": analysis,
+        "video_title": scraped["video_title"],
+        "total_comments": scraped["total_comments"]
+    }
+
+# Seçilen kaynaktan yorumları getir; HTTP kaynağı başarısız olursa Selenium'a düş
+# options: artımlı yenileme seçenekleri (newest_first, known_keys, analyze_fn), iki kaynağa da aynen geçirilir
+def fetch_comments_uncached(url, source=None, progress=None, **options):
+    source = (source or COMMENT_SOURCE).lower()
+    if source == "http":
+        try:
+            return fetch_youtube_comments_http(url, progress=progress, **options)
+        except Exception as e:
+            logging.warning(f"HTTP comment source failed, falling back to Selenium: {str(e)}")
+    return fetch_youtube_comments(url, progress=progress, **options)
+
+# Video bazlı sonuç önbelleği ayarları
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", "results_cache.sqlite3")
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", str(6 * 60 * 60)))  # Varsayılan 6 saat
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "500"))
+
+# Yorum ve analiz sonuçlarını video kimliğine göre saklayan, yeniden başlatmalarda korunan SQLite deposu
+class ResultStore:
+    def __init__(self, path, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                video_id TEXT PRIMARY KEY,
+                video_title TEXT,
+                total_comments INTEGER,
+                comments TEXT NOT NULL,
+                analysis TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access)")
+
+    # include_expired=True ise süresi dolmuş kayıt da döner; artımlı yenileme ve takip soruları için son kayıt.
+    # Süresi dolan kayıtlar bu yüzden silinmez, tablo boyutunu LRU sınırı belirler.
+    def get(self, video_id, include_expired=False):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT video_title, total_comments, comments, analysis, created_at FROM results WHERE video_id = ?",
+                (video_id,)
+            ).fetchone()
+            if not row:
+                return None
+            if now - row[4] > self.ttl and not include_expired:
+                return None
+            self._conn.execute("UPDATE results SET last_access = ? WHERE video_id = ?", (now, video_id))
+        return {
+            "video_title": row[0],
+            "total_comments": row[1],
+            "comments": json.loads(row[2]),
+            "analysis": json.loads(row[3]) if row[3] else None,
+            "cached_at": row[4]
+        }
+
+    def put(self, video_id, result):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (video_id, video_title, total_comments, comments, analysis, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id,
+                    result.get("video_title"),
+                    result.get("total_comments"),
+                    json.dumps(result.get("comments", []), ensure_ascii=False),
+                    json.dumps(result["analysis"], ensure_ascii=False) if result.get("analysis") is not None else None,
+                    now,
+                    now
+                )
+            )
+            # En uzun süredir kullanılmayan kayıtları sil (LRU)
+            self._conn.execute(
+                "DELETE FROM results WHERE video_id NOT IN (SELECT video_id FROM results ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, video_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE video_id = ?", (video_id,))
+
+result_store = ResultStore(RESULT_CACHE_PATH, RESULT_CACHE_TTL, RESULT_CACHE_MAX_ENTRIES)
+
+# Aynı video için eşzamanlı istekler tek bir çekim paylaşır.
+# Kilit sadece o videoyu bekleyen/işleyen istek varken tutulur; son istek bitince silinir.
+_video_locks = {}  # video_id -> [kilit, kilidi kullanan istek sayısı]
+_video_locks_guard = threading.Lock()
+
+@contextmanager
+def video_lock(video_id):
+    with _video_locks_guard:
+        entry = _video_locks.setdefault(video_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _video_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _video_locks[video_id]
+
+# Başarılı sonuç: yorum var ve gerçek bir analiz döndü. Sadece bunlar önbelleğe alınır; toplu analiz ve işler de
+# video durumunu buna göre belirler.
+def is_successful_result(result):
+    analysis = result.get("analysis")
+    return bool(result.get("comments")) and "error" not in result and isinstance(analysis, dict) and "error" not in analysis
+
+# Artımlı yenilemede saklanan en fazla yorum (en yeniler tutulur); durma noktası için en yeni kayıtlar yeterlidir
+SNAPSHOT_MAX_COMMENTS = int(os.environ.get("SNAPSHOT_MAX_COMMENTS", "1000"))
+# Önceki çalıştırmaya ait, birleştirilmiş analizde anlamını yitiren alanlar
+SNAPSHOT_STALE_FIELDS = ("tekrar_birlestirme", "ornekleme", "parcali_analiz", "degisiklik")
+
+# Yeni yorumların analizini önceki analize ekle: duygu dağılımı yorum sayısına göre ağırlıklandırılır,
+# listeler birleştirilir, "degisiklik" alanında yeni konular ve değişim özeti verilir
+def merge_incremental_analysis(previous, delta, previous_count, new_count):
+    merged = {k: v for k, v in previous.items() if k not in SNAPSHOT_STALE_FIELDS}
+    merged["genel_duygu"] = merge_sentiments([(previous_count, previous), (new_count, delta)])
+    for field in ("one_cikan_konular", "tartismali_noktalar", "oneriler"):
+        merged[field] = merge_lists_locally([(previous_count, previous), (new_count, delta)], field)
+    if delta.get("duygu_kaynagi"):
+        merged["duygu_kaynagi"] = delta["duygu_kaynagi"]
+    known_topics = {str(topic).strip().lower() for topic in previous.get("one_cikan_konular") or []}
+    new_topics = delta.get("yeni_konular") or [
+        topic for topic in delta.get("one_cikan_konular") or [] if str(topic).strip().lower() not in known_topics
+    ]
+    merged["analiz_edilen_yorum"] = previous_count + new_count
+    merged["degisiklik"] = {
+        "yeni_yorum": new_count,
+        "onceki_duygu": previous.get("genel_duygu"),
+        "yeni_yorum_duygu": delta.get("genel_duygu"),
+        "yeni_konular": new_topics,
+        "ozet": delta.get("degisim_ozeti") or delta.get("ozet") or ""
+    }
+    return merged
+
+# Son kayıttan sonra gelen yorumları en yeniden eskiye çek, sadece onları analiz edip kayda ekle.
+# Maliyet yeni yorum sayısıyla orantılıdır; ilk kayıtlı yoruma ulaşınca çekim durur.
+def refresh_incrementally(url, snapshot, source=None, progress=None):
+    previous = snapshot["analysis"]
+    previous_count = previous.get("analiz_edilen_yorum") or len(snapshot["comments"])
+    known_keys = {comment_key(comment) for comment in snapshot["comments"]}
+
+    def analyze_delta(video_title, new_comments):
+        delta = analyze_comments_with_gemini(video_title, new_comments, previous_analysis=previous)
+        if "error" in delta:
+            return delta
+        return merge_incremental_analysis(previous, delta, previous_count, len(new_comments))
+
+    result = fetch_comments_uncached(url, source, progress=progress, newest_first=True, known_keys=known_keys, analyze_fn=analyze_delta)
+    if "error" in result:
+        return result
+    new_comments = result["comments"]
+    logging.info(f"Incremental refresh found {len(new_comments)} new comments")
+    if new_comments:
+        analysis = result["analysis"]
+    else:
+        analysis = {k: v for k, v in previous.items() if k != "degisiklik"}
+        analysis["degisiklik"] = {"yeni_yorum": 0, "yeni_konular": [], "ozet": "Son kayıttan bu yana yeni yorum yok."}
+    return {
+        "comments": (new_comments + snapshot["comments"])[:SNAPSHOT_MAX_COMMENTS],
+        "analysis": analysis,
+        "video_title": result.get("video_title") or snapshot["video_title"],
+        "total_comments": result.get("total_comments") or snapshot["total_comments"],
+        "new_comments": len(new_comments)
+    }
+
+# Sonucu önbellekten getir, yoksa çek ve sakla
+# incremental=True ise video için son kayıt (süresi dolmuş olsa da) temel alınır ve sadece yeni yorumlar çekilir;
+# kayıt yoksa tam çekim yapılır
+def fetch_comments(url, source=None, force_refresh=False, progress=None, incremental=False):
+    video_id = extract_video_id(url)
+    if not video_id:
+        return {"error": "Geçersiz YouTube URL'si"}
+
+    with video_lock(video_id):
+        if incremental:
+            with span("cache_lookup"):
+                snapshot = result_store.get(video_id, include_expired=True)
+            if snapshot and snapshot["comments"] and snapshot["analysis"]:
+                result = refresh_incrementally(url, snapshot, source, progress=progress)
+                if is_successful_result(result):
+                    result_store.put(video_id, result)
+                return result
+            logging.info(f"No snapshot for {video_id}, running a full scrape")
+        elif not force_refresh:
+            with span("cache_lookup"):
+                cached = result_store.get(video_id)
+            CACHE_LOOKUPS.inc(result="hit" if cached else "miss")
+            if cached:
+                logging.info(f"Result cache hit for {video_id}")
+                cached["cached"] = True
+                return cached
+
+        result = fetch_comments_uncached(url, source, progress=progress)
+        if is_successful_result(result):
+            result_store.put(video_id, result)
+        return result
+
+# Takip sorusu ayarları
+QA_MAX_COMMENTS = int(os.environ.get("QA_MAX_COMMENTS", "40"))  # Bir soruda modele gönderilen en fazla yorum
+QA_CONTEXT_TOKEN_BUDGET = int(os.environ.get("QA_CONTEXT_TOKEN_BUDGET", "2000"))  # Soruya eklenen yorum satırlarının token sınırı
+QA_CONTEXT_CACHE_SIZE = int(os.environ.get("QA_CONTEXT_CACHE_SIZE", "32"))  # Bellekte tutulan video bağlamı sayısı
+QA_MAX_QUESTION_LENGTH = 500
+
+# Bir videonun soru bağlamı: analizdeki gibi tekrarları birleştirilmiş, formatlanmış yorum satırları ve arama dizini.
+# Kayıt başına bir kez kurulur; her soru sadece dizini sorgular.
+class QAContext:
+    def __init__(self, snapshot):
+        self.cached_at = snapshot["cached_at"]
+        self.video_title = snapshot["video_title"] or "YouTube Video"
+        self.analysis = snapshot["analysis"] or {}
+        self.total_comments = len(snapshot["comments"])
+        with span("prompt_build"):
+            self.comments, groups, _ = collapse_duplicate_comments(snapshot["comments"])
+            self.lines = format_comments(self.comments, [len(group) for group in groups])
+        with span("retrieval_index"):
+            self.index = CommentIndex([comment["textDisplay"] for comment in self.comments])
+        self.full_tokens = estimate_tokens("\n".join(self.lines))
+
+_qa_contexts = OrderedDict()
+_qa_contexts_lock = threading.Lock()
+
+# Videonun kayıtlı yorumlarından soru bağlamını getir; kayıt yenilendiyse bağlam yeniden kurulur. Kayıt yoksa None.
+def get_qa_context(video_id):
+    with span("cache_lookup"):
+        snapshot = result_store.get(video_id, include_expired=True)
+    if not snapshot or not snapshot["comments"]:
+        return None
+    with _qa_contexts_lock:
+        context = _qa_contexts.get(video_id)
+        if context and context.cached_at == snapshot["cached_at"]:
+            _qa_contexts.move_to_end(video_id)
+            return context
+    context = QAContext(snapshot)
+    with _qa_contexts_lock:
+        _qa_contexts[video_id] = context
+        _qa_contexts.move_to_end(video_id)
+        while len(_qa_contexts) > QA_CONTEXT_CACHE_SIZE:
+            _qa_contexts.popitem(last=False)
+    return context
+
+# Soruya en ilgili yorum satırları (bağlamdaki sıralarıyla); eşleşme yoksa (genel bir soru) ilk satırlar kullanılır
+def select_question_lines(context, question):
+    with span("retrieval"):
+        positions = [position for position, _ in context.index.search(question, QA_MAX_COMMENTS)]
+    if not positions:
+        positions = list(range(min(QA_MAX_COMMENTS, len(context.lines))))
+    selected = []
+    tokens = 0
+    for position in positions:
+        line_tokens = estimate_tokens(context.lines[position])
+        if selected and tokens + line_tokens > QA_CONTEXT_TOKEN_BUDGET:
+            break
+        selected.append(position)
+        tokens += line_tokens
+    return selected
+
+def build_question_prompt(context, question, lines):
+    summary = {field: context.analysis[field] for field in ("genel_duygu", "one_cikan_konular", "ozet") if context.analysis.get(field)}
+    comments_text = "\n".join(lines)
+    return f"""
+        "{context.video_title}" başlıklı YouTube videosunun {context.total_comments} yorumu daha önce analiz edildi. Analizin özeti:
+        {json.dumps(summary, ensure_ascii=False)}
+
+        Kullanıcının sorusu: "{question}"
+
+        Soruyla ilgili olarak seçilen {len(lines)} yorum:
+        {comments_text}
+
+        Soruyu sadece bu yorumlara ve analiz özetine dayanarak Türkçe yanıtla. Yorumlar soruyu yanıtlamaya yetmiyorsa bunu açıkça belirt.
+        Cevabı JSON formatında ver:
+        {{
+            "cevap": "Sorunun yanıtı",
+            "dayanak_yorumlar": ["Yanıtın dayandığı yorumlar, ör. Yorum 12", ...]
+        }}
+        """
+
+# Kayıtlı yorumlar hakkındaki bir takip sorusunu yanıtla. Yorumlar yeniden çekilmez ve tamamı gönderilmez:
+# soruyla ilgili satırlar seçilir, prompt'a sadece onlar girer. Video için kayıt yoksa None.
+def answer_question(video_id, question):
+    context = get_qa_context(video_id)
+    if context is None:
+        return None
+    positions = select_question_lines(context, question)
+    with span("prompt_build"):
+        prompt = build_question_prompt(context, question, [context.lines[position] for position in positions])
+    result = {
+        "video_id": video_id,
+        "video_title": context.video_title,
+        "question": question,
+        "sources": [dict(context.comments[position], yorum_no=position + 1) for position in positions],
+        "comments_used": len(positions),
+        "total_comments": context.total_comments,
+        "context_tokens": estimate_tokens("\n".join(context.lines[position] for position in positions)),
+        "prompt_tokens": estimate_tokens(prompt),
+        "full_context_tokens": context.full_tokens
+    }
+    try:
+        last_error = None
+        for model, model_name in model_registry.candidates():
+            try:
+                answer = generate_analysis(model, model_name, prompt, ANSWER_FIELDS)
+                if "error" in answer:
+                    raise Exception(answer["error"])
+                model_registry.mark_success(model_name)
+                result["answer"] = {field: answer.get(field) for field in ANSWER_FIELDS}
+                return result
+            except Exception as model_error:
+                logging.error(f"Question with model {model_name} failed: {str(model_error)}")
+                if not should_fail_over(model_error):
+                    raise
+                model_registry.mark_failure(model_name)
+                last_error = model_error
+        raise last_error
+    except Exception as api_error:
+        logging.error(f"Gemini API request error: {str(api_error)}")
+        result["error"] = f"Gemini API isteği hatası: {str(api_error)}"
+        return result
+
+# Arka plan iş ayarları
+JOB_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", str(CHROME_POOL_SIZE)))  # Aynı anda çalışan iş sayısı
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", "20"))  # Bekleyen + çalışan en fazla iş; aşılırsa 429 döner
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", "3600"))  # Biten işlerin saklanma süresi (sn)
+
+# İş durumunda kaydedilen aşamalar ("title", "comments" gibi veri olayları kaydedilmez)
+JOB_STAGES = ("queued", "navigating", "scrolling", "extracting", "analyzing", "batch")
+
+# Çekme ve analiz işlerini sınırlı bir iş havuzunda çalıştırıp durumlarını saklayan yönetici
+class JobManager:
+    def __init__(self, max_workers, max_pending, result_ttl):
+        self.max_pending = max(1, max_pending)
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._jobs = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    # Süresi dolan bitmiş işleri sil
+    def _expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    # İşi kuyruğa ekle; kuyruk doluysa None döndür
+    def submit(self, func, *args, **kwargs):
+        with self._lock:
+            self._expire()
+            if self._active >= self.max_pending:
+                return None
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "status": "queued",
+                "stage": "queued",
+                "progress": {},
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "finished_at": None
+            }
+            self._active += 1
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def _run(self, job_id, func, args, kwargs):
+        def progress(stage, **info):
+            if stage not in JOB_STAGES:
+                return
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job:
+                    job["stage"] = stage
+                    job["progress"].update(info)
+
+        self._update(job_id, status="running")
+        try:
+            result = func(*args, progress=progress, **kwargs)
+            self._update(job_id, status="done", stage="done", result=result, finished_at=time.time())
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, status="failed", stage="failed", error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return dict(job, progress=dict(job["progress"])) if job else None
+
+    def pending_count(self):
+        with self._lock:
+            return self._active
+
+job_manager = JobManager(JOB_MAX_WORKERS, JOB_MAX_PENDING, JOB_RESULT_TTL)
+
+# Toplu analiz ayarları
+BATCH_MAX_URLS = int(os.environ.get("BATCH_MAX_URLS", "50"))  # Tek istekte en fazla video
+BATCH_MAX_SCRAPERS = int(os.environ.get("BATCH_MAX_SCRAPERS", "4"))  # Aynı anda çekilen en fazla video
+
+# Birden çok videoyu sınırlı paralellikle çek ve analiz et; tek bir videonun hatası diğerlerini durdurmaz
+def analyze_video_batch(urls, source=None, force_refresh=False, parallelism=None, include_comments=False, progress=None, incremental=False):
+    started_at = time.time()
+
+    # Video kimliğine göre tekilleştir
+    videos = {}
+    invalid_urls = []
+    for url in urls:
+        video_id = extract_video_id(url or "")
+        if not video_id:
+            invalid_urls.append(url)
+        elif video_id not in videos:
+            videos[video_id] = url
+
+    def run(url):
+        try:
+            return fetch_comments(url, source, force_refresh=force_refresh, incremental=incremental)
+        except Exception as e:
+            logging.error(f"Batch item {url} failed: {str(e)}")
+            return {"error": str(e), "comments": []}
+
+    results = {}
+    if videos:
+        workers = min(max(1, parallelism or BATCH_MAX_SCRAPERS), BATCH_MAX_SCRAPERS, len(videos))
+        logging.info(f"Analyzing {len(videos)} videos with {workers} parallel scrapers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(run, url): video_id for video_id, url in videos.items()}
+            for completed, future in enumerate(as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                report_progress(progress, "batch", completed=completed, total=len(videos))
+
+    items = []
+    successful = []
+    for video_id, url in videos.items():
+        result = results[video_id]
+        item = {
+            "video_id": video_id,
+            "url": url,
+            "status": "ok" if is_successful_result(result) else "failed",
+            "video_title": result.get("video_title"),
+            "total_comments": result.get("total_comments"),
+            "comment_count": len(result.get("comments") or []),
+            "analysis": result.get("analysis"),
+            "cached": bool(result.get("cached"))
+        }
+        if "error" in result:
+            item["error"] = result["error"]
+        if include_comments:
+            item["comments"] = result.get("comments") or []
+        if item["status"] == "ok":
+            successful.append((item["comment_count"], result["analysis"]))
+        items.append(item)
+
+    summary = {
+        "requested": len(urls),
+        "unique_videos": len(videos),
+        "duplicates": len(urls) - len(invalid_urls) - len(videos),
+        "invalid_urls": invalid_urls,
+        "succeeded": len(successful),
+        "failed": len(videos) - len(successful),
+        "cached": sum(1 for item in items if item["cached"]),
+        "comments_analyzed": sum(weight for weight, _ in successful),
+        # Duygu dağılımı yorum sayısına göre ağırlıklandırılır
+        "genel_duygu": merge_sentiments(successful) if successful else None,
+        "one_cikan_konular": merge_lists_locally(successful, "one_cikan_konular"),
+        "elapsed_seconds": round(time.time() - started_at, 2)
+    }
+    return {"results": items, "summary": summary}
 
 # Statik dosyaları servis et (güvenli hale getirildi)
 @app.route('/')
@@ -775,10 +2688,241 @@ def get_comments():
     if not url:
         return jsonify({"error": "URL gerekli"}), 400
     
-    result = fetch_youtube_comments(url)
+    # İsteğe bağlı kaynak seçimi: "http" veya "selenium"
+    # force_refresh=true ise önbellek atlanır ve video yeniden çekilir
+    # incremental=true ise sadece son kayıttan sonra gelen yorumlar çekilip analize eklenir
+    # timings=true ise yanıta aşama bazlı süre dökümü eklenir
+    trace, token = start_trace()
+    try:
+        result = fetch_comments(url, data.get('source'), force_refresh=bool(data.get('force_refresh')), incremental=bool(data.get('incremental')))
+    finally:
+        current_trace.reset(token)
+    if data.get('timings') or request.args.get('timings') == '1':
+        result["timings"] = trace.breakdown()
     return jsonify(result)
 
+# Yorum çekme ve analiz işini arka planda başlat, iş kimliğini hemen döndür
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    data = request.get_json() or {}
+    url = data.get('url')
+    
+    if not url:
+        return jsonify({"error": "URL gerekli"}), 400
+    if not extract_video_id(url):
+        return jsonify({"error": "Geçersiz YouTube URL'si"}), 400
+    
+    job_id = job_manager.submit(fetch_comments, url, data.get('source'), force_refresh=bool(data.get('force_refresh')), incremental=bool(data.get('incremental')))
+    if job_id is None:
+        response = jsonify({"error": "Sunucu şu anda çok yoğun, lütfen biraz sonra tekrar deneyin"})
+        response.headers["Retry-After"] = "30"
+        return response, 429
+    
+    response = jsonify({"job_id": job_id, "status": "queued"})
+    response.headers["Location"] = f"/api/jobs/{job_id}"
+    return response, 202
+
+# İşin aşamasını, ilerlemesini ve (bittiyse) sonucunu getir
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"error": "İş bulunamadı veya süresi doldu"}), 404
+    return jsonify(job)
+
+# Birden çok videoyu toplu analiz et
+# "async": true ise iş arka plana alınır ve /api/jobs/<id> ile takip edilir
+@app.route('/api/batch', methods=['POST'])
+def batch_comments():
+    data = request.get_json() or {}
+    urls = data.get('urls')
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({"error": "URL listesi gerekli"}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({"error": f"Tek seferde en fazla {BATCH_MAX_URLS} video analiz edilebilir"}), 400
+    
+    try:
+        parallelism = int(data['parallelism']) if data.get('parallelism') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "parallelism bir sayı olmalı"}), 400
+    
+    options = {
+        "source": data.get('source'),
+        "force_refresh": bool(data.get('force_refresh')),
+        "parallelism": parallelism,
+        "include_comments": bool(data.get('include_comments')),
+        "incremental": bool(data.get('incremental'))
+    }
+    
+    if data.get('async'):
+        job_id = job_manager.submit(analyze_video_batch, urls, **options)
+        if job_id is None:
+            response = jsonify({"error": "Sunucu şu anda çok yoğun, lütfen biraz sonra tekrar deneyin"})
+            response.headers["Retry-After"] = "30"
+            return response, 429
+        response = jsonify({"job_id": job_id, "status": "queued"})
+        response.headers["Location"] = f"/api/jobs/{job_id}"
+        return response, 202
+    
+    return jsonify(analyze_video_batch(urls, **options))
+
+# Akış yanıtında yorumların gönderildiği parça büyüklüğü (önbellekten gelen sonuçlar için)
+STREAM_COMMENT_BATCH_SIZE = 50
+# İstemciye gönderilmeyi bekleyen en fazla olay; kuyruk dolunca veri olayları yer açılmasını bekler, aşama olayları atılır
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "64"))
+
+# Yorumları ve analizi hazır oldukça NDJSON olayları olarak akıt
+# Olaylar: stage, title, comments (yeni yorum parçası), reset (gönderilen yorumları sil),
+# section (model yanıtı sürerken kapanan bir analiz bölümü), result (analiz ve toplam sayı)
+@app.route('/api/comments/stream', methods=['POST'])
+def stream_comments():
+    data = request.get_json() or {}
+    url = data.get('url')
+    
+    if not url:
+        return jsonify({"error": "URL gerekli"}), 400
+    
+    source = data.get('source')
+    force_refresh = bool(data.get('force_refresh'))
+    incremental = bool(data.get('incremental'))
+    events = queue.Queue(maxsize=max(1, STREAM_QUEUE_SIZE))
+    closed = threading.Event()
+    done = object()
+    
+    # Veri olayları kuyrukta yer açılana kadar bekler (yavaş istemci çekimi yavaşlatır); istemci ayrıldıysa olay atılır
+    def send(event):
+        while not closed.is_set():
+            try:
+                events.put(event, timeout=1)
+                return
+            except queue.Full:
+                continue
+    
+    def progress(stage, **info):
+        if stage == "comments":
+            send({"type": "comments", "comments": info["comments"]})
+        elif stage == "title":
+            send({"type": "title", "video_title": info["video_title"]})
+        elif stage == "section":
+            send({"type": "section", "field": info["field"], "value": info["value"]})
+        else:
+            # Aşama olayları sadece bilgi amaçlıdır; kuyruk doluysa atılır, sonraki aşama olayı güncel durumu taşır
+            try:
+                events.put_nowait(dict(info, type="stage", stage=stage))
+            except queue.Full:
+                pass
+    
+    def worker():
+        try:
+            send({"type": "final", "result": fetch_comments(url, source, force_refresh=force_refresh, progress=progress, incremental=incremental)})
+        except Exception as e:
+            logging.error(f"Streaming fetch failed: {str(e)}")
+            send({"type": "final", "result": {"error": str(e), "comments": []}})
+        finally:
+            send(done)
+    
+    def generate():
+        try:
+            yield from stream_events()
+        finally:
+            # İstemci bağlantıyı kapattıysa çekim beklemeden sürer, kalan olaylar atılır
+            closed.set()
+    
+    def stream_events():
+        streamed = 0
+        while True:
+            event = events.get()
+            if event is done:
+                break
+            if event["type"] == "comments":
+                streamed += len(event["comments"])
+            elif event["type"] == "final":
+                result = event["result"]
+                comments = result.get("comments") or []
+                # Önbellekten gelen veya yedek kaynağa düşen sonuçlarda gönderilenler sonuçla uyuşmayabilir;
+                # yanıtlar da yorumlar gönderildikten sonra eklendiği için bu durumda liste yeniden gönderilir
+                if streamed != len(comments) or any(comment.get("replies") for comment in comments):
+                    if streamed:
+                        yield json.dumps({"type": "reset"}, ensure_ascii=False) + "\n"
+                    if result.get("video_title"):
+                        yield json.dumps({"type": "title", "video_title": result["video_title"]}, ensure_ascii=False) + "\n"
+                    for i in range(0, len(comments), STREAM_COMMENT_BATCH_SIZE):
+                        yield json.dumps({"type": "comments", "comments": comments[i:i + STREAM_COMMENT_BATCH_SIZE]}, ensure_ascii=False) + "\n"
+                # Yorumlar zaten gönderildi, son olayda tekrar gönderilmez
+                event = dict((k, v) for k, v in result.items() if k != "comments")
+                event["type"] = "result"
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    
+    threading.Thread(target=worker, daemon=True).start()
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"})
+
+# Daha önce analiz edilmiş bir videonun yorumları hakkında takip sorusu
+@app.route('/api/videos/<video_id>/ask', methods=['POST'])
+def ask_about_video(video_id):
+    data = request.get_json() or {}
+    question = (data.get('question') or "").strip()
+    
+    if not question:
+        return jsonify({"error": "Soru gerekli"}), 400
+    if len(question) > QA_MAX_QUESTION_LENGTH:
+        return jsonify({"error": f"Soru en fazla {QA_MAX_QUESTION_LENGTH} karakter olabilir"}), 400
+    
+    # timings=true ise yanıta aşama bazlı süre dökümü eklenir
+    trace, token = start_trace()
+    try:
+        result = answer_question(video_id, question)
+    finally:
+        current_trace.reset(token)
+    if result is None:
+        return jsonify({"error": "Bu video için kayıtlı yorum yok, önce videoyu analiz edin"}), 404
+    if data.get('timings') or request.args.get('timings') == '1':
+        result["timings"] = trace.breakdown()
+    return jsonify(result)
+
+# Model kaydını elle yenile (ör. yeni bir model yayınlandığında)
+@app.route('/api/models/refresh', methods=['POST'])
+def refresh_models():
+    try:
+        model_name = model_registry.refresh()
+        return jsonify({"model": model_name})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Gemini çağrı katmanının sayaçları (başarı, tekrar deneme, hız sınırı, devre kesici durumu)
+@app.route('/api/models/stats', methods=['GET'])
+def model_stats():
+    return jsonify(gemini_client.stats())
+
+# İstek sayısı ve süresi metrikleri
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = getattr(g, "request_started", None)
+    if started is not None and request.url_rule is not None:
+        endpoint = request.url_rule.rule
+        REQUESTS_TOTAL.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+    return response
+
+# Prometheus metrikleri: aşama süreleri, istekler, prompt boyutu, önbellek ve Gemini sayaçları
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    gemini_stats = gemini_client.stats()
+    for outcome, value in gemini_stats.items():
+        if outcome != "circuit_state":
+            GEMINI_CALLS.set_total(value, outcome=outcome)
+    GEMINI_CIRCUIT_OPEN.set(0 if gemini_stats["circuit_state"] == "closed" else 1)
+    JOBS_PENDING.set(job_manager.pending_count())
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
+    # Selenium birincil kaynaksa tarayıcı havuzunu arka planda ısıt
+    if COMMENT_SOURCE == "selenium":
+        threading.Thread(target=driver_pool.warm_up, daemon=True).start()
     # Üretim ortamında debug=False olmalı!
     # Geliştirme için True bırakılabilir, ancak canlıya alırken mutlaka False yapın.
     app.run(host='0.0.0.0', port=5000, debug=False) # DEBUG MODU KAPATILDI (Üretim için) 
\ No newline at end of file
@@ -0,0 +1,11 @@
+# Testler ağ, tarayıcı ve Gemini olmadan çalışır: kayıtlı/sentetik sayfalar ve sahte modeller kullanılır.
+# server modülü içe aktarılmadan önce sonuç önbelleği geçici bir dosyaya yönlendirilir.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+os.environ.setdefault("RESULT_CACHE_PATH", os.path.join(tempfile.mkdtemp(prefix="yorum-test-"), "results.sqlite3"))
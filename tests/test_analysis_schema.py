@@ -0,0 +1,195 @@
+# Analiz yanıtının onarımı ve doğrulanması; şemalı çıktı reddedildiğinde şemasız tekrar
+import json
+
+import pytest
+
+import server
+from analysis_schema import (QUALITATIVE_FIELDS, analysis_fields, normalize_sentiment, parse_json_object,
+                             response_schema, validate_analysis)
+from fake_genai import FakeGenerativeModel, stub_analysis
+from gemini_client import GeminiCallError, GeminiClient
+
+
+def test_parse_complete_object_with_surrounding_text():
+    assert parse_json_object('İşte analiz:\n```json\n{"ozet": "iyi"}\n```') == {"ozet": "iyi"}
+
+
+def test_parse_trailing_commas():
+    assert parse_json_object('{"one_cikan_konular": ["ses", "kurgu",], "ozet": "iyi",}') == {
+        "one_cikan_konular": ["ses", "kurgu"], "ozet": "iyi"
+    }
+
+
+def test_parse_truncated_object_keeps_completed_values():
+    text = '{"genel_duygu": {"pozitif": 60, "negatif": 30, "notr": 10}, "one_cikan_konular": ["ses", "kur'
+    assert parse_json_object(text) == {
+        "genel_duygu": {"pozitif": 60, "negatif": 30, "notr": 10},
+        "one_cikan_konular": ["ses"]
+    }
+
+
+def test_parse_truncated_after_number():
+    assert parse_json_object('{"a": 1, "b": 2') == {"a": 1}
+    assert parse_json_object('{"a": 1, "b": 2,') == {"a": 1, "b": 2}
+
+
+def test_parse_without_object():
+    assert parse_json_object("Üzgünüm, bu isteği yanıtlayamam.") is None
+    assert parse_json_object("") is None
+
+
+@pytest.mark.parametrize("values, expected", [
+    ({"pozitif": "60%", "negatif": "30%", "notr": "10%"}, {"pozitif": 60, "negatif": 30, "notr": 10}),
+    ({"pozitif": 1, "negatif": 1, "notr": 1}, {"pozitif": 34, "negatif": 33, "notr": 33}),
+    ({"pozitif": 0.5, "negatif": 0.25, "notr": 0.25}, {"pozitif": 50, "negatif": 25, "notr": 25}),
+    ({"pozitif": "0%", "negatif": "0", "notr": None}, None),
+])
+def test_normalize_sentiment(values, expected):
+    assert normalize_sentiment(values) == expected
+
+
+def test_validate_analysis_normalizes_fields():
+    data = {
+        "genel_duygu": {"positive": 50, "negatif": 30, "nötr": 20},
+        "genel_izlenim": ["Olumlu", "yorumlar"],
+        "one_cikan_konular": "ses kalitesi; kurgu",
+        "tartismali_noktalar": [],
+        "oneriler": ["Daha kısa videolar"],
+        "ozet": "  Kısa özet  ",
+    }
+    analysis, missing = validate_analysis(data, analysis_fields())
+    assert missing == []
+    assert analysis["genel_duygu"] == {"pozitif": "50%", "negatif": "30%", "notr": "20%"}
+    assert analysis["genel_izlenim"] == "Olumlu yorumlar"
+    assert analysis["one_cikan_konular"] == ["ses kalitesi", "kurgu"]
+    assert analysis["ozet"] == "Kısa özet"
+
+
+def test_validate_analysis_reports_missing_and_partial_sentiment():
+    analysis, missing = validate_analysis({"genel_duygu": {"pozitif": 80, "negatif": 20}, "ozet": ""}, ("genel_duygu", "ozet", "oneriler"))
+    assert missing == ["genel_duygu", "ozet", "oneriler"]
+    assert "genel_duygu" not in analysis and "ozet" not in analysis
+
+
+def test_response_schema_requires_every_field():
+    schema = response_schema(QUALITATIVE_FIELDS)
+    assert schema["required"] == list(QUALITATIVE_FIELDS)
+    assert schema["properties"]["one_cikan_konular"]["type"] == "array"
+
+
+def test_parse_analysis_response_without_fields_is_an_error():
+    analysis, missing = server.parse_analysis_response('{"baska": 1}', ("ozet",))
+    assert "error" in analysis and missing == ["ozet"]
+
+
+
+def test_prompt_asks_for_integer_percentages_with_structured_output():
+    structured = server.build_analysis_prompt("Video", 1, ["Yorum 1: güzel"], structured=True)
+    assert '"pozitif": 60' in structured and "%" not in structured.split("Yorumlar:")[1]
+    plain = server.build_analysis_prompt("Video", 1, ["Yorum 1: güzel"], structured=False)
+    assert '"pozitif": "60%"' in plain
+
+class SchemaRejectingModel(FakeGenerativeModel):
+    def __init__(self, error, **kwargs):
+        super().__init__(**kwargs)
+        self.error = error
+        self.configs = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.configs.append(kwargs.get("generation_config"))
+        if "response_schema" in kwargs.get("generation_config", {}):
+            with self.lock:
+                self.calls += 1
+            raise self.error
+        return super().generate_content(prompt, stream=stream, **kwargs)
+
+
+class InvalidArgument(Exception):
+    code = 400
+
+
+class PermissionDenied(Exception):
+    code = 403
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "gemini_client", GeminiClient(requests_per_minute=0, tokens_per_minute=0, sleep=lambda seconds: None))
+    monkeypatch.setattr(server, "_unstructured_models", set())
+    monkeypatch.setattr(server, "STRUCTURED_OUTPUT", True)
+
+
+def test_schema_rejection_retries_without_schema(client):
+    model = SchemaRejectingModel(InvalidArgument("* GenerateContentRequest.generation_config.response_schema: not supported"),
+                                 text='{"ozet": "iyi"}', model_name="old-model")
+    assert server.request_analysis(model, "old-model", "prompt", ("ozet",)) == '{"ozet": "iyi"}'
+    assert model.calls == 2
+    assert server._unstructured_models == {"old-model"}
+    # Sonraki çağrılarda şema gönderilmez
+    server.request_analysis(model, "old-model", "prompt", ("ozet",))
+    assert "response_schema" not in model.configs[-1]
+
+
+def test_unrelated_fatal_error_is_not_a_schema_rejection(client):
+    model = SchemaRejectingModel(PermissionDenied("API key not valid"), text='{"ozet": "iyi"}', model_name="m")
+    with pytest.raises(GeminiCallError):
+        server.request_analysis(model, "m", "prompt", ("ozet",))
+    assert model.calls == 1
+    assert server._unstructured_models == set()
+
+
+def test_missing_fields_are_completed_with_a_short_prompt(client):
+    full = {"genel_izlenim": "Olumlu", "one_cikan_konular": ["ses"], "tartismali_noktalar": ["süre"],
+            "oneriler": ["kısalt"], "ozet": "Özet"}
+    truncated = json.dumps(full, ensure_ascii=False)[:90]
+
+    def respond(prompt):
+        if "yarım kaldı" in prompt:
+            return json.dumps({"oneriler": ["kısalt"], "ozet": "Özet"}, ensure_ascii=False)
+        return truncated
+
+    model = FakeGenerativeModel(text=respond)
+    analysis = server.generate_analysis(model, "fake-model", "prompt", QUALITATIVE_FIELDS)
+    assert model.calls == 2
+    assert analysis == full
+
+
+class NotFound(Exception):
+    code = 404
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(server, "gemini_client", GeminiClient(requests_per_minute=0, tokens_per_minute=0, max_retries=0))
+    registry = server.GeminiModelRegistry(3600, [])
+    monkeypatch.setattr(server, "model_registry", registry)
+    return registry
+
+
+def use_models(monkeypatch, registry, *models):
+    monkeypatch.setattr(registry, "candidates", lambda: [(model, model.model_name) for model in models])
+
+
+def test_model_specific_error_fails_over_to_next_model(monkeypatch, registry):
+    missing = FakeGenerativeModel(failures=[NotFound("models/old is not found")], model_name="old")
+    working = FakeGenerativeModel(text=stub_analysis, model_name="new")
+    use_models(monkeypatch, registry, missing, working)
+    analysis = server.PipelinedAnalysis("Video")._analyze("Yorum 1: güzel video")
+    assert "error" not in analysis
+    assert missing.calls == 1 and working.calls == 1
+    assert registry._preferred_name == "new"
+
+
+def test_rate_limit_is_not_treated_as_a_model_failure(monkeypatch, registry):
+    limited = FakeGenerativeModel(failures=[ResourceExhausted("quota exceeded")], model_name="primary")
+    other = FakeGenerativeModel(text=stub_analysis, model_name="other")
+    use_models(monkeypatch, registry, limited, other)
+    registry.mark_success("primary")
+    with pytest.raises(GeminiCallError):
+        server.PipelinedAnalysis("Video")._analyze("Yorum 1: güzel video")
+    assert other.calls == 0
+    assert registry._preferred_name == "primary"
@@ -0,0 +1,86 @@
+# Çok sayıda yorumun token bütçesine göre parçalanması, parça sonuçlarının ağırlıklı birleştirilmesi
+# ve parçalı (map-reduce) analizin sahte modelle uçtan uca çalışması
+import json
+
+import pytest
+
+import server
+from fake_genai import FakeGenerativeModel
+from gemini_client import GeminiClient
+
+
+def make_comments(count):
+    return [{"textDisplay": f"Videonun {i}. bölümündeki anlatım farklı bir konuya değiniyor {i * 7919}",
+             "authorDisplayName": f"kullanici{i}", "likeCount": str(i % 5), "publishedAt": "1 gün önce"}
+            for i in range(count)]
+
+
+def test_split_into_batches_respects_token_budget():
+    lines = [f"Yorum {i}: " + "kelime " * 20 for i in range(30)]
+    budget = 120
+    batches = server.split_into_batches(lines, budget)
+    assert len(batches) > 1
+    assert [line for batch in batches for line in batch] == lines
+    for batch in batches:
+        assert sum(server.estimate_tokens(line) for line in batch) <= budget
+
+
+def test_split_into_batches_keeps_oversized_line_alone():
+    lines = ["kısa", "x" * 2000, "kısa"]
+    assert server.split_into_batches(lines, 50) == [["kısa"], ["x" * 2000], ["kısa"]]
+
+
+def test_merge_sentiments_weights_by_batch_size():
+    partials = [
+        (9, {"genel_duygu": {"pozitif": "100%", "negatif": "0%", "notr": "0%"}}),
+        (1, {"genel_duygu": {"pozitif": "0%", "negatif": "100%", "notr": "0%"}}),
+        (5, {"ozet": "duygu dağılımı olmayan parça sayılmaz"}),
+    ]
+    assert server.merge_sentiments(partials) == {"pozitif": "90%", "negatif": "10%", "notr": "0%"}
+
+
+def test_merge_sentiments_without_any_distribution():
+    assert server.merge_sentiments([(3, {})]) == {"pozitif": "0%", "negatif": "0%", "notr": "100%"}
+
+
+@pytest.fixture
+def batched(monkeypatch):
+    monkeypatch.setattr(server, "gemini_client", GeminiClient(requests_per_minute=0, tokens_per_minute=0, max_retries=0))
+    monkeypatch.setattr(server, "ANALYSIS_BATCH_TOKEN_BUDGET", 400)
+    monkeypatch.setattr(server, "ANALYSIS_MAX_PROMPT_TOKENS", 0)
+    monkeypatch.setattr(server, "SENTIMENT_MODE", "llm")
+
+
+def test_chunked_analysis_maps_and_reduces(batched):
+    def respond(prompt):
+        if "Parça analizleri:" in prompt:
+            return json.dumps({"genel_izlenim": "Birleşik izlenim", "one_cikan_konular": ["anlatım"],
+                               "tartismali_noktalar": [], "oneriler": ["devam"], "ozet": "Birleşik özet"}, ensure_ascii=False)
+        return json.dumps({"genel_duygu": {"pozitif": 70, "negatif": 20, "notr": 10}, "genel_izlenim": "Parça",
+                           "one_cikan_konular": ["konu"], "tartismali_noktalar": [], "oneriler": [], "ozet": "Parça özeti"},
+                          ensure_ascii=False)
+
+    comments = make_comments(60)
+    model = FakeGenerativeModel(text=respond)
+    analysis = server.analyze_comments_with_gemini("Video", comments, chunked=True, model=model)
+
+    batches = server.split_into_batches(server.format_comments(comments), 400)
+    assert len(batches) > 1
+    assert model.calls == len(batches) + 1
+    assert "error" not in analysis
+    assert analysis["genel_duygu"] == {"pozitif": "70%", "negatif": "20%", "notr": "10%"}
+    assert analysis["one_cikan_konular"] == ["anlatım"]
+    assert analysis["ozet"] == "Birleşik özet"
+
+
+def test_chunked_analysis_falls_back_to_local_merge_when_reduce_fails(batched):
+    def respond(prompt):
+        if "Parça analizleri:" in prompt:
+            return "birleştirilemedi"
+        return json.dumps({"genel_duygu": {"pozitif": 50, "negatif": 50, "notr": 0}, "genel_izlenim": "Parça",
+                           "one_cikan_konular": ["ortak konu"], "tartismali_noktalar": [], "oneriler": [],
+                           "ozet": "Parça özeti"}, ensure_ascii=False)
+
+    analysis = server.analyze_comments_with_gemini("Video", make_comments(60), chunked=True, model=FakeGenerativeModel(text=respond))
+    assert analysis["genel_duygu"] == {"pozitif": "50%", "negatif": "50%", "notr": "0%"}
+    assert analysis["one_cikan_konular"] == ["ortak konu"]
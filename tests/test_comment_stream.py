@@ -0,0 +1,63 @@
+# /api/comments/stream: NDJSON olayları, sınırlı kuyrukta geri basınç ve istemci ayrıldığında çekimin takılmaması
+import json
+import threading
+
+import pytest
+
+import server
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+class FakeFetch:
+    def __init__(self, batches):
+        self.batches = batches
+        self.finished = threading.Event()
+
+    def __call__(self, url, source=None, force_refresh=False, progress=None, incremental=False):
+        comments = []
+        try:
+            progress("navigating")
+            progress("title", video_title="Video")
+            for index in range(self.batches):
+                batch = [{"textDisplay": f"yorum {index}"}]
+                comments.extend(batch)
+                progress("scrolling", loaded=len(comments))
+                progress("comments", comments=batch)
+            progress("section", field="ozet", value="iyi")
+            return {"video_title": "Video", "comments": comments, "analysis": {"ozet": "iyi"}}
+        finally:
+            self.finished.set()
+
+
+@pytest.fixture
+def stream(monkeypatch):
+    monkeypatch.setattr(server, "STREAM_QUEUE_SIZE", 2)
+    return server.app.test_client()
+
+
+def read_events(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_stream_delivers_every_data_event_through_a_small_queue(monkeypatch, stream):
+    fetch = FakeFetch(batches=50)
+    monkeypatch.setattr(server, "fetch_comments", fetch)
+    events = read_events(stream.post("/api/comments/stream", json={"url": URL}))
+
+    comments = [comment for event in events if event["type"] == "comments" for comment in event["comments"]]
+    assert comments == [{"textDisplay": f"yorum {index}"} for index in range(50)]
+    assert events[-1]["type"] == "result"
+    assert events[-1]["analysis"] == {"ozet": "iyi"}
+    assert "comments" not in events[-1]
+    assert {"type": "section", "field": "ozet", "value": "iyi"} in events
+    assert [event["type"] for event in events].count("title") == 1
+
+
+def test_client_disconnect_does_not_block_the_fetch(monkeypatch, stream):
+    fetch = FakeFetch(batches=200)
+    monkeypatch.setattr(server, "fetch_comments", fetch)
+    response = stream.post("/api/comments/stream", json={"url": URL}, buffered=False)
+    next(iter(response.response))
+    response.close()
+    assert fetch.finished.wait(5)
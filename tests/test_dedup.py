@@ -0,0 +1,44 @@
+# Birebir ve neredeyse aynı yorumların gruplanması ve prompt'taki "[N benzer yorum]" eki
+import server
+from dedup import group_near_duplicates, normalize_text
+
+
+def comment(text, author="kullanici"):
+    return {"textDisplay": text, "authorDisplayName": author}
+
+
+def test_normalize_text():
+    assert normalize_text("Çoooook GÜZEL!! https://youtu.be/x @kanal") == "çook güzel"
+    assert normalize_text("🔥🔥 🔥") == "🔥"
+
+
+def test_group_near_duplicates():
+    texts = [
+        "Harika bir video olmuş, emeğinize sağlık",
+        "Bu konuda hiç katılmıyorum, veriler yanlış yorumlanmış",
+        "HARİKA bir video olmuşşşş, emeğinize sağlık!!!",
+        "Harika bir video olmuş, emeğinize sağlık 👍",
+        "Müzik seçimi çok iyiydi",
+    ]
+    assert group_near_duplicates(texts) == [[0, 2, 3], [1], [4]]
+
+
+def test_collapse_duplicate_comments_marks_counts(monkeypatch):
+    monkeypatch.setattr(server, "DEDUP_ENABLED", True)
+    comments = [comment("Ilk!"), comment("Ses biraz düşük"), comment("ilk"), comment("İLK!!!")]
+    representatives, groups, stats = server.collapse_duplicate_comments(comments)
+    assert representatives == [comments[0], comments[1]]
+    assert groups == [[0, 2, 3], [1]]
+    assert stats["orijinal_yorum"] == 4 and stats["benzersiz_yorum"] == 2
+
+    lines = server.format_comments(representatives, [len(group) for group in groups])
+    assert lines[0].endswith(" " + server.DUPLICATE_MARKER.format(n=3))
+    assert server.represented_comment_count(lines) == 4
+    assert server.DUPLICATE_MARKER.format(n="N") in server.build_analysis_prompt("Video", 4, lines)
+    assert server.DUPLICATE_MARKER.format(n="N") not in server.build_analysis_prompt("Video", 1, lines[1:])
+
+
+def test_collapse_is_skipped_when_disabled(monkeypatch):
+    monkeypatch.setattr(server, "DEDUP_ENABLED", False)
+    comments = [comment("aynı"), comment("aynı")]
+    assert server.collapse_duplicate_comments(comments) == (comments, [[0], [1]], None)
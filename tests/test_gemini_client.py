@@ -0,0 +1,149 @@
+# Gemini çağrı katmanı: hata sınıflandırma, tekrar deneme ve devre kesici (sahte model ve sahte saatle)
+import pytest
+
+from fake_genai import FakeGenerativeModel
+from gemini_client import (ERROR_BLOCKED, ERROR_FATAL, ERROR_RATE_LIMIT, ERROR_TRANSIENT, CircuitBreaker,
+                           CircuitOpenError, GeminiCallError, GeminiClient, classify_error)
+
+
+class ServiceUnavailable(Exception):
+    code = 503
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class PermissionDenied(Exception):
+    code = 403
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(clock, **kwargs):
+    options = dict(requests_per_minute=0, tokens_per_minute=0, max_retries=0, failure_threshold=3, reset_timeout=30.0)
+    options.update(kwargs)
+    return GeminiClient(clock=clock, sleep=lambda seconds: None, **options)
+
+
+class BlockedResponse:
+    @property
+    def text(self):
+        raise ValueError("The `response.text` quick accessor only works when the response contains a valid `Part`")
+
+
+class BlockedModel:
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return BlockedResponse()
+
+
+@pytest.mark.parametrize("error, kind", [
+    (ServiceUnavailable("503"), ERROR_TRANSIENT),
+    (TimeoutError("timed out"), ERROR_TRANSIENT),
+    (ResourceExhausted("429"), ERROR_RATE_LIMIT),
+    (Exception("Quota exceeded for requests"), ERROR_RATE_LIMIT),
+    (PermissionDenied("API key not valid"), ERROR_FATAL),
+    (TypeError("unexpected keyword argument"), ERROR_FATAL),
+    (ValueError("Unknown field for Schema: bogus"), ERROR_FATAL),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_transient_error_is_retried():
+    client = make_client(FakeClock(), max_retries=2)
+    model = FakeGenerativeModel(text="ok", failures=[ServiceUnavailable("503"), ServiceUnavailable("503")])
+    assert client.generate(model, "prompt") == "ok"
+    assert model.calls == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_unrecognised_error_is_not_retried_and_keeps_circuit_closed():
+    client = make_client(FakeClock(), max_retries=4, failure_threshold=1)
+    model = FakeGenerativeModel(text="ok", failures=[TypeError("bad argument")])
+    with pytest.raises(GeminiCallError) as raised:
+        client.generate(model, "prompt")
+    assert raised.value.kind == ERROR_FATAL
+    assert model.calls == 1
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_blocked_response_text_is_classified_as_blocked():
+    client = make_client(FakeClock(), failure_threshold=1)
+    with pytest.raises(GeminiCallError) as raised:
+        client.generate(BlockedModel(), "prompt")
+    assert raised.value.kind == ERROR_BLOCKED
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_opens_after_consecutive_failures():
+    client = make_client(FakeClock())
+    model = FakeGenerativeModel(text="ok", failures=[ServiceUnavailable("503")] * 3)
+    for _ in range(3):
+        with pytest.raises(GeminiCallError):
+            client.generate(model, "prompt")
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        client.generate(model, "prompt")
+    assert model.calls == 3
+    assert client.stats()["circuit_open"] == 1
+
+
+def test_half_open_probe_success_closes_circuit():
+    clock = FakeClock()
+    client = make_client(clock)
+    model = FakeGenerativeModel(text="ok", failures=[ServiceUnavailable("503")] * 3)
+    for _ in range(3):
+        with pytest.raises(GeminiCallError):
+            client.generate(model, "prompt")
+
+    clock.now += 30.0
+    assert client.generate(model, "prompt") == "ok"
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert client.generate(model, "prompt") == "ok"
+
+
+def test_half_open_probe_failure_reopens_circuit():
+    clock = FakeClock()
+    client = make_client(clock)
+    model = FakeGenerativeModel(text="ok", failures=[ServiceUnavailable("503")] * 4)
+    for _ in range(3):
+        with pytest.raises(GeminiCallError):
+            client.generate(model, "prompt")
+
+    clock.now += 30.0
+    with pytest.raises(GeminiCallError):
+        client.generate(model, "prompt")
+    assert client.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        client.generate(model, "prompt")
+    assert model.calls == 4
+
+
+def test_half_open_allows_a_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0, clock=clock)
+    breaker.record_failure()
+    assert breaker.check() == pytest.approx(10.0)
+
+    clock.now += 10.0
+    assert breaker.check() is None
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.check() is not None  # Deneme sürerken ikinci çağrı reddedilir
+    breaker.release_probe()
+    assert breaker.check() is None
+
+
+def test_stream_delivers_chunks_in_order():
+    client = make_client(FakeClock())
+    model = FakeGenerativeModel(text='{"ozet": "kısa bir özet"}', chunk_size=5)
+    chunks = []
+    assert client.generate(model, "prompt", on_chunk=chunks.append) == '{"ozet": "kısa bir özet"}'
+    assert len(chunks) > 1 and "".join(chunks) == '{"ozet": "kısa bir özet"}'
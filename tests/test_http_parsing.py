@@ -0,0 +1,93 @@
+# İzleme sayfası ve yorum devam yanıtlarının ayrıştırılması (sentetik fixture'larla)
+import json
+import os
+
+import pytest
+
+import server
+from fixtures import COMMENTS_PER_PAGE, synthesize
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory):
+    out_dir = str(tmp_path_factory.mktemp("synthetic"))
+    synthesize(out_dir, 50)
+    with open(os.path.join(out_dir, "watch.html"), encoding="utf-8") as f:
+        watch_html = f.read()
+    with open(os.path.join(out_dir, "continuations.json"), encoding="utf-8") as f:
+        continuations = json.load(f)
+    return watch_html, continuations
+
+
+def test_parse_watch_page(synthetic):
+    watch_html, _ = synthetic
+    page = server.parse_watch_page(watch_html)
+    assert page["video_title"] == "Benchmark Videosu: Yapay Zeka ile Yorum Analizi"
+    assert page["api_key"] == "benchmark-key"
+    assert page["context"]["client"]["clientVersion"] == "2.20240101.00.00"
+    assert page["continuation"] == "page-0"
+    assert page["comments_disabled"] is False
+
+
+def test_parse_watch_page_without_initial_data():
+    with pytest.raises(Exception):
+        server.parse_watch_page("<html><body>ytInitialData yok</body></html>")
+
+
+def test_parse_watch_page_comments_disabled():
+    initial_data = {"contents": [
+        {"videoPrimaryInfoRenderer": {"title": {"simpleText": "Yorumları kapalı video"}}},
+        {"itemSectionRenderer": {"sectionIdentifier": "comment-item-section",
+                                 "contents": [{"messageRenderer": {"text": {"runs": [{"text": "Yorumlar kapalı."}]}}}]}},
+    ]}
+    page = server.parse_watch_page(f"<script>var ytInitialData = {json.dumps(initial_data)};</script>")
+    assert page["video_title"] == "Yorumları kapalı video"
+    assert page["continuation"] is None
+    assert page["comments_disabled"] is True
+
+
+def test_parse_renderer_page(synthetic):
+    _, continuations = synthetic
+    comments, next_token, total = server.parse_comment_continuation(continuations["page-0"])
+    assert len(comments) == COMMENTS_PER_PAGE
+    assert next_token == "page-1"
+    assert total == 300  # "300 yorum" başlığı
+    first = comments[0]
+    assert first["commentId"] == "c0"
+    assert first["authorDisplayName"].startswith("@")
+    assert first["authorProfileImageUrl"].startswith("https://yt3.ggpht.com/")
+    assert first["textDisplay"] and first["publishedAt"] and first["likeCount"]
+
+
+def test_parse_entity_page(synthetic):
+    _, continuations = synthetic
+    comments, next_token, total = server.parse_comment_continuation(continuations["page-1"])
+    assert [c["commentId"] for c in comments] == [f"c{i}" for i in range(20, 40)]
+    assert next_token == "page-2"
+    assert total is None
+    assert all(c["textDisplay"] and c["authorDisplayName"] for c in comments)
+
+
+def test_continuation_chain_yields_every_comment(synthetic):
+    watch_html, continuations = synthetic
+    token = server.parse_watch_page(watch_html)["continuation"]
+    comments = []
+    while token:
+        batch, token, _ = server.parse_comment_continuation(continuations[token])
+        comments.extend(batch)
+    assert [c["commentId"] for c in comments] == [f"c{i}" for i in range(50)]
+
+
+def test_entity_thread_without_mutation_is_skipped(synthetic):
+    _, continuations = synthetic
+    payload = json.loads(json.dumps(continuations["page-1"]))
+    payload["frameworkUpdates"]["entityBatchUpdate"]["mutations"].pop(0)
+    comments, _, _ = server.parse_comment_continuation(payload)
+    assert len(comments) == COMMENTS_PER_PAGE - 1
+    assert comments[0]["commentId"] == "c21"
+
+
+def test_find_newest_sort_token(synthetic):
+    _, continuations = synthetic
+    assert server.find_newest_sort_token(continuations["page-0"]) == "page-0"
+    assert server.find_newest_sort_token(continuations["page-1"]) is None
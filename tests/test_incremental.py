@@ -0,0 +1,84 @@
+# Artımlı yenileme uçtan uca: yerel fixture sunucusundan tam çekim, ardından sadece yeni yorumların çekilip
+# önceki analizle birleştirilmesi (sahte Gemini ile)
+import copy
+
+import pytest
+
+import fake_genai
+import server
+from fixtures import DEFAULT_FIXTURE_DIR, Fixture, FixtureServer
+from gemini_client import GeminiClient
+
+URL = "https://www.youtube.com/watch?v=benchmark00"
+
+
+@pytest.fixture
+def youtube(monkeypatch, tmp_path):
+    fixture = Fixture(DEFAULT_FIXTURE_DIR)
+    fixture_server = FixtureServer(fixture).start()
+    stub = fake_genai.StubGenai()
+    monkeypatch.setattr(server, "YOUTUBE_BASE_URL", fixture_server.base_url)
+    monkeypatch.setattr(server, "COMMENT_SOURCE", "http")
+    monkeypatch.setattr(server, "genai", stub)
+    monkeypatch.setattr(server, "model_registry", server.GeminiModelRegistry(3600, server.FALLBACK_MODELS))
+    monkeypatch.setattr(server, "gemini_client", GeminiClient(requests_per_minute=0, tokens_per_minute=0))
+    monkeypatch.setattr(server, "result_store", server.ResultStore(str(tmp_path / "results.sqlite3"), 3600, 10))
+    yield fixture, stub
+    fixture_server.stop()
+
+
+# İlk yorum sayfasının başına (en yeni yorumlar olarak) count yeni yorum ekle
+def add_new_comments(fixture, count):
+    page = fixture.continuations["page-0"]
+    items = page["onResponseReceivedEndpoints"][0]["reloadContinuationItemsCommand"]["continuationItems"]
+    new_items = []
+    for i in range(count):
+        thread = copy.deepcopy(items[1])
+        renderer = thread["commentThreadRenderer"]["comment"]["commentRenderer"]
+        renderer["commentId"] = f"new{i}"
+        renderer["contentText"] = {"simpleText": f"Yepyeni bir konu açıldı: kuantum bilgisayarlar {i}"}
+        new_items.append(thread)
+    items[1:1] = new_items
+
+
+def test_incremental_refresh_without_new_comments_skips_gemini(youtube):
+    _, stub = youtube
+    full = server.fetch_comments(URL)
+    assert server.is_successful_result(full)
+    calls = stub.call_count()
+
+    refreshed = server.fetch_comments(URL, incremental=True)
+    assert stub.call_count() == calls
+    assert refreshed["new_comments"] == 0
+    assert refreshed["comments"] == full["comments"]
+    assert refreshed["analysis"]["degisiklik"]["yeni_yorum"] == 0
+    assert refreshed["analysis"]["genel_duygu"] == full["analysis"]["genel_duygu"]
+
+
+def test_incremental_refresh_merges_new_comments(youtube):
+    fixture, stub = youtube
+    full = server.fetch_comments(URL)
+    add_new_comments(fixture, 5)
+    calls = stub.call_count()
+
+    refreshed = server.fetch_comments(URL, incremental=True)
+    assert stub.call_count() > calls
+    assert refreshed["new_comments"] == 5
+    assert [comment["commentId"] for comment in refreshed["comments"][:5]] == [f"new{i}" for i in range(5)]
+    assert refreshed["comments"][5:] == full["comments"]
+
+    analysis = refreshed["analysis"]
+    change = analysis["degisiklik"]
+    assert change["yeni_yorum"] == 5
+    assert change["onceki_duygu"] == full["analysis"]["genel_duygu"]
+    assert analysis["genel_duygu"] == server.merge_sentiments([
+        (len(full["comments"]), full["analysis"]),
+        (5, {"genel_duygu": change["yeni_yorum_duygu"]})
+    ])
+
+    # Kayıt güncellendi: bir sonraki yenileme yeni yorumları tekrar analiz etmez
+    calls = stub.call_count()
+    again = server.fetch_comments(URL, incremental=True)
+    assert stub.call_count() == calls
+    assert again["new_comments"] == 0
+    assert len(again["comments"]) == len(refreshed["comments"])
@@ -0,0 +1,108 @@
+# Arka plan işleri: /api/jobs ile iş oluşturma, aşama takibi, kapasite dolunca 429 ve sonucun alınması
+import threading
+import time
+
+import pytest
+
+import server
+
+URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+
+class FakeFetch:
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, url, source=None, force_refresh=False, incremental=False, progress=None):
+        self.calls.append((url, source, force_refresh, incremental))
+        progress("scrolling", loaded=40)
+        progress("comments", comments=[{"textDisplay": "veri olayı kaydedilmez"}])
+        self.started.set()
+        self.release.wait(5)
+        if url.endswith("failing0000"):
+            raise RuntimeError("çekim başarısız")
+        return {"video_title": "Video", "comments": [{"textDisplay": "güzel"}], "analysis": {"ozet": "iyi"}}
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    manager = server.JobManager(max_workers=1, max_pending=1, result_ttl=60)
+    fetch = FakeFetch()
+    monkeypatch.setattr(server, "job_manager", manager)
+    monkeypatch.setattr(server, "fetch_comments", fetch)
+    yield server.app.test_client(), fetch
+    fetch.release.set()
+
+
+def wait_for(client, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {status}")
+
+
+def test_job_lifecycle_and_result(jobs):
+    client, fetch = jobs
+    response = client.post("/api/jobs", json={"url": URL, "force_refresh": True})
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert response.headers["Location"] == f"/api/jobs/{job_id}"
+
+    assert fetch.started.wait(5)
+    running = wait_for(client, job_id, "running")
+    assert running["stage"] == "scrolling"
+    assert running["progress"] == {"loaded": 40}
+    assert running["result"] is None
+
+    fetch.release.set()
+    done = wait_for(client, job_id, "done")
+    assert done["stage"] == "done"
+    assert done["result"]["analysis"] == {"ozet": "iyi"}
+    assert done["finished_at"] is not None
+    assert fetch.calls == [(URL, None, True, False)]
+
+
+def test_full_queue_returns_429(jobs):
+    client, fetch = jobs
+    first = client.post("/api/jobs", json={"url": URL})
+    assert first.status_code == 202
+    busy = client.post("/api/jobs", json={"url": URL})
+    assert busy.status_code == 429
+    assert busy.headers["Retry-After"] == "30"
+
+    fetch.release.set()
+    wait_for(client, first.get_json()["job_id"], "done")
+    while server.job_manager.pending_count():
+        time.sleep(0.01)
+    assert client.post("/api/jobs", json={"url": URL}).status_code == 202
+
+
+def test_failed_job_reports_error(jobs):
+    client, fetch = jobs
+    fetch.release.set()
+    job_id = client.post("/api/jobs", json={"url": "https://www.youtube.com/watch?v=failing0000"}).get_json()["job_id"]
+    job = wait_for(client, job_id, "failed")
+    assert job["error"] == "çekim başarısız"
+    assert job["result"] is None
+
+
+def test_invalid_and_unknown_jobs(jobs):
+    client, _ = jobs
+    assert client.post("/api/jobs", json={}).status_code == 400
+    assert client.post("/api/jobs", json={"url": "https://example.com/video"}).status_code == 400
+    assert client.get("/api/jobs/bilinmeyen").status_code == 404
+
+
+def test_finished_jobs_expire(jobs):
+    client, fetch = jobs
+    fetch.release.set()
+    job_id = client.post("/api/jobs", json={"url": URL}).get_json()["job_id"]
+    wait_for(client, job_id, "done")
+    server.job_manager.result_ttl = 0
+    time.sleep(0.01)
+    assert client.get(f"/api/jobs/{job_id}").status_code == 404
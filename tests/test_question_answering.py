@@ -0,0 +1,85 @@
+# Takip soruları: BM25 ile ilgili yorumların seçilmesi ve /api/videos/<id>/ask uç noktası
+from collections import OrderedDict
+
+import pytest
+
+import fake_genai
+import server
+from gemini_client import GeminiClient
+from retrieval import CommentIndex, stems
+
+TEXTS = [
+    "Müzik seçimi harika, özellikle girişteki şarkı",
+    "Sesin kalitesi çok kötü, mikrofonu değiştirin",
+    "Kurgu hızlı ama anlaşılır olmuş",
+    "Ses seviyesi bazı yerlerde düşüyor, sesler dengesiz",
+    "Emeğinize sağlık, çok güzel bir video",
+]
+
+
+def test_stems_drop_stop_words_and_match_inflections():
+    assert stems("İnsanlar ses hakkında ne diyor?") == ["ses"]
+    assert stems("Seslerin") == stems("sesleri")
+
+
+def test_search_ranks_relevant_comments_first():
+    index = CommentIndex(TEXTS)
+    results = index.search("Ses kalitesi hakkında ne düşünüyorlar?", 3)
+    assert [position for position, _ in results][:2] == [1, 3]
+    assert results[0][1] >= results[1][1] > 0
+    assert [position for position, _ in index.search("Şarkılar nasıldı?", 10)] == [0]
+
+
+def test_search_without_matches():
+    index = CommentIndex(TEXTS)
+    assert index.search("Genel olarak ne düşünüyorlar?", 5) == []
+    assert CommentIndex([]).search("ses", 5) == []
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    stub = fake_genai.StubGenai()
+    monkeypatch.setattr(server, "genai", stub)
+    monkeypatch.setattr(server, "model_registry", server.GeminiModelRegistry(3600, server.FALLBACK_MODELS))
+    monkeypatch.setattr(server, "gemini_client", GeminiClient(requests_per_minute=0, tokens_per_minute=0))
+    monkeypatch.setattr(server, "result_store", server.ResultStore(str(tmp_path / "results.sqlite3"), 3600, 10))
+    monkeypatch.setattr(server, "_qa_contexts", OrderedDict())
+    return server.app.test_client(), stub
+
+
+def store_video(video_id):
+    server.result_store.put(video_id, {
+        "video_title": "Video",
+        "total_comments": len(TEXTS),
+        "comments": [{"textDisplay": text, "authorDisplayName": f"kullanici{i}"} for i, text in enumerate(TEXTS)],
+        "analysis": {"genel_duygu": {"pozitif": "60%", "negatif": "30%", "notr": "10%"}, "ozet": "Karışık yorumlar"}
+    })
+
+
+def test_ask_uses_relevant_comments(client):
+    test_client, stub = client
+    store_video("abcdefghijk")
+    response = test_client.post("/api/videos/abcdefghijk/ask", json={"question": "Ses kalitesi hakkında ne diyorlar?"})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert "error" not in result
+    assert result["answer"]["cevap"]
+    assert [source["yorum_no"] for source in result["sources"]] == [2, 4]
+    assert result["comments_used"] == 2 and result["total_comments"] == len(TEXTS)
+    assert result["context_tokens"] < result["full_context_tokens"]
+    assert stub.call_count() == 1
+
+
+def test_ask_without_cached_comments_returns_404(client):
+    test_client, stub = client
+    response = test_client.post("/api/videos/abcdefghijk/ask", json={"question": "Ses nasıl?"})
+    assert response.status_code == 404
+    assert response.get_json()["error"] == "Bu video için kayıtlı yorum yok, önce videoyu analiz edin"
+    assert stub.call_count() == 0
+
+
+@pytest.mark.parametrize("question", ["", "   ", "s" * (server.QA_MAX_QUESTION_LENGTH + 1)])
+def test_ask_rejects_invalid_questions(client, question):
+    test_client, _ = client
+    store_video("abcdefghijk")
+    assert test_client.post("/api/videos/abcdefghijk/ask", json={"question": question}).status_code == 400
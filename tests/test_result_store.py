@@ -0,0 +1,60 @@
+# SQLite sonuç deposu: geçerlilik süresi, LRU sınırı ve yeniden açıldığında kayıtların korunması
+import pytest
+
+import server
+
+RESULT = {"video_title": "Video", "total_comments": 2, "comments": [{"textDisplay": "güzel"}], "analysis": {"ozet": "iyi"}}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "results.sqlite3")
+
+
+def test_put_and_get(path, clock):
+    store = server.ResultStore(path, ttl=60, max_entries=10)
+    store.put("video00000a", RESULT)
+    cached = store.get("video00000a")
+    assert cached["comments"] == RESULT["comments"]
+    assert cached["analysis"] == {"ozet": "iyi"}
+    assert cached["cached_at"] == 1000.0
+    assert store.get("bilinmeyen0") is None
+
+
+def test_expired_entry_is_a_miss_but_kept_as_snapshot(path, clock):
+    store = server.ResultStore(path, ttl=60, max_entries=10)
+    store.put("video00000a", RESULT)
+    clock[0] += 61
+    assert store.get("video00000a") is None
+    snapshot = store.get("video00000a", include_expired=True)
+    assert snapshot["video_title"] == "Video"
+    assert snapshot["cached_at"] == 1000.0
+
+
+def test_least_recently_used_entry_is_evicted(path, clock):
+    store = server.ResultStore(path, ttl=3600, max_entries=2)
+    store.put("video00000a", RESULT)
+    clock[0] += 1
+    store.put("video00000b", RESULT)
+    clock[0] += 1
+    assert store.get("video00000a") is not None  # a en son kullanılan olur
+    clock[0] += 1
+    store.put("video00000c", RESULT)
+    assert store.get("video00000b", include_expired=True) is None
+    assert store.get("video00000a") is not None
+    assert store.get("video00000c") is not None
+
+
+def test_entries_survive_reopening(path, clock):
+    server.ResultStore(path, ttl=3600, max_entries=10).put("video00000a", RESULT)
+    reopened = server.ResultStore(path, ttl=3600, max_entries=10)
+    assert reopened.get("video00000a")["analysis"] == {"ozet": "iyi"}
+    reopened.delete("video00000a")
+    assert server.ResultStore(path, ttl=3600, max_entries=10).get("video00000a", include_expired=True) is None
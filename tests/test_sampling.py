@@ -0,0 +1,57 @@
+# Token bütçesi altında yorum seçimi ve prompt için örnekleme
+import copy
+
+import pytest
+
+import server
+from sampling import parse_like_count, parse_relative_age, select_comments
+
+
+@pytest.mark.parametrize("text, expected", [("1.234", 1234), ("1,2 B", 1200), ("15 bin", 15000), ("2.5M", 2500000), ("", 0)])
+def test_parse_like_count(text, expected):
+    assert parse_like_count(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [("3 gün önce", 3 * 86400), ("2 years ago (edited)", 2 * 31536000), ("dün", None)])
+def test_parse_relative_age(text, expected):
+    assert parse_relative_age(text) == expected
+
+
+def test_select_comments_stays_within_budget_and_prefers_liked_and_diverse():
+    texts = ["ses kalitesi berbat", "ses kalitesi berbat gerçekten", "kurgu çok başarılı", "müzik seçimi harika"]
+    selected, stats = select_comments(texts, [10, 10, 10, 10], 30, likes=[2, 1, 0, 0])
+    assert selected == [0, 2, 3]
+    assert stats["analiz_edilen"] == 3 and stats["aday_yorum"] == 4
+    assert stats["tahmini_token"] == 30
+    assert stats["begeni_kapsami"] == "67%"
+
+
+def make_comments(count):
+    return [{"textDisplay": f"{i}. yorum: bölüm {i} hakkında ayrıntılı ve farklı düşünceler {i * 7919}",
+             "authorDisplayName": f"kullanici{i}", "likeCount": str(i), "publishedAt": f"{i + 1} gün önce"}
+            for i in range(count)]
+
+
+def test_sample_comments_for_prompt_does_not_modify_comments():
+    comments = make_comments(40)
+    original = copy.deepcopy(comments)
+    groups = [[i] for i in range(len(comments))]
+    budget = 200
+    prompt_comments, counts, stats = server.sample_comments_for_prompt(comments, comments, groups, budget)
+
+    assert comments == original
+    assert 0 < len(prompt_comments) < len(comments)
+    assert counts == [1] * len(prompt_comments)
+    assert sum(server.estimate_tokens(line) + 1 for line in server.format_comments(prompt_comments, counts)) <= budget
+    assert stats["kapsanan_yorum"] == len(prompt_comments)
+    assert stats["toplam_yorum"] == 40
+    # En çok beğenilen yorum bütçeye girer
+    assert comments[-1] in prompt_comments
+
+
+def test_sample_comments_within_budget_keeps_everything():
+    comments = make_comments(3)
+    groups = [[0, 2], [1]]
+    representatives = [comments[0], comments[1]]
+    assert server.sample_comments_for_prompt(comments, representatives, groups, 10000) == (representatives, [2, 1], None)
+    assert all("sampled" not in comment for comment in comments)
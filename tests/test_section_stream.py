@@ -0,0 +1,68 @@
+# Akışlı yanıtta bölümlerin parça sınırlarından bağımsız olarak kapandıkları anda iletilmesi
+import json
+
+import pytest
+
+import server
+from analysis_schema import QUALITATIVE_FIELDS, SectionStreamParser
+from fake_genai import FakeGenerativeModel
+from gemini_client import GeminiClient
+
+RESPONSE = {
+    "genel_duygu": {"pozitif": 60, "negatif": 30, "notr": 10},
+    "genel_izlenim": "Yorumlar \"genel\" olarak olumlu, {parantez} ve [köşeli] ifadeler içeriyor",
+    "one_cikan_konular": ["ses", "kurgu, müzik"],
+    "puan": 7,
+    "onaylandi": True,
+    "ozet": "Kısa özet",
+}
+
+
+def feed_in_chunks(text, size):
+    parser = SectionStreamParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend((start + size, key, value) for key, value in parser.feed(text[start:start + size]))
+    return events
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10_000])
+def test_sections_are_independent_of_chunk_boundaries(size):
+    text = json.dumps(RESPONSE, ensure_ascii=False, indent=2)
+    events = feed_in_chunks(text, size)
+    assert [(key, value) for _, key, value in events] == list(RESPONSE.items())
+
+
+def test_section_is_emitted_as_soon_as_it_closes():
+    text = json.dumps(RESPONSE, ensure_ascii=False)
+    for received, key, value in feed_in_chunks(text, 1):
+        encoded = json.dumps(value, ensure_ascii=False)
+        end = text.index(encoded, text.index(f'"{key}"')) + len(encoded)
+        # Metin, liste ve nesneler kapanış karakteriyle; sayı ve true/false ardından gelen ayraçla tamamlanır
+        assert received == (end + 1 if isinstance(value, (bool, int, float)) else end)
+
+
+def test_text_before_object_and_after_end_is_ignored():
+    parser = SectionStreamParser()
+    events = parser.feed('```json\n{"ozet": "a"')
+    events += parser.feed('}\n```\n{"ozet": "b"}')
+    assert events == [("ozet", "a")]
+
+
+def test_unfinished_section_is_not_emitted():
+    parser = SectionStreamParser()
+    assert parser.feed('{"ozet": "tamam", "oneriler": ["bir", "iki"') == [("ozet", "tamam")]
+
+
+def test_generate_analysis_relays_validated_sections(monkeypatch):
+    monkeypatch.setattr(server, "gemini_client", GeminiClient(requests_per_minute=0, tokens_per_minute=0))
+    monkeypatch.setattr(server, "ANALYSIS_STREAMING", True)
+    response = {"genel_izlenim": "Olumlu", "one_cikan_konular": "ses; kurgu", "tartismali_noktalar": [],
+                "oneriler": ["kısalt"], "ozet": "Özet", "fazla_alan": "x"}
+    model = FakeGenerativeModel(text=json.dumps(response, ensure_ascii=False), chunk_size=8)
+    sections = []
+    analysis = server.generate_analysis(model, "fake-model", "prompt", QUALITATIVE_FIELDS,
+                                        on_section=lambda field, value: sections.append((field, value)))
+    assert sections == [("genel_izlenim", "Olumlu"), ("one_cikan_konular", ["ses", "kurgu"]),
+                        ("tartismali_noktalar", []), ("oneriler", ["kısalt"]), ("ozet", "Özet")]
+    assert {field: analysis[field] for field in QUALITATIVE_FIELDS} == dict(sections)